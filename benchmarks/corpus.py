@@ -0,0 +1,121 @@
+import random
+import re
+from pathlib import Path
+from typing import Dict, List
+
+TLDS = [".com", ".cn", ".net", ".org", ".io", ".com.cn", ".co.jp", ".de"]
+SYLLABLES = [
+    "al", "ba", "cor", "da", "en", "fi", "go", "hu", "in", "jo", "ka", "li",
+    "mo", "na", "op", "pa", "qu", "ro", "si", "tu", "ur", "vi", "wa", "xi", "yo", "zen",
+]
+
+
+def _label(rnd: random.Random) -> str:
+    return "".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(1, 4)))
+
+
+def _domain(rnd: random.Random, base: str) -> str:
+    if rnd.random() < 0.6:
+        return base
+    return ".".join(_label(rnd) for _ in range(rnd.randint(1, 2))) + "." + base
+
+
+def _rule_line(rnd: random.Random, base: str) -> str:
+    kind = rnd.random()
+    domain = _domain(rnd, base)
+    if kind < 0.55:
+        line = domain
+    elif kind < 0.65:
+        line = f"domain:{domain}"
+    elif kind < 0.85:
+        line = f"full:{domain}"
+    elif kind < 0.92:
+        line = f"keyword:{_label(rnd)}"
+    elif kind < 0.95:
+        line = f"regexp:^{_label(rnd)}\\d+\\.{re.escape(base)}$"
+    else:
+        line = f"{domain} # mirror"
+
+    attrs = rnd.random()
+    if attrs < 0.15:
+        line += " @cn"
+    elif attrs < 0.2:
+        line += " @ads"
+    elif attrs < 0.23:
+        line += " @!cn"
+    elif attrs < 0.25:
+        line += " @ads @cn"
+    return line
+
+
+def _include_line(rnd: random.Random, target: str) -> str:
+    selector = rnd.random()
+    if selector < 0.15:
+        return f"include:{target} @cn"
+    if selector < 0.25:
+        return f"include:{target} @-cn"
+    if selector < 0.3:
+        return f"include:{target}@ads"
+    return f"include:{target}"
+
+
+def generate_corpus(
+    output_dir: Path,
+    files: int = 1500,
+    seed: int = 20240101,
+    chain_depth: int = 40,
+) -> Dict[str, int]:
+    """生成 v2fly 规模的合成数据目录，返回各类文件数量。
+
+    文件分四类：普通公司列表、聚合 category-*（形成菱形 include）、
+    一条深度为 chain_depth 的 include 链，以及 geolocation-cn / geolocation-!cn 两个大聚合。
+    所有 include 只指向先生成的文件，因此图中没有环。
+    """
+    rnd = random.Random(seed)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    categories = max(1, files // 12)
+    chain_depth = min(chain_depth, max(1, files // 8))
+    leaves = max(1, files - categories - chain_depth - 2)
+    written: List[str] = []
+    stats = {"leaves": 0, "categories": 0, "chain": 0, "geolocation": 0, "lines": 0}
+
+    def write(name: str, lines: List[str]):
+        header = [f"# synthetic list {name}", ""]
+        (output_dir / name).write_text("\n".join(header + lines) + "\n", encoding="utf-8")
+        written.append(name)
+        stats["lines"] += len(lines)
+
+    for index in range(leaves):
+        name = f"{_label(rnd)}-{index}"
+        base = _label(rnd) + rnd.choice(TLDS)
+        size = int(rnd.paretovariate(1.2) * 8)
+        lines = [_rule_line(rnd, base if rnd.random() < 0.7 else _label(rnd) + rnd.choice(TLDS))
+                 for _ in range(min(size, 4000))]
+        if written and rnd.random() < 0.2:
+            lines.append(_include_line(rnd, rnd.choice(written)))
+        write(name, lines)
+        stats["leaves"] += 1
+
+    leaf_names = list(written)
+    for index in range(categories):
+        name = f"category-{_label(rnd)}-{index}"
+        targets = rnd.sample(written, min(len(written), rnd.randint(3, 30)))
+        lines = [_include_line(rnd, target) for target in targets]
+        lines.extend(_rule_line(rnd, _label(rnd) + rnd.choice(TLDS)) for _ in range(rnd.randint(0, 10)))
+        write(name, lines)
+        stats["categories"] += 1
+
+    previous = rnd.choice(leaf_names)
+    for index in range(chain_depth):
+        name = f"chain-{index}"
+        write(name, [_include_line(rnd, previous), _rule_line(rnd, f"chain{index}.example.com")])
+        previous = name
+        stats["chain"] += 1
+
+    category_names = [name for name in written if name.startswith("category-")]
+    write("geolocation-cn", [f"include:{name} @cn" for name in category_names] + [f"include:{previous}"])
+    write("geolocation-!cn", [f"include:{name} @-cn" for name in category_names])
+    stats["geolocation"] = 2
+    stats["files"] = len(written)
+    return stats
@@ -0,0 +1,124 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.build import BuildEngine, list_source_names
+from src.parser import Entry, entry_to_domain, parse_doc
+
+from .corpus import generate_corpus
+from .run import BENCH_POLICIES
+
+
+def retained(func: Callable[[], Any]) -> Tuple[Any, int]:
+    """返回 func 的结果以及该结果在调用结束后仍占用的内存（tracemalloc 统计）。"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        with contextlib.redirect_stdout(io.StringIO()):
+            value = func()
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return value, after - before
+
+
+def measure_memory(workdir: Path, files: int, seed: int) -> Dict[str, Any]:
+    source_dir = workdir / "data"
+    corpus = generate_corpus(source_dir, files=files, seed=seed)
+    names = list_source_names(source_dir)
+    release_dir = workdir / "release"
+
+    def load_tokens() -> Dict[str, List[Any]]:
+        return {name: parse_doc(source_dir / name) for name in names}
+
+    tokens, tokens_bytes = retained(load_tokens)
+    token_count = sum(map(len, tokens.values()))
+
+    def build_entries() -> List[Entry]:
+        # 与 DocumentProcessor 相同的构造方式：每条非 include 规则一个 Entry，data 为输出行。
+        entries: List[Entry] = []
+        for file_tokens in tokens.values():
+            for type_prefix, value, pos_attrs, neg_attrs in file_tokens:
+                if type_prefix in ("include", "regexp"):
+                    continue
+                entry = Entry(type=type_prefix, value=value, attr=pos_attrs, neg_attr=neg_attrs)
+                entry.data = (entry_to_domain(entry),)
+                entries.append(entry)
+        return entries
+
+    entries, entries_bytes = retained(build_entries)
+    entry_count = len(entries)
+    del entries, tokens
+
+    def evaluate() -> BuildEngine:
+        shutil.rmtree(release_dir, ignore_errors=True)
+        release_dir.mkdir()
+        engine = BuildEngine(source_dir, release_dir, tag_policies=BENCH_POLICIES, keep_evaluated=True)
+        engine.run(names)
+        return engine
+
+    engine, evaluated_bytes = retained(evaluate)
+    evaluated_lines = sum(len(engine.processed[name][1]) for name in engine.processed)
+
+    return {
+        "meta": {"files": corpus["files"], "lines": corpus["lines"], "seed": seed},
+        "tokens": {
+            "count": token_count,
+            "bytes": tokens_bytes,
+            "bytes_per_item": round(tokens_bytes / max(1, token_count), 1),
+        },
+        "entries": {
+            "count": entry_count,
+            "bytes": entries_bytes,
+            "bytes_per_item": round(entries_bytes / max(1, entry_count), 1),
+        },
+        "evaluated": {
+            "count": evaluated_lines,
+            "bytes": evaluated_bytes,
+            "bytes_per_item": round(evaluated_bytes / max(1, evaluated_lines), 1),
+        },
+    }
+
+
+def _print_summary(results: Dict[str, Any]):
+    meta = results["meta"]
+    print(f"📦 语料: {meta['files']} 个文件, {meta['lines']} 行 (seed={meta['seed']})")
+    for stage in ("tokens", "entries", "evaluated"):
+        values = results[stage]
+        print(
+            f"🧠 {stage}: {values['count']} 项, 常驻 {values['bytes'] / 1024 / 1024:.1f} MB, "
+            f"每项 {values['bytes_per_item']} 字节"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="测量 token、Entry 与求值结果在合成语料上的常驻内存")
+    parser.add_argument("--files", type=int, default=1500, help="生成的源文件数量")
+    parser.add_argument("--seed", type=int, default=20240101, help="语料随机种子")
+    parser.add_argument("--workdir", type=str, default=None, help="语料与输出目录，默认使用临时目录")
+    parser.add_argument("--output", type=str, default=None, help="结果 JSON 输出路径")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="network-rules-memory-") as tmp:
+        workdir = Path(args.workdir) if args.workdir else Path(tmp)
+        results = measure_memory(workdir, args.files, args.seed)
+
+    _print_summary(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+        print(f"✅ 结果已写入: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
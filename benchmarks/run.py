@@ -0,0 +1,173 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from src.build import BuildEngine, list_source_names
+from src.customizations import IncludeOverlay
+from src.generate_filelist import collect_file_data
+from src.parser import format_doc, parse_doc
+
+from .corpus import generate_corpus
+
+BENCH_POLICIES = {"cn": {"pos": True, "neg": True}, "ads": {"pos": True, "neg": True}}
+
+
+def measure(func: Callable[[], Any], repeat: int = 1, memory: bool = True) -> Dict[str, Any]:
+    """计时取最小值；memory 为真时再单独跑一次 tracemalloc 记录峰值内存。"""
+    timings: List[float] = []
+    items: Any = None
+    for _ in range(max(1, repeat)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            items = func()
+            timings.append(time.perf_counter() - start)
+
+    result: Dict[str, Any] = {"seconds": round(min(timings), 6), "items": items}
+    if memory:
+        tracemalloc.start()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        result["peak_bytes"] = peak
+    return result
+
+
+def run_benchmarks(
+    workdir: Path,
+    files: int,
+    seed: int,
+    repeat: int = 1,
+    memory: bool = True,
+    jobs: int = 1,
+) -> Dict[str, Any]:
+    source_dir = workdir / "data"
+    corpus = generate_corpus(source_dir, files=files, seed=seed)
+    names = list_source_names(source_dir)
+    release_dir = workdir / "release"
+
+    def stage_format_doc() -> int:
+        return sum(len(format_doc(source_dir / name)) for name in names)
+
+    def stage_parse_doc() -> int:
+        return sum(len(parse_doc(source_dir / name)) for name in names)
+
+    rules = [
+        {"from_file": "geolocation-cn", "exclude": names[:20]},
+        {"from_file": "geolocation-!cn", "exclude": names[20:40]},
+    ]
+
+    def stage_process() -> int:
+        shutil.rmtree(release_dir, ignore_errors=True)
+        release_dir.mkdir()
+        engine = BuildEngine(
+            source_dir,
+            release_dir,
+            tag_policies=BENCH_POLICIES,
+            jobs=jobs,
+            overlay=IncludeOverlay(rules),
+        )
+        return engine.run(names)
+
+    def stage_collect_file_data() -> int:
+        return len(collect_file_data(release_dir))
+
+    stages: Dict[str, Dict[str, Any]] = {}
+    stages["format_doc"] = measure(stage_format_doc, repeat, memory)
+    stages["parse_doc"] = measure(stage_parse_doc, repeat, memory)
+    stages["process"] = measure(stage_process, repeat, memory)
+    stages["collect_file_data"] = measure(stage_collect_file_data, repeat, memory)
+
+    return {
+        "meta": {
+            "files": corpus["files"],
+            "lines": corpus["lines"],
+            "seed": seed,
+            "repeat": repeat,
+            "jobs": jobs,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "stages": stages,
+    }
+
+
+def compare_results(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float = 0.2,
+) -> List[str]:
+    """与基线比较，返回超出容忍度的回归描述；新增或缺失的阶段不算回归。"""
+    regressions: List[str] = []
+    for stage, values in current.get("stages", {}).items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous:
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            now, before = values.get(metric), previous.get(metric)
+            if not now or not before:
+                continue
+            ratio = now / before
+            if ratio > 1 + tolerance:
+                regressions.append(f"{stage}.{metric}: {before} -> {now} (x{ratio:.2f})")
+    return regressions
+
+
+def _print_summary(results: Dict[str, Any]):
+    meta = results["meta"]
+    print(f"📦 语料: {meta['files']} 个文件, {meta['lines']} 行 (seed={meta['seed']})")
+    for stage, values in results["stages"].items():
+        peak = values.get("peak_bytes")
+        peak_info = f", 峰值内存 {peak / 1024 / 1024:.1f} MB" if peak is not None else ""
+        print(f"⏱️ {stage}: {values['seconds']:.3f}s{peak_info}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="在合成的 v2fly 规模语料上跑各阶段基准测试")
+    parser.add_argument("--files", type=int, default=1500, help="生成的源文件数量")
+    parser.add_argument("--seed", type=int, default=20240101, help="语料随机种子")
+    parser.add_argument("--repeat", type=int, default=3, help="每个阶段重复次数，取最快一次")
+    parser.add_argument("--jobs", type=int, default=1, help="process 阶段的并行进程数")
+    parser.add_argument("--no-memory", action="store_true", help="不记录峰值内存（更快）")
+    parser.add_argument("--workdir", type=str, default=None, help="语料与输出目录，默认使用临时目录")
+    parser.add_argument("--output", type=str, default=None, help="结果 JSON 输出路径")
+    parser.add_argument("--baseline", type=str, default=None, help="对比的基线 JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的相对回归幅度，默认 0.2")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="network-rules-bench-") as tmp:
+        workdir = Path(args.workdir) if args.workdir else Path(tmp)
+        results = run_benchmarks(
+            workdir, args.files, args.seed, args.repeat, not args.no_memory, args.jobs
+        )
+
+    _print_summary(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+        print(f"✅ 结果已写入: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare_results(results, baseline, args.tolerance)
+        if regressions:
+            for item in regressions:
+                print(f"❌ 性能回归: {item}")
+            return 1
+        print("✅ 未发现性能回归")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
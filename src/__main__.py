@@ -0,0 +1,47 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+from .main import add_build_arguments, create_engine
+from .matcher import add_match_arguments, run_match
+from .pipeline import run_pipeline
+from .profiling import finish_profile, start_profile
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src", description="network rules 构建工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser(
+        "build",
+        help="单进程完成预处理、规则生成与 fileList.js 页面生成",
+    )
+    add_build_arguments(build)
+    build.add_argument("--pages-dir", type=str, default="pages", help="页面输出目录，默认 pages")
+    build.add_argument("--no-pages", action="store_true", help="只生成规则，不生成页面")
+    build.add_argument(
+        "--repo-name",
+        type=str,
+        default=os.environ.get("GITHUB_REPOSITORY", "unknown/repo"),
+        help="GitHub 仓库名 owner/repo，默认读取 GITHUB_REPOSITORY",
+    )
+    match = subparsers.add_parser("match", help="查询域名命中 release 中的哪些列表")
+    add_match_arguments(match)
+    args = parser.parse_args(argv)
+    if args.command == "match":
+        return run_match(args)
+    start_profile(args.profile)
+
+    engine = create_engine(args)
+    if engine is None:
+        return 1
+    pages_dir = None if args.no_pages else Path(args.pages_dir)
+    run_pipeline(engine, pages_dir, args.repo_name)
+    finish_profile(args.profile, args.profile_top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
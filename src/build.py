@@ -0,0 +1,388 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from .cache import ParseCache
+from .customizations import IncludeOverlay
+from .emitters import DEFAULT_FORMATS, EmitStats
+from .graph import IncludeGraph, Token, scan_include_graph
+from .manifest import content_hash, include_closures, load_manifest
+from .parser import iter_lines, iter_tokens, parse_bytes
+from .processor import DocumentProcessor, EvaluatedSet, PackedEntries
+from .profiling import disable_profiler, enable_profiler, get_profiler
+from .sources import DirectorySource, Source
+from .store import EntryStore, ProcessedStore, count_dependents
+from .writer import OutputWriter
+
+
+def list_source_names(source_dir: Path) -> List[str]:
+    return DirectorySource(source_dir).names()
+
+
+def resolve_jobs(jobs: int) -> int:
+    if jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def _included(graph: IncludeGraph, cyclic: Dict[str, Set[str]], name: str) -> List[str]:
+    cut = cyclic.get(name, ())
+    return [target for target in graph.edges[name] if target not in cut]
+
+
+def _init_worker(profile: bool):
+    # fork 出的子进程会继承父进程已记录的区间，这里重新开始记录。
+    disable_profiler()
+    if profile:
+        enable_profiler()
+
+
+class EvaluateTask(NamedTuple):
+    """交给子进程求值一个文件所需的输入。"""
+
+    name: str
+    tokens: List[Token]
+    # 外部排序模式下 tokens 只含 include，规则行由子进程从源文件字节 data 逐行解析。
+    data: Optional[bytes]
+    cyclic_includes: Set[str]
+    children: Dict[str, PackedEntries]
+    known_hashes: Optional[Dict[str, str]]
+    # (source_dir, release_dir, processor_options, link_mode)，所有任务共用。
+    options: Tuple[Any, ...]
+
+
+def _evaluate_packed(task: EvaluateTask) -> Tuple[
+    str,
+    PackedEntries,
+    Dict[str, int],
+    int,
+    Tuple[int, int],
+    Tuple[int, int],
+    OutputWriter,
+    EmitStats,
+    List[Dict[str, Any]],
+]:
+    # 子进程入口：只接收子文件压缩后的条目，求值后同样只回传压缩结果。
+    name, data = task.name, task.data
+    source_dir, release_dir, processor_options, link_mode = task.options
+    writer = OutputWriter(release_dir, task.known_hashes, link_mode)
+    processed = {
+        child: ([], EvaluatedSet.unpack(packed))
+        for child, packed in task.children.items()
+    }
+    doc = DocumentProcessor(
+        [],
+        source_dir,
+        release_dir,
+        [name],
+        processed,
+        tokens=task.tokens,
+        cyclic_includes=task.cyclic_includes,
+        writer=writer,
+        rules=iter_tokens(iter_lines(data)) if data is not None else None,
+        **processor_options
+    )
+    doc.process()
+    writer.known_hashes = {}
+    return (
+        name,
+        doc.evaluated.pack(),
+        doc.outputs,
+        doc.removed_lines,
+        (doc.include_hits, doc.include_misses),
+        (doc.spilled_runs, doc.spilled_lines),
+        writer,
+        doc.emit_stats,
+        get_profiler().drain(),
+    )
+
+
+class BuildEngine:
+    """先把全部源文件扫描成 include 图，再按拓扑序逐个求值，每个文件只解析、处理一次。
+
+    传入 manifest 时只重新求值内容变化的文件及其传递依赖者，其余输出保持不动。
+    传入 overlay 时在加载 token 后应用 exclude_includes，源目录本身不会被修改。
+    设置 spill_lines 时进入外部排序模式：扫描只保留 include token，求值时再逐行解析源文件，
+    规则行直接流入有界的排序器（此时不使用解析缓存，它保存的是整份 token 列表）。
+    源文件通过 source 读取（默认是 source_dir 目录），也可以直接读归档。
+    """
+
+    def __init__(
+        self,
+        source_dir: Path,
+        release_dir: Path,
+        min_lines: int = 1,
+        tag_policies: Dict[str, Dict[str, bool]] = None,
+        jobs: int = 1,
+        manifest_path: Optional[Path] = None,
+        parse_cache: Optional[ParseCache] = None,
+        optimize: bool = False,
+        formats: Sequence[str] = DEFAULT_FORMATS,
+        overlay: Optional[IncludeOverlay] = None,
+        link_mode: Optional[str] = None,
+        source: Optional[Source] = None,
+        max_memory: Optional[int] = None,
+        keep_evaluated: bool = False,
+        spill_lines: Optional[int] = None
+    ):
+        self.source_dir = source_dir
+        self.source = source or DirectorySource(source_dir)
+        self.release_dir = release_dir
+        self.processor_options: Dict[str, Any] = {
+            "min_lines": min_lines,
+            "tag_policies": tag_policies or {},
+            "optimize": optimize,
+            "formats": list(formats),
+            "spill_lines": spill_lines,
+        }
+        self.jobs = resolve_jobs(jobs)
+        self.overlay = overlay
+        manifest_options = dict(self.processor_options)
+        # 外部排序只改变写出方式，输出内容不变，不计入清单指纹。
+        del manifest_options["spill_lines"]
+        if overlay:
+            manifest_options["exclude_includes"] = overlay.fingerprint()
+        if link_mode:
+            manifest_options["link_mode"] = link_mode
+        self.manifest = load_manifest(manifest_path, manifest_options)
+        self.writer = OutputWriter(
+            release_dir,
+            self.manifest.output_hashes() if self.manifest is not None else None,
+            link_mode,
+        )
+        self.emit_stats = EmitStats()
+        self.spill_lines = spill_lines
+        self.parse_cache = parse_cache if spill_lines is None else None
+        self.max_memory = max_memory
+        self.processed = ProcessedStore(max_memory, retain=keep_evaluated)
+        self.digests: Dict[str, str] = {}
+        # 本次重新求值的文件及其输出行数；压缩条目已直接写入清单的条目文件。
+        self.evaluated: Dict[str, Dict[str, int]] = {}
+        self.output_lines: Dict[str, int] = {}
+        self.skipped = 0
+        self.removed_lines = 0
+        self.include_hits = 0
+        self.include_misses = 0
+        self.spilled_runs = 0
+        self.spilled_lines = 0
+
+    def load_tokens(self, name: str) -> List[Token]:
+        tokens = self._read_tokens(name)
+        if tokens is None:
+            return []
+        # 文件存在就交给覆盖层，哪怕解析为空（或外部排序模式下没有 include），报告才不会误判为不存在。
+        if self.overlay:
+            tokens = self.overlay.apply(name, tokens)
+        return tokens
+
+    def _read_tokens(self, name: str) -> Optional[List[Token]]:
+        """读取并解析 name；文件不存在时返回 None。"""
+        profiler = get_profiler()
+        if self.parse_cache is not None:
+            with profiler.span("parse-cache", cat="parse", file=name) as span:
+                cached = self.parse_cache.lookup_source(self.source, name)
+                span["entries"] = len(cached[1]) if cached is not None else 0
+            if cached is None:
+                print(f"⚠️未知文件: {name}")
+                self.digests[name] = ""
+                return None
+            digest, tokens = cached
+            self.digests[name] = self.source.digest(name) or digest
+            return tokens
+        with profiler.span("read", cat="io", file=name) as span:
+            data = self.source.read(name)
+            span["bytes_read"] = len(data) if data is not None else 0
+        if data is None:
+            print(f"⚠️未知文件: {name}")
+            self.digests[name] = ""
+            return None
+        self.digests[name] = self.source.digest(name) or content_hash(data)
+        with profiler.span("tokenize", cat="parse", file=name) as span:
+            if self.spill_lines is None:
+                tokens = parse_bytes(data)
+            else:
+                tokens = [token for token in iter_tokens(iter_lines(data)) if token[0] == "include"]
+            span["entries"] = len(tokens)
+        return tokens
+
+    def _read_source(self, name: str) -> Optional[bytes]:
+        # 外部排序模式在求值时重新读取源文件；文件已消失时按空文件处理。
+        with get_profiler().span("read", cat="io", file=name) as span:
+            data = self.source.read(name)
+            span["bytes_read"] = len(data) if data is not None else 0
+        return data
+
+    def _stream_rules(self, name: str) -> Iterator[Token]:
+        data = self._read_source(name)
+        if data is not None:
+            yield from iter_tokens(iter_lines(data))
+
+    def run(self, roots: List[str]) -> int:
+        profiler = get_profiler()
+        with profiler.span("scan") as span:
+            graph = scan_include_graph(self.source_dir, roots, loader=self.load_tokens)
+            order, cyclic = graph.build_order()
+            span["files"] = len(order)
+        if self.parse_cache is not None:
+            self.parse_cache.save()
+            print(f"🗃️ 解析缓存: 命中 {self.parse_cache.hits}, 未命中 {self.parse_cache.misses}")
+        if self.overlay:
+            self.overlay.report()
+
+        dirty = set(order)
+        closures: Dict[str, List[str]] = {}
+        if self.manifest is not None:
+            closures = include_closures(graph, order, cyclic)
+            dirty = self.manifest.plan(
+                order, cyclic, graph, self.digests, closures, self.release_dir
+            )
+            self.skipped = len(order) - len(dirty)
+            if self.skipped:
+                print(f"💨未变化跳过 {self.skipped} 个文件，重新处理 {len(dirty)} 个")
+
+        with profiler.span("evaluate", files=len(dirty)):
+            if self.jobs > 1:
+                self._run_parallel(graph, dirty)
+            else:
+                self._run_serial(graph, order, cyclic, dirty)
+
+        self.writer.link_duplicates()
+        self.writer.report()
+        self.emit_stats.report()
+        if self.include_hits or self.include_misses:
+            print(f"🧷 include 过滤缓存: 命中 {self.include_hits} 次, 未命中 {self.include_misses} 次")
+        if self.spilled_runs:
+            print(f"💽 外部排序: {self.spilled_lines} 行溢出为 {self.spilled_runs} 个临时 run")
+        if self.manifest is not None:
+            with profiler.span("manifest"):
+                self._update_manifest(order, closures)
+        if self.processor_options["optimize"]:
+            print(f"✂️ 覆盖精简共删除 {self.removed_lines} 行")
+        return len(roots)
+
+    def _cached_entries(self, name: str) -> PackedEntries:
+        return self.manifest.load_entries(name)
+
+    def _run_serial(
+        self,
+        graph: IncludeGraph,
+        order: List[str],
+        cyclic: Dict[str, Set[str]],
+        dirty: Set[str]
+    ):
+        processed = self.processed
+        processed.expect(count_dependents(graph, order, cyclic))
+        with processed:
+            for name in order:
+                children = _included(graph, cyclic, name)
+                if name not in dirty:
+                    graph.tokens.pop(name, None)
+                    if processed.needed(name):
+                        processed[name] = ([], EvaluatedSet.unpack(self._cached_entries(name)))
+                    self.output_lines.update(self.manifest.previous_lines(name))
+                    processed.done(name, children)
+                    continue
+                doc = DocumentProcessor(
+                    [],
+                    self.source_dir,
+                    self.release_dir,
+                    [name],
+                    processed,
+                    tokens=graph.tokens.pop(name),
+                    cyclic_includes=cyclic.get(name),
+                    writer=self.writer,
+                    emit_stats=self.emit_stats,
+                    rules=self._stream_rules(name) if self.spill_lines is not None else None,
+                    **self.processor_options
+                )
+                doc.process()
+                self.removed_lines += doc.removed_lines
+                self.include_hits += doc.include_hits
+                self.include_misses += doc.include_misses
+                self.spilled_runs += doc.spilled_runs
+                self.spilled_lines += doc.spilled_lines
+                self.output_lines.update(doc.outputs)
+                outputs, evaluated = doc.outputs, doc.evaluated
+                # 先释放逐行的 Entry 和 tokens，再为清单序列化条目。
+                del doc
+                if self.manifest is not None:
+                    if self.spill_lines is None:
+                        self.manifest.store_entries(name, evaluated.pack())
+                    else:
+                        self.manifest.store_entry_chunks(name, evaluated.pack_chunks(self.spill_lines))
+                    self.evaluated[name] = outputs
+                del evaluated
+                processed.done(name, children)
+            processed.report()
+
+    def _run_parallel(self, graph: IncludeGraph, dirty: Set[str]):
+        layers, cyclic = graph.build_layers()
+        profiler = get_profiler()
+        options = (self.source_dir, self.release_dir, self.processor_options, self.writer.link_mode)
+        packed = EntryStore(self.max_memory)
+        packed.expect(count_dependents(graph, (name for layer in layers for name in layer), cyclic))
+        with packed, ProcessPoolExecutor(
+            max_workers=self.jobs, initializer=_init_worker, initargs=(profiler.enabled,)
+        ) as executor:
+            for layer in layers:
+                tasks: List[EvaluateTask] = []
+                for name in layer:
+                    if name not in dirty:
+                        graph.tokens.pop(name, None)
+                        if packed.needed(name):
+                            packed[name] = self._cached_entries(name)
+                        self.output_lines.update(self.manifest.previous_lines(name))
+                        packed.done(name, _included(graph, cyclic, name))
+                        continue
+                    cut = cyclic.get(name, set())
+                    children = {target: packed[target] for target in _included(graph, cyclic, name)}
+                    known_hashes = (
+                        self.manifest.previous_outputs(name) if self.manifest is not None else None
+                    )
+                    data = self._read_source(name) if self.spill_lines is not None else None
+                    tasks.append(
+                        EvaluateTask(name, graph.tokens.pop(name), data, cut, children, known_hashes, options)
+                    )
+                chunksize = max(1, len(tasks) // (self.jobs * 4))
+                for (
+                    name,
+                    entries,
+                    outputs,
+                    removed_lines,
+                    (hits, misses),
+                    (spilled_runs, spilled_lines),
+                    writer,
+                    emit_stats,
+                    events,
+                ) in executor.map(_evaluate_packed, tasks, chunksize=chunksize):
+                    packed[name] = entries
+                    packed.done(name, _included(graph, cyclic, name))
+                    self.writer.merge(writer)
+                    self.emit_stats.merge(emit_stats)
+                    profiler.extend(events)
+                    self.removed_lines += removed_lines
+                    self.include_hits += hits
+                    self.include_misses += misses
+                    self.spilled_runs += spilled_runs
+                    self.spilled_lines += spilled_lines
+                    self.output_lines.update(outputs)
+                    if self.manifest is not None:
+                        self.manifest.store_entries(name, entries)
+                        self.evaluated[name] = outputs
+            packed.report()
+
+    def _update_manifest(self, order: List[str], closures: Dict[str, List[str]]):
+        manifest = self.manifest
+        stale: List[str] = manifest.forget(set(manifest.files) - set(order))
+        # 参数变化后的全量构建：旧配置产出、本次不再写出的页面（如关掉的标签页）一并删除。
+        stale.extend(output for output in manifest.leftover_outputs if output not in self.writer.hashes)
+        for name, outputs in self.evaluated.items():
+            previous = manifest.previous_outputs(name)
+            stale.extend(output for output in previous if output not in outputs)
+            hashes = {output: self.writer.hashes[output] for output in outputs}
+            manifest.record(
+                name, self.digests.get(name, ""), closures[name], hashes, outputs
+            )
+        self.writer.remove(stale)
+        manifest.save()
@@ -0,0 +1,145 @@
+import marshal
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .graph import Token
+from .manifest import content_hash
+from .parser import parse_bytes
+from .sources import Source
+
+CACHE_VERSION = 2
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# path -> (size, mtime_ns, hash, tokens, cost, generation)
+CacheRecord = Tuple[int, int, str, List[Token], int, int]
+
+
+class ParseCache:
+    """parse_bytes 结果的持久缓存，存成 marshal 二进制文件。
+
+    命中规则：路径、大小、mtime 都一致时直接复用，不再读取文件；
+    否则读取内容比对哈希，哈希一致仍然复用。超过 max_bytes 时优先淘汰最久未使用的记录。
+    """
+
+    def __init__(self, path: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.records: Dict[str, CacheRecord] = {}
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: Path, max_bytes: int = DEFAULT_MAX_BYTES) -> "ParseCache":
+        cache = cls(path, max_bytes)
+        try:
+            with path.open("rb") as file:
+                raw: Any = marshal.load(file)
+        except FileNotFoundError:
+            raw = None
+        except (EOFError, ValueError, TypeError) as err:
+            print(f"⚠️ 解析缓存损坏，已忽略: {err}")
+            raw = None
+
+        if isinstance(raw, dict) and raw.get("version") == CACHE_VERSION:
+            cache.records = raw.get("records", {})
+            cache.generation = raw.get("generation", 0)
+        cache.generation += 1
+        return cache
+
+    def lookup(self, file_path: Path) -> Optional[Tuple[str, List[Token]]]:
+        """返回 (内容哈希, tokens)；文件不存在时返回 None。"""
+        try:
+            stat = file_path.stat()
+        except FileNotFoundError:
+            return None
+
+        def read() -> Optional[bytes]:
+            try:
+                return file_path.read_bytes()
+            except FileNotFoundError:
+                return None
+
+        return self.lookup_key(str(file_path), stat.st_size, stat.st_mtime_ns, read)
+
+    def lookup_source(self, source: Source, name: str) -> Optional[Tuple[str, List[Token]]]:
+        info = source.stat(name)
+        if info is None:
+            return None
+        size, mtime_ns = info
+        return self.lookup_key(source.cache_key(name), size, mtime_ns, lambda: source.read(name))
+
+    def lookup_key(
+        self,
+        key: str,
+        size: int,
+        mtime_ns: int,
+        read: Callable[[], Optional[bytes]],
+    ) -> Optional[Tuple[str, List[Token]]]:
+        record = self.records.get(key)
+        if record is not None and record[0] == size and record[1] == mtime_ns:
+            self._touch(key, record, size, mtime_ns)
+            self.hits += 1
+            return record[2], record[3]
+
+        data = read()
+        if data is None:
+            return None
+        digest = content_hash(data)
+        if record is not None and record[2] == digest:
+            self._touch(key, record, size, mtime_ns)
+            self.hits += 1
+            return digest, record[3]
+
+        tokens = parse_bytes(data)
+        cost = len(marshal.dumps(tokens))
+        self.records[key] = (size, mtime_ns, digest, tokens, cost, self.generation)
+        self.misses += 1
+        self.dirty = True
+        return digest, tokens
+
+    def _touch(self, key: str, record: CacheRecord, size: int, mtime_ns: int):
+        if record[0] != size or record[1] != mtime_ns or record[5] != self.generation:
+            self.records[key] = (size, mtime_ns) + record[2:5] + (self.generation,)
+            self.dirty = True
+
+    def evict(self) -> int:
+        total = sum(record[4] for record in self.records.values())
+        if total <= self.max_bytes:
+            return 0
+        # 最久未使用的先淘汰；同一批次里大的先淘汰。
+        candidates = sorted(
+            self.records.items(), key=lambda item: (item[1][5], -item[1][4])
+        )
+        evicted = 0
+        for key, record in candidates:
+            if total <= self.max_bytes:
+                break
+            del self.records[key]
+            total -= record[4]
+            evicted += 1
+        if evicted:
+            self.dirty = True
+        return evicted
+
+    def save(self):
+        self.evict()
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with tmp_path.open("wb") as file:
+            marshal.dump(
+                {"version": CACHE_VERSION, "generation": self.generation, "records": self.records},
+                file,
+            )
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+def load_parse_cache(path: Optional[Path], max_bytes: int = DEFAULT_MAX_BYTES) -> Optional[ParseCache]:
+    if path is None:
+        return None
+    return ParseCache.load(path, max_bytes)
@@ -1,10 +1,13 @@
 import argparse
 import json
 import os
-import re
 import sys
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Set
+
+from .graph import Token
+from .parser import parse_bytes
+from .profiling import add_profile_arguments, finish_profile, get_profiler, start_profile
 
 
 def resolve_customization_path(config_env: str) -> Path:
@@ -49,49 +52,66 @@ def load_customization_config(config_path: Path) -> Dict[str, Any]:
     return raw
 
 
-def _parse_include_target(line: str) -> str:
-    # include 的目标文件名总在 include: 之后，到第一个空白或 @ 为止。
-    match = re.match(r"^\s*include:([^\s@#]+)", line)
-    if not match:
-        return ""
-    return match.group(1)
-
-
-def apply_exclude_includes(source_dir: Path, rules: List[Dict[str, Any]]) -> None:
-    for rule in rules:
-        source_name = rule["from_file"]
-        excludes = set(rule["exclude"])
-        source_file = source_dir / source_name
-
-        if not source_file.exists():
-            print(f"⚠️ 自定义配置目标不存在，跳过: '{source_file}'")
-            continue
-
-        lines = source_file.read_text(encoding="utf-8").splitlines(keepends=True)
-        kept_lines: List[str] = []
-        removed_count = 0
-
-        for line in lines:
-            target = _parse_include_target(line)
-            if target and target in excludes:
-                removed_count += 1
+class IncludeOverlay:
+    """exclude_includes 的内存覆盖层：加载源文件时从 token 中去掉被排除的 include，源目录保持只读。"""
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.excludes: Dict[str, Set[str]] = {}
+        for rule in rules:
+            self.excludes.setdefault(rule["from_file"], set()).update(rule["exclude"])
+        self.edits: Dict[str, int] = {}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "IncludeOverlay":
+        return cls(config.get("exclude_includes", []))
+
+    def __bool__(self) -> bool:
+        return bool(self.excludes)
+
+    def fingerprint(self) -> Dict[str, List[str]]:
+        return {name: sorted(targets) for name, targets in sorted(self.excludes.items())}
+
+    def apply(self, name: str, tokens: List[Token]) -> List[Token]:
+        excludes = self.excludes.get(name)
+        if not excludes:
+            return tokens
+        kept = [
+            token for token in tokens
+            if token[0] != "include" or token[1] not in excludes
+        ]
+        self.edits[name] = len(tokens) - len(kept)
+        return kept
+
+    def report(self):
+        for name in sorted(self.excludes):
+            if name not in self.edits:
+                print(f"⚠️ 自定义配置目标不存在，跳过: '{name}'")
                 continue
-            kept_lines.append(line)
+            print(f"🧹 预处理完成: {name}, 删除 include 行 {self.edits[name]} 条")
 
-        source_file.write_text("".join(kept_lines), encoding="utf-8")
-        print(f"🧹 预处理完成: {source_name}, 删除 include 行 {removed_count} 条")
 
-
-def apply_customizations(source_dir: Path, config: Dict[str, Any]) -> None:
-    rules = config.get("exclude_includes", [])
-    if not rules:
+def apply_customizations(source_dir: Path, config: Dict[str, Any]) -> IncludeOverlay:
+    """只读预览：对配置涉及的源文件应用覆盖层并报告实际删除的 include 行，不改写源文件。"""
+    overlay = IncludeOverlay.from_config(config)
+    if not overlay:
         print("ℹ️ 未配置 exclude_includes，跳过预处理")
-        return
-    apply_exclude_includes(source_dir, rules)
+        return overlay
+    profiler = get_profiler()
+    for name in sorted(overlay.excludes):
+        source_file = source_dir / name
+        if not source_file.is_file():
+            continue
+        with profiler.span("read", cat="io", file=name) as span:
+            data = source_file.read_bytes()
+            span["bytes_read"] = len(data)
+        with profiler.span("filter", cat="file", file=name):
+            overlay.apply(name, parse_bytes(data))
+    overlay.report()
+    return overlay
 
 
 def main() -> int:
-    parser = argparse.ArgumentParser(description="应用构建前数据预处理规则")
+    parser = argparse.ArgumentParser(description="预览构建前数据预处理规则（只读，构建时由 src.main 在内存中应用）")
     parser.add_argument("source_dir", type=str, help="数据目录")
     parser.add_argument(
         "--config",
@@ -99,7 +119,9 @@ def main() -> int:
         default=os.environ.get("CUSTOMIZATION_FILE", "config/customizations.json"),
         help="预处理配置文件路径，默认读取 CUSTOMIZATION_FILE 或 config/customizations.json",
     )
+    add_profile_arguments(parser)
     args = parser.parse_args()
+    start_profile(args.profile)
 
     source_dir = Path(args.source_dir)
     if not source_dir.is_dir():
@@ -114,6 +136,7 @@ def main() -> int:
         return 1
 
     apply_customizations(source_dir, config)
+    finish_profile(args.profile, args.profile_top)
     return 0
 
 
@@ -0,0 +1,314 @@
+import json
+import re
+from collections import Counter
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+from .ruleset import RULESET_SUFFIX, compile_ruleset
+
+SOURCE_URL = "https://github.com/v2fly/domain-list-community/tree/master/data/{name}"
+DEFAULT_FORMATS = ("text",)
+# 按行渲染的格式每攒够这么多字节交给 writer 一次，大文件不会在内存里拼成整块。
+CHUNK_BYTES = 64 * 1024
+# text 格式的行无需渲染，按行数成批输出，常见行长下每批约 50 KiB。
+CHUNK_LINES = 2048
+
+
+def split_rule(line: str) -> Tuple[str, str]:
+    """把一行 release 文本拆成 (规则类型, 值)，类型为 domain / full / keyword / regexp。"""
+    value = line.rstrip("\n")
+    if value.startswith("."):
+        return "domain", value[1:]
+    if value.startswith("keyword:"):
+        return "keyword", value[8:]
+    if value.startswith("regexp:"):
+        return "regexp", value[7:]
+    return "full", value
+
+
+class Emitter:
+    """把求值后的 release 文本行（.domain / full / keyword: / regexp:）渲染成一种输出格式。
+
+    子类实现 domain / full / keyword / regexp，返回渲染后的一行（不含换行），
+    格式不支持的规则返回 None 并计入 skipped。
+    lines 可以是列表，也可以是外部排序模式下可重复迭代的归并视图（见 extsort.py）。
+    """
+
+    name = ""
+    suffix = ""
+    comment = "#"
+
+    def __init__(self, option: Optional[str] = None):
+        if option is not None:
+            raise ValueError(f"输出格式 {self.name} 不接受参数: {option}")
+        self.skipped = 0
+        self.rules = 0
+
+    def header(self, source_name: str) -> str:
+        return f"{self.comment} 来源: {SOURCE_URL.format(name=source_name)}\n\n"
+
+    def domain(self, value: str) -> Optional[str]:
+        return None
+
+    def full(self, value: str) -> Optional[str]:
+        return None
+
+    def keyword(self, value: str) -> Optional[str]:
+        return None
+
+    def regexp(self, value: str) -> Optional[str]:
+        return None
+
+    def render(self, line: str) -> Optional[str]:
+        kind, value = split_rule(line)
+        return getattr(self, kind)(value)
+
+    def chunks(self, source_name: str, lines: Iterable[str]) -> Iterator[bytes]:
+        """流式产出文件内容；rules / skipped 在迭代结束后才是本文件的最终值。"""
+        self.rules = self.skipped = 0
+        buffer = [self.header(source_name)]
+        size = 0
+        for line in lines:
+            rendered = self.render(line)
+            if rendered is None:
+                self.skipped += 1
+                continue
+            self.rules += 1
+            buffer.append(rendered)
+            buffer.append("\n")
+            size += len(rendered) + 1
+            if size >= CHUNK_BYTES:
+                yield "".join(buffer).encode("utf-8")
+                buffer.clear()
+                size = 0
+        if buffer:
+            yield "".join(buffer).encode("utf-8")
+
+
+class TextEmitter(Emitter):
+    """原有的 surge / clash domain set 文本格式，行本身就是输出。"""
+
+    name = "text"
+    suffix = ".txt"
+
+    def chunks(self, source_name: str, lines: Iterable[str]) -> Iterator[bytes]:
+        # 行已带换行，按固定行数成批拼接：不逐行渲染，也不把整页拼成一个字符串。
+        self.rules = self.skipped = 0
+        yield self.header(source_name).encode("utf-8")
+        iterator = iter(lines)
+        while True:
+            batch = list(islice(iterator, CHUNK_LINES))
+            if not batch:
+                return
+            self.rules += len(batch)
+            yield "".join(batch).encode("utf-8")
+
+
+class ClashEmitter(Emitter):
+    """Clash classical 规则集（behavior: classical）。"""
+
+    name = "clash"
+    suffix = ".clash.yaml"
+
+    def header(self, source_name: str) -> str:
+        return super().header(source_name) + "payload:\n"
+
+    def domain(self, value: str) -> Optional[str]:
+        return f"  - DOMAIN-SUFFIX,{value}"
+
+    def full(self, value: str) -> Optional[str]:
+        return f"  - DOMAIN,{value}"
+
+    def keyword(self, value: str) -> Optional[str]:
+        return f"  - DOMAIN-KEYWORD,{value}"
+
+
+class MihomoEmitter(Emitter):
+    """mihomo domain 规则集文本（behavior: domain），可用 mihomo convert-ruleset 转成 .mrs。"""
+
+    name = "mihomo"
+    suffix = ".mihomo.list"
+
+    def domain(self, value: str) -> Optional[str]:
+        return f"+.{value}"
+
+    def full(self, value: str) -> Optional[str]:
+        return value
+
+
+class AdGuardEmitter(Emitter):
+    """AdGuard / AdGuard Home DNS 过滤规则。"""
+
+    name = "adguard"
+    suffix = ".adguard.list"
+    comment = "!"
+
+    def domain(self, value: str) -> Optional[str]:
+        return f"||{value}^"
+
+    def full(self, value: str) -> Optional[str]:
+        return f"|{value}^"
+
+    def keyword(self, value: str) -> Optional[str]:
+        return f"/{re.escape(value)}/"
+
+    def regexp(self, value: str) -> Optional[str]:
+        return f"/{value}/"
+
+
+class HostsEmitter(Emitter):
+    """hosts 文件：只能精确匹配，domain 规则只输出域名本身。"""
+
+    name = "hosts"
+    suffix = ".hosts"
+
+    def domain(self, value: str) -> Optional[str]:
+        return f"0.0.0.0 {value}"
+
+    def full(self, value: str) -> Optional[str]:
+        return f"0.0.0.0 {value}"
+
+
+class DnsmasqEmitter(Emitter):
+    """dnsmasq server= 配置，把 domain 规则转发到指定上游（格式参数，如 dnsmasq=1.1.1.1）。
+
+    dnsmasq 的 server=/域名/ 总是连同子域名一起匹配，无法表达 full 规则，这类规则计入 skipped。
+    """
+
+    name = "dnsmasq"
+    suffix = ".dnsmasq.conf"
+
+    def __init__(self, option: Optional[str] = None):
+        super().__init__()
+        self.upstream = option or "114.114.114.114"
+
+    def domain(self, value: str) -> Optional[str]:
+        return f"server=/{value}/{self.upstream}"
+
+
+class SingBoxEmitter(Emitter):
+    """sing-box 源规则集 JSON（version 2），可用 sing-box rule-set compile 转成 .srs。"""
+
+    name = "sing-box"
+    suffix = ".sing-box.json"
+    FIELDS = (
+        ("domain", "full"),
+        ("domain_suffix", "domain"),
+        ("domain_keyword", "keyword"),
+        ("domain_regex", "regexp"),
+    )
+
+    def chunks(self, source_name: str, lines: Iterable[str]) -> Iterator[bytes]:
+        # JSON 没有注释，不输出来源行；先数出各类规则条数，再逐个字段流式写出。
+        counts = Counter(kind for kind, _ in map(split_rule, lines))
+        present = [(field, kind) for field, kind in self.FIELDS if counts[kind]]
+        self.rules, self.skipped = sum(counts[kind] for _, kind in present), 0
+        if not present:
+            yield b'{\n  "version": 2,\n  "rules": []\n}\n'
+            return
+        yield b'{\n  "version": 2,\n  "rules": [\n    {\n'
+        for index, (field, kind) in enumerate(present):
+            buffer = [f'      "{field}": [\n']
+            size = 0
+            separator = "        "
+            for line_kind, value in map(split_rule, lines):
+                if line_kind != kind:
+                    continue
+                item = separator + json.dumps(value, ensure_ascii=False)
+                buffer.append(item)
+                size += len(item)
+                separator = ",\n        "
+                if size >= CHUNK_BYTES:
+                    yield "".join(buffer).encode("utf-8")
+                    buffer.clear()
+                    size = 0
+            buffer.append("\n      ]," if index < len(present) - 1 else "\n      ]")
+            buffer.append("\n")
+            yield "".join(buffer).encode("utf-8")
+        yield b"    }\n  ]\n}\n"
+
+
+class RuleSetEmitter(Emitter):
+    """可 mmap 查询的二进制规则集（见 ruleset.py）。"""
+
+    name = "ruleset"
+    suffix = RULESET_SUFFIX
+
+    def chunks(self, source_name: str, lines: Iterable[str]) -> Iterator[bytes]:
+        # 二进制规则集要整体排序建表，无论输入是否来自外部排序都在内存里编译。
+        lines = lines if isinstance(lines, list) else list(lines)
+        self.rules, self.skipped = len(lines), 0
+        yield compile_ruleset(lines)
+
+
+EMITTERS: Dict[str, Type[Emitter]] = {
+    emitter.name: emitter
+    for emitter in (
+        TextEmitter,
+        ClashEmitter,
+        MihomoEmitter,
+        SingBoxEmitter,
+        AdGuardEmitter,
+        HostsEmitter,
+        DnsmasqEmitter,
+        RuleSetEmitter,
+    )
+}
+
+
+def parse_formats(value: str) -> Tuple[str, ...]:
+    """解析逗号分隔的格式列表（如 "text,clash,dnsmasq=1.1.1.1"），去重并校验格式名和参数。"""
+    formats: List[str] = []
+    for spec in value.split(","):
+        spec = spec.strip()
+        if not spec:
+            continue
+        name = spec.partition("=")[0]
+        if name not in EMITTERS:
+            raise ValueError(f"未知的输出格式: {name}，可选: {', '.join(EMITTERS)}")
+        if spec not in formats:
+            formats.append(spec)
+    # 先建一遍 emitter，不接受参数的格式带了参数（如 "text=3"）在这里就报错，而不是到求值时。
+    create_emitters(formats)
+    return tuple(formats)
+
+
+def create_emitters(formats: Iterable[str]) -> List[Emitter]:
+    emitters: List[Emitter] = []
+    for spec in formats:
+        name, sep, option = spec.partition("=")
+        if name not in EMITTERS:
+            raise ValueError(f"未知的输出格式: {name}")
+        emitters.append(EMITTERS[name](option if sep else None))
+    return emitters
+
+
+class EmitStats:
+    """按格式累计输出文件数、规则数、跳过的规则数、字节数和耗时。"""
+
+    def __init__(self):
+        self.formats: Dict[str, List[float]] = {}
+
+    def add(self, name: str, rules: int, skipped: int, size: int, seconds: float):
+        totals = self.formats.setdefault(name, [0, 0, 0, 0, 0.0])
+        totals[0] += 1
+        totals[1] += rules
+        totals[2] += skipped
+        totals[3] += size
+        totals[4] += seconds
+
+    def merge(self, other: "EmitStats"):
+        for name, (files, rules, skipped, size, seconds) in other.formats.items():
+            totals = self.formats.setdefault(name, [0, 0, 0, 0, 0.0])
+            totals[0] += files
+            totals[1] += rules
+            totals[2] += skipped
+            totals[3] += size
+            totals[4] += seconds
+
+    def report(self):
+        for name, (files, rules, skipped, size, seconds) in self.formats.items():
+            info = f"🧩 {name}: {files} 个文件, {rules} 条规则, {size} 字节, 用时 {seconds:.3f}s"
+            if skipped:
+                info += f"（跳过 {skipped} 条不支持的规则）"
+            print(info)
@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+import weakref
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Union
+
+from .merge import merge_unique, sort_unique
+
+
+class MergedRuns:
+    """若干已排序序列的归并视图：每次迭代都用 merge_unique 重新归并，不在内存里保存结果。"""
+
+    def __init__(self, runs: Iterable[Iterable[str]]):
+        self.runs = list(runs)
+
+    def __iter__(self) -> Iterator[str]:
+        return merge_unique(self.runs)
+
+
+class SortedRun:
+    """写在临时文件里的一个有序去重序列，可反复迭代，len() 不必读文件。
+
+    外部排序模式下代替内存中的分组列表，供父文件 include 时按引用归并；
+    对象被回收（或调用 close()）时删除文件。
+    """
+
+    def __init__(self, lines: Iterable[str]):
+        fd, path = tempfile.mkstemp(prefix="network-rules-run-", suffix=".run")
+        self.path = Path(path)
+        self._remove = weakref.finalize(self, os.remove, path)
+        self.count = 0
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as file:
+            for line in lines:
+                file.write(line)
+                self.count += 1
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[str]:
+        with self.path.open("r", encoding="utf-8", newline="") as file:
+            yield from file
+
+    def close(self):
+        self._remove()
+
+
+class ExternalSorter:
+    """有界内存的排序去重。
+
+    行先攒在内存缓冲里，达到 max_lines 行时排序去重，写成临时目录中的一个 run 文件；
+    迭代时把磁盘上的 runs 与剩余缓冲逐行归并，产出有序且去重的行。
+    可以多次迭代（每种输出格式各读一遍），每次都重新打开 run 文件；close() 删除临时目录。
+    行须以换行结尾（entry_to_domain 渲染出的格式）。
+    """
+
+    def __init__(self, max_lines: int):
+        if max_lines < 1:
+            raise ValueError(f"max_lines 必须为正数: {max_lines}")
+        self.max_lines = max_lines
+        self.buffer: List[str] = []
+        self.run_paths: List[Path] = []
+        self.spill_dir: Optional[Path] = None
+        self.spilled_lines = 0
+
+    def add(self, line: str):
+        self.buffer.append(line)
+        if len(self.buffer) >= self.max_lines:
+            self._spill()
+
+    def extend(self, lines: Iterable[str]):
+        for line in lines:
+            self.add(line)
+
+    def _spill(self):
+        if self.spill_dir is None:
+            self.spill_dir = Path(tempfile.mkdtemp(prefix="network-rules-sort-"))
+        self.buffer.sort()
+        path = self.spill_dir / f"{len(self.run_paths)}.run"
+        with path.open("w", encoding="utf-8", newline="") as file:
+            for line in merge_unique([self.buffer]):
+                file.write(line)
+                self.spilled_lines += 1
+        self.run_paths.append(path)
+        self.buffer.clear()
+
+    @property
+    def runs(self) -> int:
+        return len(self.run_paths)
+
+    def __iter__(self) -> Iterator[str]:
+        self.buffer.sort()
+        with ExitStack() as stack:
+            files = [
+                stack.enter_context(path.open("r", encoding="utf-8", newline=""))
+                for path in self.run_paths
+            ]
+            yield from merge_unique([*files, self.buffer])
+
+    def finish(self) -> Union[List[str], SortedRun]:
+        """取出最终的有序去重结果：从未溢出时就是内存里的列表，否则归并成一个 SortedRun。"""
+        if not self.run_paths:
+            lines = sort_unique(self.buffer)
+            self.buffer = []
+            return lines
+        return SortedRun(self)
+
+    def __enter__(self) -> "ExternalSorter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.spill_dir is not None:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+            self.spill_dir = None
+        self.run_paths.clear()
+        self.buffer.clear()
@@ -4,7 +4,9 @@ import shutil
 import sys
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+from .profiling import add_profile_arguments, finish_profile, get_profiler, start_profile
 
 
 def count_valid_lines(file_path: Path) -> int:
@@ -18,17 +20,30 @@ def count_valid_lines(file_path: Path) -> int:
     return count
 
 
-def collect_file_data(release_dir: Path) -> List[Dict[str, object]]:
+def collect_file_data(
+    release_dir: Path,
+    line_counts: Optional[Dict[str, int]] = None,
+) -> List[Dict[str, object]]:
+    """line_counts 为构建阶段已知的行数，命中的文件不再重新读取计数。"""
+    line_counts = line_counts or {}
     result: List[Dict[str, object]] = []
+    profiler = get_profiler()
     for file_path in sorted(release_dir.glob("*.txt")):
-        modified = datetime.fromtimestamp(
-            file_path.stat().st_mtime, tz=timezone.utc
-        ).isoformat(timespec="seconds")
+        with profiler.span("count", cat="file", file=file_path.name) as span:
+            stat = file_path.stat()
+            modified = datetime.fromtimestamp(
+                stat.st_mtime, tz=timezone.utc
+            ).isoformat(timespec="seconds")
+            lines = line_counts.get(file_path.name)
+            if lines is None:
+                lines = count_valid_lines(file_path)
+                span["bytes_read"] = stat.st_size
+            span["entries"] = lines
         result.append(
             {
                 "name": file_path.name,
                 "modified": modified,
-                "lines": count_valid_lines(file_path),
+                "lines": lines,
             }
         )
     return result
@@ -46,12 +61,22 @@ def _write_filelist_js(file_data: List[Dict[str, object]], output_file: Path, re
     output_file.write_text("\n".join(lines), encoding="utf-8")
 
 
-def generate_filelist(release_dir: Path, output_dir: Path, repo_name: str) -> None:
+def generate_filelist(
+    release_dir: Path,
+    output_dir: Path,
+    repo_name: str,
+    line_counts: Optional[Dict[str, int]] = None,
+) -> None:
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    file_data = collect_file_data(release_dir)
+    profiler = get_profiler()
+    with profiler.span("collect") as span:
+        file_data = collect_file_data(release_dir, line_counts)
+        span["files"] = len(file_data)
     file_list_path = output_dir / "fileList.js"
-    _write_filelist_js(file_data, file_list_path, repo_name)
+    with profiler.span("write", cat="io", file=file_list_path.name) as span:
+        _write_filelist_js(file_data, file_list_path, repo_name)
+        span["bytes_written"] = file_list_path.stat().st_size
 
     project_root = Path(__file__).resolve().parent.parent
     index_source = project_root / "index.html"
@@ -68,7 +93,9 @@ def main() -> int:
     parser.add_argument("release_dir", type=str, help="规则输出目录")
     parser.add_argument("output_dir", type=str, help="页面输出目录")
     parser.add_argument("--repo-name", type=str, default="unknown/repo", help="GitHub 仓库名 owner/repo")
+    add_profile_arguments(parser)
     args = parser.parse_args()
+    start_profile(args.profile)
 
     release_dir = Path(args.release_dir)
     output_dir = Path(args.output_dir)
@@ -78,6 +105,7 @@ def main() -> int:
         return 1
 
     generate_filelist(release_dir, output_dir, args.repo_name)
+    finish_profile(args.profile, args.profile_top)
     return 0
 
 
@@ -0,0 +1,106 @@
+from dataclasses import dataclass, field
+from itertools import chain
+from pathlib import Path
+from typing import AbstractSet, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .parser import format_line, parse_doc
+
+Token = Tuple[str, str, AbstractSet[str], AbstractSet[str]]
+
+
+@dataclass
+class IncludeGraph:
+    # 每个文件只解析一次：tokens 保存 format_line 结果，edges 保存去重后的 include 目标。
+    tokens: Dict[str, List[Token]] = field(default_factory=dict)
+    edges: Dict[str, List[str]] = field(default_factory=dict)
+
+    def build_order(self, roots: Iterable[str] = ()) -> Tuple[List[str], Dict[str, Set[str]]]:
+        """返回子节点在前的求值顺序，以及每个节点需要按循环引用处理的 include 目标。
+
+        依次从 roots 和其余按名称排序的文件出发做深度优先遍历，后序即求值顺序。
+        只剪掉指回当前 include 路径上文件的回边，与逐个文件递归处理时遇到循环引用的结果一致；
+        环上其他边保留，include 环成员的文件仍能拿到环里其余文件的规则。
+        """
+        order: List[str] = []
+        cyclic: Dict[str, Set[str]] = {}
+        on_path: Set[str] = set()
+        done: Set[str] = set()
+        for root in chain(roots, sorted(self.edges)):
+            if root in done or root in on_path:
+                continue
+            on_path.add(root)
+            work: List[Tuple[str, Iterator[str]]] = [(root, iter(self.edges.get(root, ())))]
+            while work:
+                name, targets = work[-1]
+                for target in targets:
+                    if target in on_path:
+                        cyclic.setdefault(name, set()).add(target)
+                    elif target not in done:
+                        on_path.add(target)
+                        work.append((target, iter(self.edges.get(target, ()))))
+                        break
+                else:
+                    work.pop()
+                    on_path.discard(name)
+                    done.add(name)
+                    order.append(name)
+        return order, cyclic
+
+    def build_layers(self) -> Tuple[List[List[str]], Dict[str, Set[str]]]:
+        """按拓扑层分组：同一层内的文件互不依赖，可以并行求值。"""
+        order, cyclic = self.build_order()
+        depth: Dict[str, int] = {}
+        layers: List[List[str]] = []
+        for name in order:
+            cut = cyclic.get(name, set())
+            level = 1 + max(
+                (depth[target] for target in self.edges[name] if target not in cut),
+                default=-1,
+            )
+            depth[name] = level
+            if level == len(layers):
+                layers.append([])
+            layers[level].append(name)
+        for layer in layers:
+            layer.sort()
+        return layers, cyclic
+
+
+def tokenize(lines: Iterable[str]) -> List[Token]:
+    return [format_line(line) for line in lines]
+
+
+def include_targets(tokens: List[Token]) -> List[str]:
+    targets: List[str] = []
+    seen: Set[str] = set()
+    for type_prefix, value, _, _ in tokens:
+        if type_prefix == "include" and value not in seen:
+            seen.add(value)
+            targets.append(value)
+    return targets
+
+
+def scan_include_graph(
+    source_dir: Path,
+    roots: Iterable[str],
+    tokens: Optional[Dict[str, List[Token]]] = None,
+    loader: Optional[Callable[[str], List[Token]]] = None,
+) -> IncludeGraph:
+    """从 roots 出发迭代扫描所有可达文件，构建 include 图。"""
+    if loader is None:
+        def loader(name: str) -> List[Token]:
+            return parse_doc(source_dir / name)
+
+    graph = IncludeGraph()
+    known = dict(tokens or {})
+    stack: List[str] = list(roots)
+    while stack:
+        name = stack.pop()
+        if name in graph.tokens:
+            continue
+        doc_tokens = known[name] if name in known else loader(name)
+        graph.tokens[name] = doc_tokens
+        targets = include_targets(doc_tokens)
+        graph.edges[name] = targets
+        stack.extend(target for target in targets if target not in graph.tokens)
+    return graph
@@ -1,11 +1,18 @@
 import argparse
 import json
 import os
+import tarfile
+import zipfile
 from pathlib import Path
-from typing import Any, List, Dict, Tuple
+from typing import Any, Dict, Optional
 
-from .parser import format_doc, Entry
-from .processor import DocumentProcessor
+from .build import BuildEngine
+from .cache import DEFAULT_MAX_BYTES, load_parse_cache
+from .customizations import IncludeOverlay, load_customization_config, resolve_customization_path
+from .emitters import EMITTERS, parse_formats
+from .profiling import add_profile_arguments, finish_profile, start_profile
+from .sources import open_source
+from .writer import LINK_MODES
 
 
 def resolve_policy_path(policy_file_env: str) -> Path:
@@ -16,6 +23,18 @@ def resolve_policy_path(policy_file_env: str) -> Path:
     return project_root / raw_path
 
 
+def env_int(name: str) -> Optional[int]:
+    """读取整数环境变量；未设置时返回 None，值非法时提示后同样按未设置处理。"""
+    value = os.environ.get(name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        print(f"‼️变量错误: {name}")
+        return None
+
+
 def load_tag_policies(policy_path: Path) -> Dict[str, Dict[str, bool]]:
     try:
         with policy_path.open("r", encoding="utf-8") as file:
@@ -50,7 +69,97 @@ def load_tag_policies(policy_path: Path) -> Dict[str, Dict[str, bool]]:
     return normalized
 
 
-def main():
+def add_build_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('source_dir', type=str, help='数据目录，或包含 data/ 的 .tar.gz / .zip 归档')
+    parser.add_argument('release_dir', type=str, help='输出目录')
+    parser.add_argument(
+        '--source-subdir',
+        type=str,
+        default='data',
+        help='从归档或 git 仓库读取时源文件所在的目录名，默认 data',
+    )
+    parser.add_argument(
+        '--git-rev',
+        type=str,
+        default=None,
+        help='把 source_dir 当作 git 仓库，直接读取该版本（如 HEAD）的源文件，不依赖工作区',
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=1,
+        help='并行进程数，按 include 拓扑层调度；0 表示使用全部 CPU，默认 1',
+    )
+    parser.add_argument(
+        '--manifest',
+        type=str,
+        default=os.environ.get('BUILD_MANIFEST'),
+        help='增量构建清单路径，默认读取 BUILD_MANIFEST；未设置时执行全量构建',
+    )
+    parser.add_argument(
+        '--parse-cache',
+        type=str,
+        default=os.environ.get('PARSE_CACHE'),
+        help='解析缓存文件路径，默认读取 PARSE_CACHE；未设置时不使用缓存',
+    )
+    parser.add_argument(
+        '--parse-cache-max-mb',
+        type=int,
+        default=DEFAULT_MAX_BYTES // (1024 * 1024),
+        help='解析缓存大小上限（MB），超出后淘汰最久未使用的记录',
+    )
+    parser.add_argument(
+        '--max-memory',
+        type=int,
+        default=env_int('BUILD_MAX_MEMORY_MB'),
+        help='求值结果常驻内存上限（MB），超出后把仍被依赖的结果溢出到临时目录；默认读取 BUILD_MAX_MEMORY_MB，未设置时不限制',
+    )
+    parser.add_argument(
+        '--spill-lines',
+        type=int,
+        default=env_int('BUILD_SPILL_LINES'),
+        help=(
+            '外部排序模式：源文件逐行解析，规则行按属性分组和标签页每攒够这么多行就排序后溢出到临时文件，'
+            '合并结果写文件时逐行归并、不整体载入内存（此模式不使用 --parse-cache）；'
+            '默认读取 BUILD_SPILL_LINES，未设置时全部在内存中排序'
+        ),
+    )
+    parser.add_argument(
+        '--optimize',
+        action='store_true',
+        help='删除已被更宽 domain 规则覆盖的 full/domain 行及重复行',
+    )
+    parser.add_argument(
+        '--formats',
+        type=str,
+        default=os.environ.get('OUTPUT_FORMATS', 'text'),
+        help=(
+            '逗号分隔的输出格式，可选 ' + ', '.join(EMITTERS)
+            + '；dnsmasq=IP 指定上游。默认读取 OUTPUT_FORMATS，未设置时只输出 text'
+        ),
+    )
+    parser.add_argument(
+        '--compile',
+        action='store_true',
+        help='为每个列表和标签页额外输出可 mmap 查询的二进制规则集（.ruleset），等同于在 --formats 中加入 ruleset',
+    )
+    parser.add_argument(
+        '--customizations',
+        type=str,
+        default=os.environ.get('CUSTOMIZATION_FILE', 'config/customizations.json'),
+        help='预处理配置路径，exclude_includes 在内存中应用，不改写数据目录',
+    )
+    parser.add_argument(
+        '--link-duplicates',
+        choices=LINK_MODES,
+        default=os.environ.get('LINK_DUPLICATES') or None,
+        help='内容相同的输出只保存一份，其余用硬链接或符号链接指向它；默认读取 LINK_DUPLICATES',
+    )
+    add_profile_arguments(parser)
+
+
+def create_engine(args: argparse.Namespace) -> Optional[BuildEngine]:
+    """按命令行参数和环境变量准备构建引擎；配置有误时打印原因并返回 None。"""
     min_lines_env: str = os.environ.get("MIN_LINES", "1")
     policy_file_env: str = os.environ.get("TAG_POLICY_FILE", "config/tag_policies.json")
     
@@ -60,20 +169,18 @@ def main():
         print("‼️变量错误: MIN_LINES")
         min_lines = 1
 
-    parser = argparse.ArgumentParser(
-        description='把 v2fly/domain-list-community 转换为 surge、clash 的 domain set'
-    )
-    parser.add_argument('source_dir', type=str, help='数据目录')
-    parser.add_argument('release_dir', type=str, help='输出目录')
-    args = parser.parse_args()
-
     source_dir: Path = Path(args.source_dir)
     release_dir: Path = Path(args.release_dir)
 
-    print(f"📂 扫描目录: {source_dir.absolute()}")
-    if not source_dir.is_dir():
+    try:
+        source = open_source(source_dir, args.source_subdir, args.git_rev)
+    except FileNotFoundError:
         print(f"❌ 数据目录不存在: '{source_dir}'")
-        return
+        return None
+    except (tarfile.TarError, zipfile.BadZipFile, ValueError) as err:
+        print(f"❌ 数据源无法读取: '{source_dir}': {err}")
+        return None
+    print(f"📂 扫描目录: {source.describe()}")
 
     resolved_policy_path = resolve_policy_path(policy_file_env)
 
@@ -81,35 +188,78 @@ def main():
         tag_policies = load_tag_policies(resolved_policy_path)
     except json.JSONDecodeError:
         print(f"❌ TAG_POLICY_FILE JSON 解析失败: 原始值='{policy_file_env}', 解析路径='{resolved_policy_path}'")
-        return
+        return None
     except ValueError as err:
         print(f"❌ TAG_POLICY_FILE 配置非法: {err}; 原始值='{policy_file_env}', 解析路径='{resolved_policy_path}'")
-        return
+        return None
+
+    try:
+        formats = parse_formats(args.formats)
+    except ValueError as err:
+        print(f"❌ 输出格式非法: {err}")
+        return None
+    if args.spill_lines is not None and args.spill_lines < 1:
+        print(f"❌ --spill-lines 必须为正整数: {args.spill_lines}")
+        return None
+    if args.compile and "ruleset" not in formats:
+        formats += ("ruleset",)
+
+    customization_path = resolve_customization_path(args.customizations)
+    try:
+        overlay = IncludeOverlay.from_config(load_customization_config(customization_path))
+    except (json.JSONDecodeError, ValueError) as err:
+        print(f"❌ 自定义配置非法: {err}; 解析路径='{customization_path}'")
+        return None
 
     release_dir.mkdir(parents=True, exist_ok=True)
     
-    processed: Dict[str, Tuple[List[str], List[Entry]]] = {}
-    count = 0
-    
-    for source_file in source_dir.glob('*'):
-        if source_file.is_file() and source_file.suffix == "":
-            content = format_doc(source_file)
-            doc = DocumentProcessor(
-                content,
-                source_dir,
-                release_dir,
-                [source_file.stem],
-                processed,
-                min_lines,
-                tag_policies=tag_policies
-            )
-            doc.process()
-            count += 1
-    
+    return BuildEngine(
+        source_dir,
+        release_dir,
+        min_lines,
+        tag_policies=tag_policies,
+        jobs=args.jobs,
+        manifest_path=Path(args.manifest) if args.manifest else None,
+        parse_cache=load_parse_cache(
+            Path(args.parse_cache) if args.parse_cache else None,
+            args.parse_cache_max_mb * 1024 * 1024,
+        ),
+        optimize=args.optimize,
+        formats=formats,
+        overlay=overlay,
+        link_mode=args.link_duplicates,
+        source=source,
+        max_memory=args.max_memory * 1024 * 1024 if args.max_memory is not None else None,
+        spill_lines=args.spill_lines
+    )
+
+
+def run_build(engine: BuildEngine) -> int:
+    try:
+        count = engine.run(engine.source.names())
+    finally:
+        engine.source.close()
+
     if count == 0:
         print("⚠️ 未发现任何待处理文件")
     else:
         print(f"🎉 全部完成! 处理了 {count} 个文件")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='把 v2fly/domain-list-community 转换为 surge、clash 的 domain set'
+    )
+    add_build_arguments(parser)
+    args = parser.parse_args()
+    start_profile(args.profile)
+
+    engine = create_engine(args)
+    if engine is None:
+        return
+    run_build(engine)
+    finish_profile(args.profile, args.profile_top)
 
 
 if __name__ == '__main__':
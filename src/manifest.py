@@ -0,0 +1,294 @@
+import hashlib
+import io
+import json
+import marshal
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Set
+
+from .graph import IncludeGraph
+from .processor import PackedEntries
+
+MANIFEST_VERSION = 3
+# 条目文件开头的随机标识，与清单里记录的一致才说明两者出自同一次保存。
+ENTRIES_ID_BYTES = 16
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(file_path: Path) -> str:
+    try:
+        return content_hash(file_path.read_bytes())
+    except FileNotFoundError:
+        return ""
+
+
+@lru_cache(maxsize=None)
+def code_hash() -> str:
+    """src 下全部 .py 源码的哈希：渲染、合并等逻辑改动后，未变化的源文件也要重新输出。"""
+    digest = hashlib.sha256()
+    for path in sorted(Path(__file__).parent.glob("*.py")):
+        digest.update(path.name.encode("utf-8") + b"\0")
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def build_fingerprint(options: Dict[str, Any]) -> str:
+    # 影响输出内容的构建参数和代码版本，变化后所有文件都要重新求值。
+    payload = {"version": MANIFEST_VERSION, "code": code_hash(), "options": options}
+    return content_hash(json.dumps(payload, sort_keys=True).encode("utf-8"))
+
+
+def include_closures(
+    graph: IncludeGraph,
+    order: List[str],
+    cyclic: Dict[str, Set[str]],
+) -> Dict[str, List[str]]:
+    """每个文件实际参与求值的传递 include 集合（循环引用被剪掉的边不计入）。"""
+    closures: Dict[str, Set[str]] = {}
+    for name in order:
+        cut = cyclic.get(name, set())
+        closure: Set[str] = set()
+        for target in graph.edges[name]:
+            if target in cut:
+                continue
+            closure.add(target)
+            closure.update(closures[target])
+        closures[name] = closure
+    return {name: sorted(closure) for name, closure in closures.items()}
+
+
+def _recorded_outputs(raw: Dict[str, Any]) -> Set[str]:
+    # 旧版本清单的结构可能不同，只取得到的部分。
+    files = raw.get("files")
+    if not isinstance(files, dict):
+        return set()
+    return {
+        output
+        for record in files.values() if isinstance(record, dict)
+        for output in record.get("outputs") or ()
+        if isinstance(output, str)
+    }
+
+
+class BuildManifest:
+    """记录每个源文件的内容哈希、include 闭包和输出文件哈希，用于增量构建。
+
+    求值后的压缩条目单独保存在同名 .marshal 文件里，未变化的子文件无需重新求值。
+    条目文件是一段段 marshal 数据，清单只记每个文件的 [偏移, 长度]：读取时按需定位，
+    本次求值的新条目边构建边追加到下一代文件，save 时再把仍有效的旧条目原样拷过去，
+    整个语料的条目从不同时载入内存。
+    """
+
+    def __init__(self, path: Path, fingerprint: str):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.files: Dict[str, Dict[str, Any]] = {}
+        # 上次保存的条目文件中每个源文件的 [偏移, 长度]。
+        self.offsets: Dict[str, List[int]] = {}
+        self.entries_id = ""
+        # 本次写入下一代条目文件的 [偏移, 长度]。
+        self.stored: Dict[str, List[int]] = {}
+        self.next_id = ""
+        self._reader: Optional[BinaryIO] = None
+        self._next: Optional[BinaryIO] = None
+        # 旧清单因指纹或版本不符被弃用时，它记录过的输出文件名；本次没有再写出的在构建后删除。
+        self.leftover_outputs: Set[str] = set()
+
+    @property
+    def entries_path(self) -> Path:
+        return self.path.with_suffix(".marshal")
+
+    @property
+    def next_entries_path(self) -> Path:
+        return self.path.with_suffix(".marshal.tmp")
+
+    @classmethod
+    def load(cls, path: Path, fingerprint: str) -> "BuildManifest":
+        manifest = cls(path, fingerprint)
+        try:
+            with path.open("r", encoding="utf-8") as file:
+                raw: Any = json.load(file)
+            with manifest.entries_path.open("rb") as file:
+                entries_id = file.read(ENTRIES_ID_BYTES).hex()
+        except FileNotFoundError:
+            return manifest
+        except json.JSONDecodeError as err:
+            print(f"⚠️ 增量清单损坏，执行全量构建: {err}")
+            return manifest
+
+        if not isinstance(raw, dict):
+            print("⚠️ 增量清单损坏，执行全量构建")
+            return manifest
+        if raw.get("version") != MANIFEST_VERSION or raw.get("fingerprint") != fingerprint:
+            print("ℹ️ 构建参数或清单版本变化，执行全量构建")
+            manifest.leftover_outputs = _recorded_outputs(raw)
+            return manifest
+        if raw.get("entries_id") != entries_id or not isinstance(raw.get("entries"), dict):
+            print("⚠️ 增量清单与条目文件不匹配，执行全量构建")
+            manifest.leftover_outputs = _recorded_outputs(raw)
+            return manifest
+
+        manifest.files = raw.get("files", {})
+        manifest.offsets = raw["entries"]
+        manifest.entries_id = entries_id
+        return manifest
+
+    def has_entries(self, name: str) -> bool:
+        return name in self.offsets
+
+    def load_entries(self, name: str) -> PackedEntries:
+        """读取上次保存的 name 的压缩条目；分段保存的条目在这里拼回一份。"""
+        offset, size = self.offsets[name]
+        if self._reader is None:
+            self._reader = self.entries_path.open("rb")
+        self._reader.seek(offset)
+        data = io.BytesIO(self._reader.read(size))
+        entries: PackedEntries = []
+        while data.tell() < size:
+            entries.extend(marshal.load(data))
+        return entries
+
+    def store_entries(self, name: str, entries: PackedEntries):
+        """把本次求值的压缩条目追加到下一代条目文件，调用方无需继续持有。"""
+        self._append(name, marshal.dumps(entries))
+
+    def store_entry_chunks(self, name: str, chunks: Iterable[PackedEntries]):
+        """与 store_entries 相同，但条目分段给出、逐段写入（见 EvaluatedSet.pack_chunks）。"""
+        file = self._open_next()
+        offset = file.tell()
+        for chunk in chunks:
+            marshal.dump(chunk, file)
+        self.stored[name] = [offset, file.tell() - offset]
+
+    def _open_next(self) -> BinaryIO:
+        if self._next is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.next_id = os.urandom(ENTRIES_ID_BYTES).hex()
+            self._next = self.next_entries_path.open("wb")
+            self._next.write(bytes.fromhex(self.next_id))
+        return self._next
+
+    def _append(self, name: str, data: bytes):
+        file = self._open_next()
+        self.stored[name] = [file.tell(), len(data)]
+        file.write(data)
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 未重新求值的文件沿用上次的条目：按偏移原样拷贝，不解码。
+        for name in self.files:
+            if name in self.stored or name not in self.offsets:
+                continue
+            offset, size = self.offsets[name]
+            if self._reader is None:
+                self._reader = self.entries_path.open("rb")
+            self._reader.seek(offset)
+            self._append(name, self._reader.read(size))
+        self._open_next()
+        self.close()
+        os.replace(self.next_entries_path, self.entries_path)
+        self.offsets, self.stored = self.stored, {}
+        self.entries_id = self.next_id
+        payload = {
+            "version": MANIFEST_VERSION,
+            "fingerprint": self.fingerprint,
+            "files": self.files,
+            "entries": self.offsets,
+            "entries_id": self.entries_id,
+        }
+        with self.path.open("w", encoding="utf-8") as file:
+            json.dump(payload, file, ensure_ascii=False, indent=1, sort_keys=True)
+            file.write("\n")
+
+    def close(self):
+        for handle in (self._reader, self._next):
+            if handle is not None:
+                handle.close()
+        self._reader = self._next = None
+
+    def plan(
+        self,
+        order: List[str],
+        cyclic: Dict[str, Set[str]],
+        graph: IncludeGraph,
+        digests: Dict[str, str],
+        closures: Dict[str, List[str]],
+        release_dir: Path,
+    ) -> Set[str]:
+        """返回需要重新求值的文件：自身或闭包内文件变化，或输出文件缺失、被改动。"""
+        changed: Set[str] = set()
+        dirty: Set[str] = set()
+        for name in order:
+            record = self.files.get(name)
+            cut = cyclic.get(name, set())
+            if (
+                record is None
+                or not self.has_entries(name)
+                or record.get("hash") != digests.get(name, "")
+                or record.get("closure") != closures[name]
+                or any(target in changed for target in graph.edges[name] if target not in cut)
+            ):
+                changed.add(name)
+                dirty.add(name)
+                continue
+            outputs: Dict[str, str] = record.get("outputs", {})
+            if any(file_hash(release_dir / output) != digest for output, digest in outputs.items()):
+                dirty.add(name)
+        return dirty
+
+    def record(
+        self,
+        name: str,
+        digest: str,
+        closure: List[str],
+        outputs: Dict[str, str],
+        lines: Optional[Dict[str, int]] = None,
+    ):
+        """记录 name 本次的构建结果；压缩条目须已通过 store_entries 写入。"""
+        self.files[name] = {
+            "hash": digest,
+            "closure": closure,
+            "outputs": outputs,
+            "lines": lines or {},
+        }
+
+    def previous_outputs(self, name: str) -> Dict[str, str]:
+        record = self.files.get(name)
+        if record is None:
+            return {}
+        return dict(record.get("outputs", {}))
+
+    def output_hashes(self) -> Dict[str, str]:
+        """上次构建所有输出文件的内容哈希，供写入时判断是否需要重写。"""
+        hashes: Dict[str, str] = {}
+        for record in self.files.values():
+            hashes.update(record.get("outputs", {}))
+        return hashes
+
+    def previous_lines(self, name: str) -> Dict[str, int]:
+        """上次构建写出的每个输出文件的有效行数，旧清单里没有时返回空。"""
+        record = self.files.get(name)
+        if record is None:
+            return {}
+        return dict(record.get("lines", {}))
+
+    def forget(self, names: Iterable[str]) -> List[str]:
+        """移除不再存在的源文件记录，返回它们遗留的输出文件名。"""
+        removed: List[str] = []
+        for name in list(names):
+            record = self.files.pop(name, None)
+            self.offsets.pop(name, None)
+            self.stored.pop(name, None)
+            if record is not None:
+                removed.extend(record.get("outputs", {}))
+        return removed
+
+
+def load_manifest(path: Optional[Path], options: Dict[str, Any]) -> Optional[BuildManifest]:
+    if path is None:
+        return None
+    return BuildManifest.load(path, build_fingerprint(options))
@@ -0,0 +1,288 @@
+import argparse
+import contextlib
+import re
+import sys
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Pattern, Set, Tuple
+
+from .processor import EvaluatedSet
+from .trie import reversed_labels
+
+# 节点上的 domain / full 规则标记用专门的对象作键，不会与任何标签（包括 "a..com" 切出的空标签）相撞。
+DOMAIN_MARK = object()
+FULL_MARK = object()
+
+
+def normalize_domain(value: str) -> str:
+    return value.strip().rstrip(".").lower()
+
+
+class KeywordAutomaton:
+    """Aho-Corasick 自动机：一次扫描找出文本中出现的全部 keyword，与 keyword 数量无关。"""
+
+    def __init__(self):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[Set[int]] = [set()]
+        self.built = True
+
+    def __len__(self) -> int:
+        return len(self.goto) - 1
+
+    def add(self, keyword: str, label: int):
+        state = 0
+        for char in keyword:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(set())
+            state = next_state
+        self.out[state].add(label)
+        self.built = False
+
+    def build(self):
+        # 按层 BFS 计算失败链接，并把失败链上的输出并入当前节点，查询时不再沿链回溯输出。
+        queue = deque(self.goto[0].values())
+        for state in queue:
+            self.fail[state] = 0
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.out[next_state] |= self.out[self.fail[next_state]]
+                queue.append(next_state)
+        self.built = True
+
+    def search(self, text: str) -> Set[int]:
+        if not self.built:
+            self.build()
+        goto, fail, out = self.goto, self.fail, self.out
+        found: Set[int] = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found |= out[state]
+        return found
+
+
+class MatchStats:
+    def __init__(self):
+        self.domains = 0
+        self.matched = 0
+        self.seconds = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.domains / self.seconds if self.seconds else 0.0
+
+    def report(self, file: Any = None):
+        print(
+            f"🔎 匹配完成: {self.domains} 个域名, 命中 {self.matched} 个, "
+            f"用时 {self.seconds:.3f}s ({self.rate:.0f} 个/秒)",
+            file=file,
+        )
+
+
+class DomainMatcher:
+    """在进程内判断域名命中哪些列表。
+
+    所有列表的 domain / full 规则共用一棵反转标签后缀树，节点上记录命中的列表编号，
+    一次查询只需沿域名标签走一遍；keyword 规则共用一个 Aho-Corasick 自动机。
+    """
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self.root: Dict[Any, Any] = {}
+        self.keywords = KeywordAutomaton()
+        self.patterns: List[Tuple[Pattern[str], int]] = []
+        self.rules = 0
+
+    def _list_id(self, name: str) -> int:
+        list_id = self.ids.get(name)
+        if list_id is None:
+            list_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return list_id
+
+    def _add_suffix(self, value: str, mark: object, list_id: int):
+        node = self.root
+        for label in reversed_labels(normalize_domain(value)):
+            node = node.setdefault(label, {})
+        node.setdefault(mark, set()).add(list_id)
+
+    def add_lines(self, name: str, lines: Iterable[str]):
+        """加入一个列表，lines 为 release 文本格式（.domain / full / keyword: / regexp:）。"""
+        list_id = self._list_id(name)
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("keyword:"):
+                self.keywords.add(line[8:].lower(), list_id)
+            elif line.startswith("regexp:"):
+                self.patterns.append((re.compile(line[7:]), list_id))
+            elif line.startswith("."):
+                self._add_suffix(line[1:], DOMAIN_MARK, list_id)
+            else:
+                self._add_suffix(line, FULL_MARK, list_id)
+            self.rules += 1
+
+    def add_evaluated(self, name: str, evaluated: EvaluatedSet):
+        self.add_lines(name, evaluated.merged())
+
+    @classmethod
+    def from_release_dir(cls, release_dir: Path, names: Optional[Iterable[str]] = None) -> "DomainMatcher":
+        """读取 release 目录的 .txt 输出；names 为列表名（如 cn、category-ads-all@ads），默认全部。"""
+        matcher = cls()
+        if names is None:
+            paths = sorted(release_dir.glob("*.txt"))
+        else:
+            paths = [release_dir / f"{name}.txt" for name in names]
+        for path in paths:
+            with path.open("r", encoding="utf-8") as file:
+                matcher.add_lines(path.name[:-4], file)
+        return matcher
+
+    @classmethod
+    def from_processed(
+        cls,
+        processed: Mapping[str, Tuple[List[str], EvaluatedSet]],
+        names: Optional[Iterable[str]] = None,
+    ) -> "DomainMatcher":
+        """直接使用构建引擎求值后的结果，不经过磁盘；不含 @tag 页面。
+
+        BuildEngine 默认在父文件用完后释放结果，需以 keep_evaluated=True 构建后传入 engine.processed。
+        """
+        matcher = cls()
+        for name in sorted(processed) if names is None else names:
+            matcher.add_evaluated(name, processed[name][1])
+        return matcher
+
+    def match_ids(self, domain: str) -> Set[int]:
+        found: Set[int] = set()
+        node = self.root
+        for label in reversed_labels(domain):
+            node = node.get(label)
+            if node is None:
+                break
+            if DOMAIN_MARK in node:
+                found |= node[DOMAIN_MARK]
+        else:
+            if FULL_MARK in node:
+                found |= node[FULL_MARK]
+        if len(self.keywords):
+            found |= self.keywords.search(domain)
+        for pattern, list_id in self.patterns:
+            if list_id not in found and pattern.search(domain):
+                found.add(list_id)
+        return found
+
+    def match(self, domain: str) -> List[str]:
+        """返回命中的列表名，按加入顺序排列。"""
+        domain = normalize_domain(domain)
+        if not domain:
+            return []
+        return [self.names[list_id] for list_id in sorted(self.match_ids(domain))]
+
+    def matches(self, domain: str, name: str) -> bool:
+        list_id = self.ids.get(name)
+        domain = normalize_domain(domain)
+        return list_id is not None and bool(domain) and list_id in self.match_ids(domain)
+
+    def match_many(
+        self,
+        domains: Iterable[str],
+        stats: Optional[MatchStats] = None,
+    ) -> Iterator[Tuple[str, List[str]]]:
+        """逐个产出 (域名, 命中列表)；stats 只累计匹配本身的耗时，不含调用方处理结果的时间。"""
+        stats = stats if stats is not None else MatchStats()
+        clock = time.perf_counter
+        for domain in domains:
+            start = clock()
+            result = self.match(domain)
+            stats.seconds += clock() - start
+            stats.domains += 1
+            if result:
+                stats.matched += 1
+            yield domain, result
+
+
+def _read_domains(lines: Iterable[str]) -> Iterator[str]:
+    # 每行取第一列，便于直接回放 DNS 日志导出的 "域名 其他字段" 格式。
+    for line in lines:
+        fields = line.split()
+        if fields and not fields[0].startswith("#"):
+            yield fields[0]
+
+
+def add_match_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("release_dir", type=str, help="规则输出目录")
+    parser.add_argument("domains", nargs="*", help="待匹配的域名；不提供时从 --input 读取")
+    parser.add_argument("--input", type=str, default=None, help="域名文件，每行第一列为域名；- 表示标准输入")
+    parser.add_argument(
+        "--lists",
+        type=str,
+        default=None,
+        help="只加载这些列表，逗号分隔（如 cn,category-ads-all@ads），默认加载全部",
+    )
+    parser.add_argument("--matched-only", action="store_true", help="只输出命中的域名")
+
+
+def run_match(args: argparse.Namespace) -> int:
+    release_dir = Path(args.release_dir)
+    if not release_dir.is_dir():
+        print(f"❌ release 目录不存在: '{release_dir}'", file=sys.stderr)
+        return 1
+    names = [name for name in args.lists.split(",") if name] if args.lists else None
+    try:
+        start = time.perf_counter()
+        matcher = DomainMatcher.from_release_dir(release_dir, names)
+    except FileNotFoundError as err:
+        print(f"❌ 列表不存在: '{err.filename}'", file=sys.stderr)
+        return 1
+    print(
+        f"📚 加载 {len(matcher.names)} 个列表, {matcher.rules} 条规则, "
+        f"用时 {time.perf_counter() - start:.3f}s",
+        file=sys.stderr,
+    )
+
+    with contextlib.ExitStack() as stack:
+        if args.domains:
+            domains: Iterable[str] = args.domains
+        elif args.input == "-":
+            domains = _read_domains(sys.stdin)
+        elif args.input:
+            domains = _read_domains(stack.enter_context(open(args.input, "r", encoding="utf-8")))
+        else:
+            print("❌ 未提供待匹配的域名", file=sys.stderr)
+            return 1
+
+        stats = MatchStats()
+        for domain, result in matcher.match_many(domains, stats):
+            if result or not args.matched_only:
+                print(f"{domain}\t{','.join(result) or '-'}")
+    stats.report(sys.stderr)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="查询域名命中 release 中的哪些列表")
+    add_match_arguments(parser)
+    return run_match(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,16 @@
+import heapq
+from typing import Iterable, Iterator, List
+
+
+def merge_unique(runs: Iterable[Iterable[str]]) -> Iterator[str]:
+    """多路归并若干已排序的序列，并在归并过程中去掉重复行。"""
+    previous = None
+    for line in heapq.merge(*runs):
+        if line != previous:
+            yield line
+            previous = line
+
+
+def sort_unique(lines: List[str]) -> List[str]:
+    lines.sort()
+    return list(merge_unique([lines]))
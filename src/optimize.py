@@ -0,0 +1,29 @@
+from typing import List, Tuple
+
+from .trie import DomainTrie
+
+
+def subsume_lines(lines: List[str]) -> Tuple[List[str], int]:
+    """去掉已被更宽 domain 规则覆盖的 full/domain 行以及完全重复的行。
+
+    输入是 entry_to_domain 渲染后的行（已排序），输出保持原有顺序，返回 (结果, 删除行数)。
+    """
+    trie = DomainTrie()
+    for line in lines:
+        if line.startswith("."):
+            trie.add_domain(line[1:-1])
+
+    kept: List[str] = []
+    seen = set()
+    for line in lines:
+        if line in seen:
+            continue
+        seen.add(line)
+        if line.startswith("."):
+            if trie.covering_domain(line[1:-1], strict=True) is not None:
+                continue
+        elif not line.startswith(("keyword:", "regexp:")):
+            if trie.covering_domain(line[:-1]) is not None:
+                continue
+        kept.append(line)
+    return kept, len(lines) - len(kept)
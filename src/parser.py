@@ -1,42 +1,171 @@
-import re
-from dataclasses import dataclass, field
+import io
+import sys
 from pathlib import Path
-from typing import List, Set, Tuple
+from typing import AbstractSet, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from .tags import TAGS
+
+EMPTY_ATTRS: FrozenSet[str] = frozenset()
+# 属性串（"@cn@!ads" 中 @ 之后的部分）到共享 frozenset 对的缓存，所有 token 复用同一对象。
+_SHARED_ATTRS: Dict[str, Tuple[FrozenSet[str], FrozenSet[str]]] = {"": (EMPTY_ATTRS, EMPTY_ATTRS)}
 
 
-@dataclass
 class Entry:
-    type: str
-    value: str
-    attr: Set[str]
-    neg_attr: Set[str] = field(default_factory=set)
-    data: List[str] = field(default_factory=list)
+    """一条规则。正负属性以 TAGS 注册表的比特掩码保存，attr / neg_attr 按需解码。
+
+    include 条目不复制子文件的行，refs 保存对子文件结果分组的引用。
+    用 __slots__ 省掉每个实例的 __dict__，值字符串经 sys.intern 在各文件间共享。
+    """
+
+    __slots__ = ("type", "value", "attr_mask", "neg_mask", "data", "refs")
+
+    def __init__(
+        self,
+        type: str,
+        value: str,
+        attr: Iterable[str] = (),
+        neg_attr: Iterable[str] = (),
+        data: Sequence[str] = (),
+        attr_mask: int = 0,
+        neg_mask: int = 0,
+        refs: Optional[List[List[str]]] = None,
+    ):
+        self.type = type
+        self.value = sys.intern(value)
+        self.attr_mask = attr_mask | TAGS.encode(attr)
+        self.neg_mask = neg_mask | TAGS.encode(neg_attr)
+        self.data = data
+        self.refs = refs
+
+    def lines(self) -> Iterator[str]:
+        yield from self.data
+        for run in self.refs or ():
+            yield from run
+
+    @property
+    def attr(self) -> FrozenSet[str]:
+        return TAGS.decode(self.attr_mask)
+
+    @property
+    def neg_attr(self) -> FrozenSet[str]:
+        return TAGS.decode(self.neg_mask, negative=True)
 
     @property
     def output_tags(self) -> Set[str]:
         return self.attr | self.neg_attr
 
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Entry):
+            return NotImplemented
+        return (
+            self.type == other.type
+            and self.value == other.value
+            and self.attr_mask == other.attr_mask
+            and self.neg_mask == other.neg_mask
+            and tuple(self.data) == tuple(other.data)
+        )
 
-def format_doc(file_path: Path) -> List[str]:
+    def __repr__(self) -> str:
+        return (
+            f"Entry(type={self.type!r}, value={self.value!r}, attr={set(self.attr)!r}, "
+            f"neg_attr={set(self.neg_attr)!r}, data={list(self.data)!r})"
+        )
+
+
+def _clean_line(line: str) -> str:
+    # 去掉首尾空白与注释（regexp 只认 " #" 开头的注释），再删掉行内的空格和制表符。
+    stripped = line.strip()
+    if not stripped or stripped[0] == '#':
+        return ''
+    if stripped.startswith('regexp:'):
+        comment_idx = stripped.find(' #')
+        if comment_idx != -1:
+            stripped = stripped[:comment_idx]
+    elif '#' in stripped:
+        stripped = stripped[:stripped.index('#')]
+    if ' ' in stripped or '\t' in stripped:
+        stripped = stripped.replace(' ', '').replace('\t', '')
+    return stripped
+
+
+def _split_text(data: bytes) -> List[str]:
+    # 与文本模式逐行读取一致：统一 \r\n / \r 换行，只按 \n 切分（不用 splitlines）。
+    text = data.decode("utf-8")
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text.split('\n')
+
+
+def format_lines(lines: Iterable[str]) -> List[str]:
     result: List[str] = []
+    for line in lines:
+        cleaned = _clean_line(line)
+        if cleaned:
+            result.append(cleaned)
+    return result
+
+
+def format_bytes(data: bytes) -> List[str]:
+    return format_lines(_split_text(data))
+
+
+def iter_lines(data: bytes) -> Iterator[str]:
+    """逐行解码 data，不像 _split_text 那样先建出整个文件的行列表。
+
+    按 \n 切分后再把行内残留的 \r 当作换行；产出的行保留结尾的 \n，\r\n 结尾还会多出一个空行，
+    去掉首尾空白后与 _split_text 的切分结果一致，解析结果相同。
+    """
+    for raw in io.BytesIO(data):
+        line = raw.decode("utf-8")
+        if "\r" in line:
+            yield from line.split("\r")
+        else:
+            yield line
+
+
+def iter_tokens(lines: Iterable[str]) -> Iterator[Tuple[str, str, AbstractSet[str], AbstractSet[str]]]:
+    """逐行产出 format_line 元组，等价于逐行 format_line(format_lines(lines))。"""
+    for line in lines:
+        # 与 _clean_line 相同的逻辑，内联以省去每行一次函数调用。
+        stripped = line.strip()
+        if not stripped or stripped[0] == '#':
+            continue
+        if stripped.startswith('regexp:'):
+            comment_idx = stripped.find(' #')
+            if comment_idx != -1:
+                stripped = stripped[:comment_idx]
+        elif '#' in stripped:
+            stripped = stripped[:stripped.index('#')]
+        if ' ' in stripped or '\t' in stripped:
+            stripped = stripped.replace(' ', '').replace('\t', '')
+            if not stripped:
+                continue
+        if ':' not in stripped and '@' not in stripped:
+            # 最常见的裸域名行，跳过 partition。
+            yield "domain", sys.intern(stripped), EMPTY_ATTRS, EMPTY_ATTRS
+        else:
+            yield format_line(stripped)
+
+
+def parse_bytes(data: bytes) -> List[Tuple[str, str, AbstractSet[str], AbstractSet[str]]]:
+    """一次切分整个文件并直接产出 format_line 元组，等价于逐行 format_line(format_bytes(data))。"""
+    return list(iter_tokens(_split_text(data)))
+
+
+def format_doc(file_path: Path) -> List[str]:
     try:
-        with file_path.open("r", encoding="utf-8") as file:
-            for line in file:
-                stripped = line.strip()
-                if not stripped or stripped.startswith('#'):
-                    continue
-                if stripped.startswith('regexp:'):
-                    comment_idx = stripped.find(' #')
-                    if comment_idx != -1:
-                        stripped = stripped[:comment_idx]
-                else:
-                    stripped = re.sub(r'#.*', '', stripped)
-                no_space = stripped.replace(' ', '').replace('\t', '')
-                if no_space:
-                    result.append(no_space)
+        return format_bytes(file_path.read_bytes())
     except FileNotFoundError:
         print(f"⚠️未知文件: {file_path.name}")
-    return result
+        return []
+
+
+def parse_doc(file_path: Path) -> List[Tuple[str, str, AbstractSet[str], AbstractSet[str]]]:
+    try:
+        return parse_bytes(file_path.read_bytes())
+    except FileNotFoundError:
+        print(f"⚠️未知文件: {file_path.name}")
+        return []
 
 
 def parse_attrs(attr_str: str) -> Tuple[Set[str], Set[str]]:
@@ -55,10 +184,20 @@ def parse_attrs(attr_str: str) -> Tuple[Set[str], Set[str]]:
     return positive, negative
 
 
-def format_line(line_content: str) -> Tuple[str, str, Set[str], Set[str]]:
+def shared_attrs(attr_str: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """与 parse_attrs 相同，但相同的属性串只解析一次并返回共享的 frozenset。"""
+    shared = _SHARED_ATTRS.get(attr_str)
+    if shared is None:
+        positive, negative = parse_attrs(attr_str)
+        shared = (frozenset(positive) or EMPTY_ATTRS, frozenset(negative) or EMPTY_ATTRS)
+        _SHARED_ATTRS[attr_str] = shared
+    return shared
+
+
+def format_line(line_content: str) -> Tuple[str, str, FrozenSet[str], FrozenSet[str]]:
     type_check, colon, rest_of_line = line_content.partition(":")
     if colon and type_check == "regexp":
-        return "regexp", rest_of_line, set(), set()
+        return "regexp", rest_of_line, EMPTY_ATTRS, EMPTY_ATTRS
 
     first, sep, rest = line_content.partition("@")
     type_prefix, _, value = first.partition(":")
@@ -67,18 +206,22 @@ def format_line(line_content: str) -> Tuple[str, str, Set[str], Set[str]]:
         type_prefix = "domain"
         value = first
 
-    pos_attrs, neg_attrs = parse_attrs(rest)
+    pos_attrs, neg_attrs = shared_attrs(rest)
+
+    return type_prefix, sys.intern(value), pos_attrs, neg_attrs
+
 
-    return type_prefix, value, pos_attrs, neg_attrs
+def rule_line(type_prefix: str, value: str) -> str:
+    """渲染一条规则的输出行。"""
+    if type_prefix == "full":
+        return f"{value}\n"
+    elif type_prefix == "keyword":
+        return f"keyword:{value}\n"
+    elif type_prefix == "regexp":
+        return f"regexp:{value}\n"
+    return f".{value}\n"
 
 
 def entry_to_domain(entry: Entry) -> str:
-    if entry.type == "full":
-        return f"{entry.value}\n"
-    elif entry.type == "domain":
-        return f".{entry.value}\n"
-    elif entry.type == "keyword":
-        return f"keyword:{entry.value}\n"
-    elif entry.type == "regexp":
-        return f"regexp:{entry.value}\n"
-    return f".{entry.value}\n"
+    # 输出行同样 intern：多个文件出现的同一条规则在求值结果里只保存一份字符串。
+    return sys.intern(rule_line(entry.type, entry.value))
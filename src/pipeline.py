@@ -0,0 +1,20 @@
+from pathlib import Path
+from typing import Optional
+
+from .build import BuildEngine
+from .generate_filelist import generate_filelist
+from .main import run_build
+from .profiling import get_profiler
+
+
+def run_pipeline(engine: BuildEngine, pages_dir: Optional[Path], repo_name: str) -> int:
+    """在同一进程里依次完成预处理、规则生成和页面生成。
+
+    exclude_includes 由引擎在加载 token 时应用；页面阶段直接使用写出时记录的行数，
+    只有增量构建中未知行数的文件才会重新读取。
+    """
+    count = run_build(engine)
+    if pages_dir is not None:
+        with get_profiler().span("pages"):
+            generate_filelist(engine.release_dir, pages_dir, repo_name, engine.output_lines)
+    return count
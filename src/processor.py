@@ -1,7 +1,119 @@
+import time
+from itertools import chain as chain_iter, islice
 from pathlib import Path
-from typing import List, Dict, Set, Tuple
+from typing import AbstractSet, Iterable, Iterator, List, Dict, Optional, Sequence, Set, Tuple, Union
 
-from .parser import Entry, format_doc, format_line, entry_to_domain
+from .emitters import DEFAULT_FORMATS, EmitStats, create_emitters
+from .extsort import ExternalSorter, MergedRuns, SortedRun
+from .graph import Token, include_targets, scan_include_graph, tokenize
+from .merge import merge_unique, sort_unique
+from .optimize import subsume_lines
+from .parser import Entry, entry_to_domain, parse_doc, rule_line
+from .profiling import get_profiler
+from .tags import TAGS
+from .writer import OutputWriter
+
+# 父文件只关心子文件条目的正向属性和输出行，跨进程传递时按属性分组压缩。
+PackedEntries = List[Tuple[Tuple[str, ...], List[str]]]
+# 分组和 runs 平时是内存里的有序列表，外部排序模式下超出阈值的是磁盘上的 SortedRun。
+Run = Union[List[str], SortedRun]
+
+
+class EvaluatedSet:
+    """一个文件求值后供父文件 include 的结果。
+
+    自有条目的行按正向属性掩码分组；include 进来的行不再带属性，
+    只保存对子文件分组列表的引用（runs），不逐行复制。所有分组和 runs 都已排序。
+    selections 记住每种 (正向掩码, 负向掩码) 过滤的结果，随本对象一起释放。
+    外部排序模式下分组和 runs 可以是 SortedRun，迭代时才从磁盘读取。
+    """
+
+    __slots__ = ("groups", "runs", "selections")
+
+    def __init__(
+        self,
+        groups: Optional[Dict[int, Run]] = None,
+        runs: Optional[List[Run]] = None
+    ):
+        self.groups: Dict[int, Run] = groups if groups is not None else {}
+        self.runs: List[Run] = runs if runs is not None else []
+        self.selections: Dict[Tuple[int, int], List[Run]] = {}
+
+    def select(self, pos_mask: int, neg_mask: int) -> List[Run]:
+        # 负向属性 "@!cn" 与正向 "@cn" 共用同一比特位，过滤只需位运算。
+        selected = [
+            lines for mask, lines in self.groups.items()
+            if mask & pos_mask == pos_mask and not mask & neg_mask
+        ]
+        if not pos_mask:
+            selected.extend(self.runs)
+        return selected
+
+    def select_merged(self, pos_mask: int, neg_mask: int) -> List[Run]:
+        """select 的记忆化版本：同一过滤只算一次，多个分组预先合并成一个有序去重的 run，
+        之后每个以相同属性 include 本文件的父文件都直接复用，合并时的路数也更少。
+        其中有 SortedRun 时合并结果同样写到磁盘上。"""
+        key = (pos_mask, neg_mask)
+        selected = self.selections.get(key)
+        if selected is None:
+            selected = self.select(pos_mask, neg_mask)
+            if len(selected) > 1:
+                if all(isinstance(run, list) for run in selected):
+                    selected = [list(merge_unique(selected))]
+                else:
+                    selected = [SortedRun(merge_unique(selected))]
+            self.selections[key] = selected
+        return selected
+
+    def lines(self) -> Iterator[str]:
+        return chain_iter(*self.groups.values(), *self.runs)
+
+    def merged(self) -> Iterator[str]:
+        return merge_unique([*self.groups.values(), *self.runs])
+
+    def __len__(self) -> int:
+        return sum(map(len, self.groups.values())) + sum(map(len, self.runs))
+
+    def pack(self) -> PackedEntries:
+        # 掩码只在本进程内有效，打包时换回标签名；引用的 runs 此时才合并成列表。
+        packed: PackedEntries = []
+        for mask, lines in self.groups.items():
+            if mask == 0:
+                continue
+            packed.append((tuple(sorted(TAGS.decode(mask))), _as_list(lines)))
+        untagged = self.groups.get(0, [])
+        if self.runs:
+            untagged = list(merge_unique([untagged, *self.runs]))
+        if untagged:
+            packed.append(((), _as_list(untagged)))
+        return packed
+
+    def pack_chunks(self, size: int) -> Iterator[PackedEntries]:
+        """与 pack() 内容相同，但每段最多 size 行，逐段产出，磁盘上的分组不必整体读进内存。"""
+        pending = [
+            (tuple(sorted(TAGS.decode(mask))), iter(lines))
+            for mask, lines in self.groups.items() if mask
+        ]
+        untagged = [self.groups[0]] if 0 in self.groups else []
+        if untagged or self.runs:
+            pending.append(((), merge_unique([*untagged, *self.runs])))
+        for attrs, lines in pending:
+            while True:
+                chunk = list(islice(lines, size))
+                if not chunk:
+                    break
+                yield [(attrs, chunk)]
+
+    @classmethod
+    def unpack(cls, packed: PackedEntries) -> "EvaluatedSet":
+        groups: Dict[int, List[str]] = {}
+        for attrs, lines in packed:
+            groups.setdefault(TAGS.encode(attrs), []).extend(lines)
+        return cls(groups)
+
+
+def _as_list(lines: Run) -> List[str]:
+    return lines if isinstance(lines, list) else list(lines)
 
 
 class DocumentProcessor:
@@ -11,9 +123,17 @@ class DocumentProcessor:
         source_dir: Path,
         release_dir: Path,
         chain: List[str],
-        processed: Dict[str, Tuple[List[str], List[Entry]]],
+        processed: Dict[str, Tuple[List[str], EvaluatedSet]],
         min_lines: int = 1,
-        tag_policies: Dict[str, Dict[str, bool]] = None
+        tag_policies: Dict[str, Dict[str, bool]] = None,
+        tokens: Optional[List[Token]] = None,
+        cyclic_includes: Optional[Set[str]] = None,
+        optimize: bool = False,
+        formats: Sequence[str] = DEFAULT_FORMATS,
+        writer: Optional[OutputWriter] = None,
+        emit_stats: Optional[EmitStats] = None,
+        spill_lines: Optional[int] = None,
+        rules: Optional[Iterable[Token]] = None
     ):
         self.content = content
         self.source_dir = source_dir
@@ -22,160 +142,333 @@ class DocumentProcessor:
         self.processed = processed
         self.min_lines = min_lines
         self.tag_policies = tag_policies or {}
+        self.tokens = tokens
+        self.cyclic_includes: Set[str] = set(cyclic_includes or ())
+        self.optimize = optimize
+        self.formats = tuple(formats)
+        self.emitters = create_emitters(self.formats)
+        self.writer = writer or OutputWriter(release_dir)
+        self.emit_stats = emit_stats if emit_stats is not None else EmitStats()
+        # 设置后进入外部排序模式：合并结果不再整体物化，分组和 tag 页面超过这么多行就溢出到临时文件。
+        # 此时可以用 rules 单独给出规则 token 的流（如逐行解析源文件），tokens 只需含 include。
+        self.spill_lines = spill_lines
+        self.rules = rules
+        self.spilled_runs = 0
+        self.spilled_lines = 0
+        self.sorters: List[ExternalSorter] = []
+        self.removed_lines = 0
+        self.include_hits = 0
+        self.include_misses = 0
         self.result: List[str] = []
         self.entries: List[Entry] = []
+        self.entry_count = 0
+        self.evaluated = EvaluatedSet()
         self.attrs_set: Set[str] = set()
+        self.outputs: Dict[str, int] = {}
 
     def process(self):
-        content = self.content
-        source_dir = self.source_dir
-        release_dir = self.release_dir
         chain = self.chain
         name: str = chain[-1]
-        result: List[str] = []
 
         if name in chain[:-1]:
             info = "♻️循环引用"
             print(f"{info}, 路径：{' -> '.join(chain)}")
-            self.result = result
+            self.result = []
             return
 
         if name in self.processed:
-            result, entries = self.processed[name]
+            result, evaluated = self.processed[name]
             info = "💨处理过咯"
             print(f"{info}, 路径：{' -> '.join(chain)}")
             self.result = result
-            self.entries = entries
+            self.evaluated = evaluated
+            return
+
+        if self.tokens is None:
+            self.tokens = tokenize(self.content)
+        self._process_dependencies()
+        self._evaluate()
+
+    def _process_dependencies(self):
+        # 单独调用 process() 时，先把尚未处理的 include 子图按拓扑序求值，避免递归。
+        name = self.chain[-1]
+        pending = [
+            target for target in include_targets(self.tokens)
+            if target not in self.processed and target not in self.cyclic_includes
+        ]
+        if not pending:
             return
 
+        def loader(target: str) -> List[Token]:
+            if target in self.processed:
+                return []
+            return parse_doc(self.source_dir / target)
+
+        graph = scan_include_graph(self.source_dir, [name], {name: self.tokens}, loader)
+        order, cyclic = graph.build_order([name])
+        for target in order:
+            if target == name or target in self.processed:
+                continue
+            doc = DocumentProcessor(
+                [],
+                self.source_dir,
+                self.release_dir,
+                self.chain + [target],
+                self.processed,
+                self.min_lines,
+                self.tag_policies,
+                tokens=graph.tokens[target],
+                cyclic_includes=cyclic.get(target),
+                optimize=self.optimize,
+                formats=self.formats,
+                writer=self.writer,
+                emit_stats=self.emit_stats,
+                spill_lines=self.spill_lines
+            )
+            doc._evaluate()
+        self.cyclic_includes.update(cyclic.get(name, ()))
+
+    def _evaluate(self):
+        with get_profiler().span("process", cat="file", file=self.chain[-1]) as span:
+            try:
+                if self.spill_lines is None:
+                    self._evaluate_entries()
+                else:
+                    self._evaluate_streamed()
+            finally:
+                self._close_sorters()
+            span["entries"] = self.entry_count
+
+    def _evaluate_entries(self):
+        chain = self.chain
+        name: str = chain[-1]
         attrs_set: Set[str] = set()
         entries: List[Entry] = []
+        evaluated = EvaluatedSet()
+        # 倒排索引：扫描时直接把行归入已启用的 @tag / @!tag 页面。
+        tag_pages: Dict[str, List[str]] = {}
+        enabled: Dict[str, bool] = {}
 
-        for line in content:
-            type_prefix, value, pos_attrs, neg_attrs = format_line(line)
+        for type_prefix, value, pos_attrs, neg_attrs in self.tokens:
             if type_prefix == "regexp":
                 continue
             if type_prefix == "include":
-                entry = Entry(
-                    type=type_prefix,
-                    value=value,
-                    attr=set(),
-                    neg_attr=set(),
-                    data=[]
-                )
+                entry = Entry(type=type_prefix, value=value)
             else:
                 attrs_set.update(pos_attrs)
                 attrs_set.update(neg_attrs)
-                entry = Entry(
-                    type=type_prefix,
-                    value=value,
-                    attr=pos_attrs,
-                    neg_attr=neg_attrs,
-                    data=[]
-                )
-
-            if type_prefix == "full":
-                entry.data = [entry_to_domain(entry)]
-            elif type_prefix == "domain":
-                entry.data = [entry_to_domain(entry)]
-            elif type_prefix == "keyword":
-                entry.data = [entry_to_domain(entry)]
+                entry = Entry(type=type_prefix, value=value, attr=pos_attrs, neg_attr=neg_attrs)
+
+            if type_prefix in ("full", "domain", "keyword"):
+                # 单行规则用一元组保存输出行，比列表省一个可变容器。
+                entry.data = (entry_to_domain(entry),)
             elif type_prefix == "include":
-                sub_source_file: Path = source_dir / value
-                include_pos_attrs = pos_attrs
-                include_neg_attrs = neg_attrs
+                entry.refs = self._include_refs(value, pos_attrs, neg_attrs)
+                evaluated.runs.extend(entry.refs)
 
-                if value in self.processed:
-                    _, include_entries = self.processed[value]
-                else:
-                    sub_content = format_doc(sub_source_file)
-                    doc = DocumentProcessor(
-                        sub_content,
-                        source_dir,
-                        release_dir,
-                        self.chain + [value],
-                        self.processed,
-                        self.min_lines,
-                        self.tag_policies
-                    )
-                    doc.process()
-                    include_entries = doc.entries
-
-                filtered = self._filter_entries_by_attrs(
-                    include_entries, include_pos_attrs, include_neg_attrs
-                )
-                entry.data = []
-                for fe in filtered:
-                    entry.data.extend(fe.data)
+            if type_prefix != "include" and entry.data:
+                evaluated.groups.setdefault(entry.attr_mask, []).extend(entry.data)
+                for attr in (*pos_attrs, *neg_attrs):
+                    if attr not in enabled:
+                        enabled[attr] = self._is_output_attr_enabled(attr)
+                    if enabled[attr]:
+                        page = tag_pages.get(attr)
+                        if page is None:
+                            page = tag_pages[attr] = []
+                        page.extend(entry.data)
 
             entries.append(entry)
 
-        if len(entries) == 0:
+        with get_profiler().span("sort", cat="merge", file=name):
+            for lines in evaluated.groups.values():
+                lines.sort()
+
+        self.entries = entries
+        self.attrs_set = attrs_set
+        self._finish(len(entries), evaluated, tag_pages)
+
+    def _evaluate_streamed(self):
+        """外部排序模式：规则行逐条流入各属性分组和 tag 页面的 ExternalSorter，不建逐行的 Entry。
+
+        规则 token 取自 rules（未给出时取 tokens），其中的 include 一律忽略，include 只看 tokens；
+        self.entries 只保留 include 条目。分组超出阈值时以 SortedRun 留在磁盘上。
+        """
+        attrs_set: Set[str] = set()
+        entries: List[Entry] = []
+        evaluated = EvaluatedSet()
+        groups: Dict[int, ExternalSorter] = {}
+        tag_pages: Dict[str, ExternalSorter] = {}
+        enabled: Dict[str, bool] = {}
+        masks: Dict[AbstractSet[str], int] = {}
+        count = 0
+
+        for type_prefix, value, pos_attrs, neg_attrs in self.tokens:
+            if type_prefix == "include":
+                entry = Entry(type=type_prefix, value=value)
+                entry.refs = self._include_refs(value, pos_attrs, neg_attrs)
+                evaluated.runs.extend(entry.refs)
+                entries.append(entry)
+
+        for type_prefix, value, pos_attrs, neg_attrs in self.tokens if self.rules is None else self.rules:
+            if type_prefix == "regexp" or type_prefix == "include":
+                continue
+            count += 1
+            attrs_set.update(pos_attrs)
+            attrs_set.update(neg_attrs)
+            if type_prefix not in ("full", "domain", "keyword"):
+                continue
+            line = rule_line(type_prefix, value)
+            mask = masks.get(pos_attrs)
+            if mask is None:
+                mask = masks[pos_attrs] = TAGS.encode(pos_attrs)
+            group = groups.get(mask)
+            if group is None:
+                group = groups[mask] = self._new_page()
+            group.add(line)
+            for attr in (*pos_attrs, *neg_attrs):
+                if attr not in enabled:
+                    enabled[attr] = self._is_output_attr_enabled(attr)
+                if enabled[attr]:
+                    page = tag_pages.get(attr)
+                    if page is None:
+                        page = tag_pages[attr] = self._new_page()
+                    page.add(line)
+
+        with get_profiler().span("sort", cat="merge", file=self.chain[-1]):
+            for mask, group in groups.items():
+                evaluated.groups[mask] = group.finish()
+
+        self.entries = entries
+        self.attrs_set = attrs_set
+        self._finish(count + len(entries), evaluated, tag_pages)
+
+    def _include_refs(
+        self, target: str, pos_attrs: AbstractSet[str], neg_attrs: AbstractSet[str]
+    ) -> List[Run]:
+        chain = self.chain
+        if target in self.cyclic_includes:
+            info = "♻️循环引用"
+            print(f"{info}, 路径：{' -> '.join(chain + [target])}")
+            return []
+        with get_profiler().span("include", cat="include", file=chain[-1], target=target) as span:
+            _, child = self.processed[target]
+            key = (TAGS.encode(pos_attrs), TAGS.encode(neg_attrs))
+            cached = key in child.selections
+            if cached:
+                self.include_hits += 1
+            else:
+                self.include_misses += 1
+            span["cached"] = cached
+            return child.select_merged(*key)
+
+    def _finish(
+        self,
+        count: int,
+        evaluated: EvaluatedSet,
+        tag_pages: Dict[str, Union[List[str], ExternalSorter]]
+    ):
+        chain = self.chain
+        name: str = chain[-1]
+        result: List[str] = []
+        if count == 0:
             info = "⏺️空白文件"
             print(f"{info}, 路径：{' -> '.join(chain)}")
-        elif len(entries) < self.min_lines:
+        elif count < self.min_lines:
             info = "🆖行数太少"
             print(f"{info}, 路径：{' -> '.join(chain)}")
         else:
-            result = []
-            for e in entries:
-                result.extend(e.data)
-            result.sort()
-
-            if result:
-                base_file = release_dir / f"{name}.txt"
-                with base_file.open("w", encoding="utf-8") as file:
-                    file.write(f"# 来源: https://github.com/v2fly/domain-list-community/tree/master/data/{name}\n\n")
-                    file.writelines(result)
-
-            output_attrs = attrs_set.copy()
-            for attr in output_attrs:
-                if not self._is_output_attr_enabled(attr):
-                    continue
-                page: List[str] = []
-                for entry in entries:
-                    if attr in entry.output_tags:
-                        page.extend(entry.data)
-                page.sort()
-                if not page:
-                    continue
-                page_file = release_dir / f"{name}{attr}.txt"
-                with page_file.open("w", encoding="utf-8") as file:
-                    file.write(f"# 来源: https://github.com/v2fly/domain-list-community/tree/master/data/{name}\n\n")
-                    file.writelines(page)
-            
+            if self.spill_lines is None:
+                result = self._write_pages(name, evaluated, tag_pages)
+            else:
+                self._write_spilled_pages(name, evaluated, tag_pages)
+
             info = "🆗处理完成"
+            if self.removed_lines:
+                info += f"（✂️精简 {self.removed_lines} 行）"
             print(f"{info}, 路径：{' -> '.join(chain)}")
 
-        self.processed[name] = (result, entries)
+        self.processed[name] = (result, evaluated)
         self.result = result
-        self.entries = entries
-        self.attrs_set = attrs_set
+        self.entry_count = count
+        self.evaluated = evaluated
 
-    def _filter_entries_by_attrs(
-        self,
-        entries: List[Entry],
-        pos_attrs: Set[str],
-        neg_attrs: Set[str]
-    ) -> List[Entry]:
-        if not pos_attrs and not neg_attrs:
-            return entries
-
-        neg_canonical: Set[str] = set()
-        for neg in neg_attrs:
-            if neg.startswith("@!"):
-                neg_canonical.add(f"@{neg[2:]}")
-            else:
-                neg_canonical.add(neg)
-
-        result = []
-        for entry in entries:
-            has_pos = not pos_attrs or pos_attrs.issubset(entry.attr)
-            has_neg = not neg_canonical or not neg_canonical.intersection(entry.attr)
-            if has_pos and has_neg:
-                result.append(entry)
+    def _write_pages(
+        self, name: str, evaluated: EvaluatedSet, tag_pages: Dict[str, List[str]]
+    ) -> List[str]:
+        profiler = get_profiler()
+        with profiler.span("merge", cat="merge", file=name) as span:
+            result = list(evaluated.merged())
+            span["entries"] = len(result)
+        if self.optimize:
+            result = self._subsume(result)
+
+        if result:
+            self._write_output(name, result)
+
+        for attr, page in tag_pages.items():
+            with profiler.span("merge", cat="merge", file=name, page=attr):
+                page = sort_unique(page)
+            if self.optimize:
+                page = self._subsume(page)
+            if not page:
+                continue
+            self._write_output(f"{name}{attr}", page)
         return result
 
+    def _write_spilled_pages(
+        self, name: str, evaluated: EvaluatedSet, tag_pages: Dict[str, ExternalSorter]
+    ):
+        # 外部排序模式：合并结果不物化，各输出格式在写文件时逐行归并；result 保持为空。
+        runs = [run for run in (*evaluated.groups.values(), *evaluated.runs) if run]
+        if runs:
+            self._write_merged(name, MergedRuns(runs))
+        for attr, page in tag_pages.items():
+            self._write_merged(f"{name}{attr}", page)
+
+    def _write_merged(self, page: str, lines: Iterable[str]):
+        if self.optimize:
+            # 覆盖精简要先建出整页的域名树，这一步仍在内存里完成。
+            lines = self._subsume(list(lines))
+            if not lines:
+                return
+        self._write_output(page, lines)
+
+    def _new_page(self) -> Union[List[str], ExternalSorter]:
+        if self.spill_lines is None:
+            return []
+        sorter = ExternalSorter(self.spill_lines)
+        self.sorters.append(sorter)
+        return sorter
+
+    def _close_sorters(self):
+        for sorter in self.sorters:
+            self.spilled_runs += sorter.runs
+            self.spilled_lines += sorter.spilled_lines
+            sorter.close()
+        self.sorters.clear()
+
+    def _write_output(self, page: str, lines: Iterable[str]):
+        # 同一份求值结果依次交给每种输出格式渲染，各格式按块流式写入。
+        name = self.chain[-1]
+        profiler = get_profiler()
+        for emitter in self.emitters:
+            file_name = page + emitter.suffix
+            start = time.perf_counter()
+            with profiler.span("write", cat="io", file=name, output=file_name) as span:
+                written = self.writer.write_chunks(file_name, emitter.chunks(name, lines), name)
+                size = self.writer.sizes[file_name]
+                if written:
+                    span["bytes_written"] = size
+            self.emit_stats.add(
+                emitter.name, emitter.rules, emitter.skipped, size, time.perf_counter() - start
+            )
+            self.outputs[file_name] = emitter.rules
+
+    def _subsume(self, lines: List[str]) -> List[str]:
+        kept, removed = subsume_lines(lines)
+        self.removed_lines += removed
+        return kept
+
     def _is_output_attr_enabled(self, attr: str) -> bool:
         tag, polarity = self._split_tag_polarity(attr)
         if not tag:
@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class Profiler:
+    """按文件、按阶段记录耗时区间，导出为 Chrome trace-event JSON（chrome://tracing / Perfetto）。
+
+    每个区间的 args 里可以带 file、entries、bytes_read、bytes_written 等计数。
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+        self.pid = os.getpid()
+
+    @contextmanager
+    def span(self, name: str, cat: str = "stage", **args: Any) -> Iterator[Dict[str, Any]]:
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            end = time.perf_counter()
+            self.events.append({
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": round(start * 1e6, 3),
+                "dur": round((end - start) * 1e6, 3),
+                "pid": self.pid,
+                "tid": threading.get_ident(),
+                "args": args,
+            })
+
+    def drain(self) -> List[Dict[str, Any]]:
+        events, self.events = self.events, []
+        return events
+
+    def extend(self, events: List[Dict[str, Any]]):
+        self.events.extend(events)
+
+    def export_chrome_trace(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        origin = min((event["ts"] for event in self.events), default=0)
+        events = [dict(event, ts=round(event["ts"] - origin, 3)) for event in self.events]
+        with path.open("w", encoding="utf-8") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file, ensure_ascii=False)
+
+    def stage_totals(self) -> Dict[str, Dict[str, float]]:
+        totals: Dict[str, Dict[str, float]] = {}
+        for event in self.events:
+            total = totals.setdefault(event["name"], {"seconds": 0.0, "count": 0})
+            total["seconds"] += event["dur"] / 1e6
+            total["count"] += 1
+            for key in ("entries", "bytes_read", "bytes_written"):
+                if key in event["args"]:
+                    total[key] = total.get(key, 0) + event["args"][key]
+        return totals
+
+    def slowest_files(self, top_n: int = 10) -> List[Dict[str, Any]]:
+        # 只统计 file 级区间（cat="file"），避免与嵌套的阶段区间重复计时。
+        per_file: Dict[str, Dict[str, Any]] = {}
+        for event in self.events:
+            name = event["args"].get("file")
+            if not name or event["cat"] != "file":
+                continue
+            record = per_file.setdefault(name, {"file": name, "seconds": 0.0})
+            record["seconds"] += event["dur"] / 1e6
+            for key in ("entries", "bytes_read", "bytes_written"):
+                if key in event["args"]:
+                    record[key] = record.get(key, 0) + event["args"][key]
+        return sorted(per_file.values(), key=lambda item: -item["seconds"])[:top_n]
+
+    def report(self, top_n: int = 10):
+        print("📈 阶段耗时:")
+        for name, total in sorted(self.stage_totals().items(), key=lambda item: -item[1]["seconds"]):
+            counts = "".join(
+                f", {key}={int(total[key])}"
+                for key in ("entries", "bytes_read", "bytes_written")
+                if key in total
+            )
+            print(f"  {name}: {total['seconds']:.3f}s ×{int(total['count'])}{counts}")
+        slowest = self.slowest_files(top_n)
+        if slowest:
+            print(f"🐢 最慢的 {len(slowest)} 个文件:")
+            for record in slowest:
+                print(f"  {record['file']}: {record['seconds'] * 1000:.1f}ms")
+
+
+class NullProfiler(Profiler):
+    """未开启 --profile 时使用，span 不做任何记录。"""
+
+    enabled = False
+
+    @contextmanager
+    def span(self, name: str, cat: str = "stage", **args: Any) -> Iterator[Dict[str, Any]]:
+        yield args
+
+
+_active: Profiler = NullProfiler()
+
+
+def get_profiler() -> Profiler:
+    return _active
+
+
+def enable_profiler() -> Profiler:
+    global _active
+    if not _active.enabled:
+        _active = Profiler()
+    return _active
+
+
+def disable_profiler():
+    global _active
+    _active = NullProfiler()
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        help="把各阶段耗时写成 Chrome trace JSON（可用 chrome://tracing 或 Perfetto 打开）",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        help="汇总中列出的最慢文件数量，默认 10",
+    )
+
+
+def start_profile(path: Optional[str]):
+    if path:
+        enable_profiler()
+
+
+def finish_profile(path: Optional[str], top_n: int = 10):
+    """命令行入口收尾：导出 trace 文件并打印汇总。"""
+    profiler = get_profiler()
+    if not path or not profiler.enabled:
+        return
+    profiler.export_chrome_trace(Path(path))
+    profiler.report(top_n)
+    print(f"✅ 性能追踪已写入: {path}")
@@ -0,0 +1,168 @@
+import mmap
+import re
+import struct
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+from .trie import reversed_labels
+
+MAGIC = b"NRRS"
+FORMAT_VERSION = 1
+RULESET_SUFFIX = ".ruleset"
+
+# 文件头：魔数、版本、保留位、域名表条数、keyword 条数、regexp 条数、字符串区偏移。
+HEADER = struct.Struct("<4sHHIIII")
+# 每条记录：字符串区内偏移、长度、标志位。
+RECORD = struct.Struct("<IHH")
+
+FLAG_FULL = 1
+FLAG_DOMAIN = 2
+
+
+def _domain_key(value: str) -> bytes:
+    return ".".join(reversed_labels(value)).encode("utf-8")
+
+
+def compile_ruleset(lines: Iterable[str]) -> bytes:
+    """把 release 文本格式的行编译成二进制规则集。
+
+    full / domain 规则按反转标签（com.example.www）排序存成一张表，查询时按后缀逐级二分；
+    keyword 与 regexp 原样保存。
+    """
+    domains: Dict[bytes, int] = {}
+    keywords: List[bytes] = []
+    regexps: List[bytes] = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("keyword:"):
+            keywords.append(line[8:].encode("utf-8"))
+        elif line.startswith("regexp:"):
+            regexps.append(line[7:].encode("utf-8"))
+        elif line.startswith("."):
+            key = _domain_key(line[1:])
+            domains[key] = domains.get(key, 0) | FLAG_DOMAIN
+        else:
+            key = _domain_key(line)
+            domains[key] = domains.get(key, 0) | FLAG_FULL
+
+    strings = bytearray()
+    records = bytearray()
+
+    def add(value: bytes, flags: int):
+        records.extend(RECORD.pack(len(strings), len(value), flags))
+        strings.extend(value)
+
+    for key in sorted(domains):
+        add(key, domains[key])
+    for keyword in keywords:
+        add(keyword, 0)
+    for pattern in regexps:
+        add(pattern, 0)
+
+    strings_offset = HEADER.size + len(records)
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, 0, len(domains), len(keywords), len(regexps), strings_offset
+    )
+    return header + bytes(records) + bytes(strings)
+
+
+class RuleSet:
+    """内存映射的编译规则集，加载时不解析任何内容，match 对每级后缀做一次 O(log n) 二分。"""
+
+    def __init__(self, buffer: bytes, mapped: Optional[mmap.mmap] = None):
+        if len(buffer) < HEADER.size:
+            raise ValueError("规则集文件过短")
+        magic, version, _, domains, keywords, regexps, strings_offset = HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError("不是规则集文件")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"不支持的规则集版本: {version}")
+        self.buffer = buffer
+        self.mapped = mapped
+        self.domain_count = domains
+        self.keyword_count = keywords
+        self.regexp_count = regexps
+        self.strings_offset = strings_offset
+        self._keywords: Optional[List[str]] = None
+        self._patterns: Optional[List[Pattern[str]]] = None
+
+    @classmethod
+    def open(cls, path: Path) -> "RuleSet":
+        with open(path, "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, mapped)
+
+    def close(self):
+        if self.mapped is not None:
+            self.mapped.close()
+            self.mapped = None
+
+    def __enter__(self) -> "RuleSet":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.domain_count + self.keyword_count + self.regexp_count
+
+    def _record(self, index: int) -> Tuple[bytes, int]:
+        offset, length, flags = RECORD.unpack_from(self.buffer, HEADER.size + index * RECORD.size)
+        start = self.strings_offset + offset
+        return self.buffer[start:start + length], flags
+
+    def _find_flags(self, key: bytes) -> int:
+        low, high = 0, self.domain_count
+        while low < high:
+            middle = (low + high) // 2
+            value, flags = self._record(middle)
+            if value < key:
+                low = middle + 1
+            elif value > key:
+                high = middle
+            else:
+                return flags
+        return 0
+
+    def _strings(self, start: int, count: int) -> List[str]:
+        return [self._record(index)[0].decode("utf-8") for index in range(start, start + count)]
+
+    def keywords(self) -> List[str]:
+        return self._strings(self.domain_count, self.keyword_count)
+
+    def regexps(self) -> List[str]:
+        return self._strings(self.domain_count + self.keyword_count, self.regexp_count)
+
+    def find(self, domain: str) -> Optional[str]:
+        """返回命中的规则（release 文本格式，不含换行），未命中返回 None。"""
+        domain = domain.strip().rstrip(".").lower()
+        if not domain:
+            return None
+        labels = reversed_labels(domain)
+        for depth in range(1, len(labels) + 1):
+            flags = self._find_flags(".".join(labels[:depth]).encode("utf-8"))
+            if not flags:
+                continue
+            suffix = ".".join(reversed(labels[:depth]))
+            if flags & FLAG_DOMAIN:
+                return f".{suffix}"
+            if depth == len(labels):
+                return suffix
+
+        if self._keywords is None:
+            # keyword 和正则只在第一次需要时解码、编译。
+            self._keywords = self.keywords()
+        for keyword in self._keywords:
+            if keyword in domain:
+                return f"keyword:{keyword}"
+        if self._patterns is None:
+            self._patterns = [re.compile(pattern) for pattern in self.regexps()]
+        for pattern in self._patterns:
+            if pattern.search(domain):
+                return f"regexp:{pattern.pattern}"
+        return None
+
+    def match(self, domain: str) -> bool:
+        return self.find(domain) is not None
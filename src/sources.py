@@ -0,0 +1,278 @@
+import calendar
+import os
+import subprocess
+import tarfile
+import zipfile
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional, Tuple
+
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+
+class Source:
+    """数据源：按文件名列出和读取 v2fly data 目录里的源文件。
+
+    stat 返回 (大小, mtime_ns)，与 cache_key 一起供解析缓存判断是否需要重新读取。
+    """
+
+    def names(self) -> List[str]:
+        raise NotImplementedError
+
+    def read(self, name: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def stat(self, name: str) -> Optional[Tuple[int, int]]:
+        raise NotImplementedError
+
+    def cache_key(self, name: str) -> str:
+        raise NotImplementedError
+
+    def digest(self, name: str) -> Optional[str]:
+        """后端自带的内容标识（如 git blob ID），没有时返回 None，由调用方自行哈希。"""
+        return None
+
+    def describe(self) -> str:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def _is_source_name(name: str) -> bool:
+    return bool(name) and PurePosixPath(name).suffix == ""
+
+
+class DirectorySource(Source):
+    def __init__(self, path: Path):
+        self.path = path
+
+    def names(self) -> List[str]:
+        return sorted(
+            source_file.name
+            for source_file in self.path.glob('*')
+            if source_file.is_file() and _is_source_name(source_file.name)
+        )
+
+    def read(self, name: str) -> Optional[bytes]:
+        try:
+            return (self.path / name).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def stat(self, name: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = (self.path / name).stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def cache_key(self, name: str) -> str:
+        return str(self.path / name)
+
+    def describe(self) -> str:
+        return str(self.path.absolute())
+
+
+def _member_name(member_path: str, subdir: str) -> Optional[str]:
+    # 只认 [顶层目录/]data/<name> 这样的成员，GitHub 打包的归档都带一层 仓库名-分支 目录。
+    parts = PurePosixPath(member_path).parts
+    if len(parts) not in (2, 3) or parts[-2] != subdir:
+        return None
+    name = parts[-1]
+    return name if _is_source_name(name) else None
+
+
+class _ArchiveSource(Source):
+    def __init__(self, path: Path, subdir: str):
+        self.path = path
+        self.subdir = subdir
+        self.sizes: Dict[str, Tuple[int, int]] = {}
+
+    def names(self) -> List[str]:
+        return sorted(self.sizes)
+
+    def stat(self, name: str) -> Optional[Tuple[int, int]]:
+        return self.sizes.get(name)
+
+    def cache_key(self, name: str) -> str:
+        return f"{self.path}!{name}"
+
+    def describe(self) -> str:
+        return f"{self.path.absolute()}!{self.subdir}/"
+
+
+class TarSource(_ArchiveSource):
+    """tar 归档数据源，成员只索引一次。
+
+    未压缩的 tar 按偏移随机读取；压缩的 tar 无法高效随机定位，
+    在唯一一次顺序解压时把 data 成员的内容留在内存里，不落盘。
+    """
+
+    def __init__(self, path: Path, subdir: str = "data"):
+        super().__init__(path, subdir)
+        self.members: Dict[str, tarfile.TarInfo] = {}
+        self.contents: Dict[str, bytes] = {}
+        self.tar: Optional[tarfile.TarFile] = None
+        if path.suffix == ".tar":
+            self.tar = tarfile.open(path, "r:")
+            for member in self.tar.getmembers():
+                self._index(member)
+        else:
+            with tarfile.open(path, "r|*") as tar:
+                for member in tar:
+                    name = self._index(member)
+                    if name is not None:
+                        self.contents[name] = tar.extractfile(member).read()
+
+    def _index(self, member: tarfile.TarInfo) -> Optional[str]:
+        name = _member_name(member.name, self.subdir) if member.isfile() else None
+        if name is not None:
+            self.members[name] = member
+            self.sizes[name] = (member.size, int(member.mtime * 1_000_000_000))
+        return name
+
+    def read(self, name: str) -> Optional[bytes]:
+        if self.tar is None:
+            return self.contents.get(name)
+        member = self.members.get(name)
+        if member is None:
+            return None
+        return self.tar.extractfile(member).read()
+
+    def close(self):
+        if self.tar is not None:
+            self.tar.close()
+
+
+class ZipSource(_ArchiveSource):
+    """zip 归档数据源：中央目录索引一次，成员按需解压。"""
+
+    def __init__(self, path: Path, subdir: str = "data"):
+        super().__init__(path, subdir)
+        self.zip = zipfile.ZipFile(path)
+        self.members: Dict[str, zipfile.ZipInfo] = {}
+        for info in self.zip.infolist():
+            name = None if info.is_dir() else _member_name(info.filename, subdir)
+            if name is not None:
+                self.members[name] = info
+                mtime = calendar.timegm(info.date_time + (0, 0, 0))
+                self.sizes[name] = (info.file_size, mtime * 1_000_000_000)
+
+    def read(self, name: str) -> Optional[bytes]:
+        info = self.members.get(name)
+        if info is None:
+            return None
+        return self.zip.read(info)
+
+    def close(self):
+        self.zip.close()
+
+
+class GitSource(Source):
+    """直接读取 git 仓库某个版本里的 data 目录，不需要检出工作区。
+
+    用 git ls-tree 列出 blob ID 和大小；内容通过常驻的 git cat-file --batch 管道按需读取。
+    blob ID 就是内容哈希，解析缓存和增量清单都以它为键，未变化的文件无需读取。
+    """
+
+    def __init__(self, repo: Path, rev: str = "HEAD", subdir: str = "data"):
+        self.repo = repo
+        self.rev = rev
+        self.subdir = subdir
+        self.blobs: Dict[str, str] = {}
+        self.sizes: Dict[str, int] = {}
+        self.process: Optional[subprocess.Popen] = None
+        listing = self._git("ls-tree", "-l", "-z", f"{rev}:{subdir}")
+        for record in listing.split(b"\0"):
+            if not record:
+                continue
+            meta, _, path = record.partition(b"\t")
+            _, kind, oid, size = meta.split()
+            name = path.decode("utf-8")
+            if kind == b"blob" and _is_source_name(name):
+                self.blobs[name] = oid.decode("ascii")
+                self.sizes[name] = int(size)
+
+    def _git(self, *args: str) -> bytes:
+        try:
+            completed = subprocess.run(
+                ["git", "-C", str(self.repo), *args],
+                check=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+        except FileNotFoundError as err:
+            raise ValueError("找不到 git 命令") from err
+        except subprocess.CalledProcessError as err:
+            message = err.stderr.decode("utf-8", "replace").strip()
+            raise ValueError(f"git {args[0]} 失败: {message}") from err
+        return completed.stdout
+
+    def _cat_file(self) -> subprocess.Popen:
+        if self.process is None:
+            self.process = subprocess.Popen(
+                ["git", "-C", str(self.repo), "cat-file", "--batch"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+            )
+        return self.process
+
+    def names(self) -> List[str]:
+        return sorted(self.blobs)
+
+    def read(self, name: str) -> Optional[bytes]:
+        oid = self.blobs.get(name)
+        if oid is None:
+            return None
+        process = self._cat_file()
+        process.stdin.write(oid.encode("ascii") + b"\n")
+        process.stdin.flush()
+        header = process.stdout.readline().split()
+        if len(header) != 3 or header[1] != b"blob":
+            raise ValueError(f"git cat-file 返回异常: {b' '.join(header).decode('utf-8', 'replace')}")
+        data = process.stdout.read(int(header[2]))
+        process.stdout.read(1)
+        return data
+
+    def stat(self, name: str) -> Optional[Tuple[int, int]]:
+        size = self.sizes.get(name)
+        if size is None:
+            return None
+        return size, 0
+
+    def cache_key(self, name: str) -> str:
+        return f"git:{self.blobs[name]}"
+
+    def digest(self, name: str) -> Optional[str]:
+        return self.blobs.get(name)
+
+    def describe(self) -> str:
+        return f"{self.repo.absolute()}@{self.rev}:{self.subdir}/"
+
+    def close(self):
+        if self.process is not None:
+            self.process.stdin.close()
+            self.process.wait()
+            self.process.stdout.close()
+            self.process = None
+
+
+def is_archive(path: Path) -> bool:
+    name = path.name.lower()
+    return name.endswith(".zip") or name.endswith(TAR_SUFFIXES)
+
+
+def open_source(path: Path, subdir: str = "data", git_rev: Optional[str] = None) -> Source:
+    """按路径选择数据源：目录、.zip 或 tar 归档（.tar / .tar.gz / .tgz 等）；
+    指定 git_rev 时把 path 当作 git 仓库，读取该版本的 subdir。"""
+    if git_rev is not None:
+        if not path.is_dir():
+            raise FileNotFoundError(path)
+        return GitSource(path, git_rev, subdir)
+    if path.is_dir():
+        return DirectorySource(path)
+    if not os.path.isfile(path) or not is_archive(path):
+        raise FileNotFoundError(path)
+    if path.name.lower().endswith(".zip"):
+        return ZipSource(path, subdir)
+    return TarSource(path, subdir)
@@ -0,0 +1,260 @@
+import marshal
+import shutil
+import tempfile
+from itertools import chain
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .graph import IncludeGraph
+from .processor import EvaluatedSet, PackedEntries
+
+# 估算内存占用用的 CPython 对象开销：str 头部约 49 字节，列表每个槽位 8 字节，空列表 56 字节。
+STR_OVERHEAD = 49
+SLOT_BYTES = 8
+LIST_OVERHEAD = 56
+
+
+def estimate_lines(lines: List[str]) -> int:
+    return LIST_OVERHEAD + sum(map(len, lines)) + len(lines) * (STR_OVERHEAD + SLOT_BYTES)
+
+
+def count_dependents(graph: IncludeGraph, order: Iterable[str], cyclic: Dict[str, Any]) -> Dict[str, int]:
+    """每个文件还有多少个父文件要 include 它（被循环引用剪掉的边不计）。"""
+    dependents: Dict[str, int] = {}
+    for name in order:
+        cut = cyclic.get(name, ())
+        for target in graph.edges.get(name, ()):
+            if target not in cut:
+                dependents[target] = dependents.get(target, 0) + 1
+    return dependents
+
+
+class EntryStore:
+    """按剩余依赖者计数保存每个文件的求值结果。
+
+    父文件求值完后调用 done()：子文件的计数减一，归零即释放；没有父文件的文件求值后立即释放。
+    retain 为真时既不释放也不溢出，构建结束后仍可读取全部结果。
+    设置 max_bytes 时，常驻结果的估算大小超出预算会把仍被需要的最大几项以 marshal 形式
+    溢出到临时目录，下次读取时再载入。默认保存的是跨进程使用的 PackedEntries。
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, retain: bool = False):
+        self.pending: Dict[str, int] = {}
+        self.max_bytes = None if retain else max_bytes
+        self.retain = retain
+        self.resident: Dict[str, Any] = {}
+        self.sizes: Dict[str, int] = {}
+        self.spilled: Dict[str, Path] = {}
+        self.spill_dir: Optional[Path] = None
+        self.resident_bytes = 0
+        self.peak_bytes = 0
+        self.released = 0
+        self.spills = 0
+        self.reloads = 0
+        self.spilled_bytes = 0
+
+    def measure(self, value: Any) -> int:
+        return sum(estimate_lines(lines) for _, lines in value)
+
+    def encode(self, value: Any) -> PackedEntries:
+        return value
+
+    def decode(self, packed: PackedEntries) -> Any:
+        return packed
+
+    def expect(self, dependents: Dict[str, int]):
+        self.pending.update(dependents)
+
+    def needed(self, name: str) -> bool:
+        """是否还有父文件要读取 name 的结果；没有时从清单复用的文件不必载入。"""
+        return self.retain or self.pending.get(name, 0) > 0
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.resident or name in self.spilled
+
+    def __len__(self) -> int:
+        return len(self.resident) + len(self.spilled)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([*self.resident, *self.spilled])
+
+    def __getitem__(self, name: str) -> Any:
+        value = self.resident.get(name)
+        if value is not None:
+            return value
+        path = self.spilled.pop(name, None)
+        if path is None:
+            raise KeyError(name)
+        value = self.decode(marshal.loads(path.read_bytes()))
+        path.unlink()
+        self.reloads += 1
+        self._keep(name, value)
+        return value
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self[name] if name in self else default
+
+    def __setitem__(self, name: str, value: Any):
+        self._discard(name)
+        self._keep(name, value)
+
+    def done(self, name: str, children: Iterable[str]):
+        """name 已经求值（或从清单复用），它 include 的子文件各少一个待处理的父文件。"""
+        if self.retain:
+            return
+        for child in children:
+            remaining = self.pending.get(child, 0) - 1
+            self.pending[child] = remaining
+            if remaining <= 0 and self._discard(child):
+                self.released += 1
+        if self.pending.get(name, 0) <= 0 and self._discard(name):
+            self.released += 1
+
+    def _account(self, name: str, value: Any) -> int:
+        """记下 name 的大小（挑溢出对象用），返回常驻字节数因此增加多少。"""
+        size = self.sizes[name] = self.measure(value)
+        return size
+
+    def _unaccount(self, name: str) -> int:
+        """name 不再常驻，返回常驻字节数因此减少多少。"""
+        return self.sizes.pop(name)
+
+    def _keep(self, name: str, value: Any):
+        self.resident[name] = value
+        self.resident_bytes += self._account(name, value)
+        self._check_budget(keep=name)
+
+    def _check_budget(self, keep: str):
+        if self.max_bytes is not None and self.resident_bytes > self.max_bytes:
+            self._spill(keep=keep)
+        self.peak_bytes = max(self.peak_bytes, self.resident_bytes)
+
+    def _discard(self, name: str) -> bool:
+        if name in self.resident:
+            del self.resident[name]
+            self.resident_bytes -= self._unaccount(name)
+            return True
+        path = self.spilled.pop(name, None)
+        if path is not None:
+            path.unlink()
+            return True
+        return False
+
+    def _spill(self, keep: str):
+        # 先溢出最大的项；刚写入或刚载入的那一项马上要用，留在内存里。
+        victims = sorted(
+            (name for name in self.resident if name != keep),
+            key=self.sizes.__getitem__,
+            reverse=True,
+        )
+        for name in victims:
+            if self.resident_bytes <= self.max_bytes:
+                break
+            if self.spill_dir is None:
+                self.spill_dir = Path(tempfile.mkdtemp(prefix="network-rules-spill-"))
+            data = marshal.dumps(self.encode(self.resident.pop(name)))
+            path = self.spill_dir / f"{self.spills}.marshal"
+            path.write_bytes(data)
+            self.spilled[name] = path
+            self.resident_bytes -= self._unaccount(name)
+            self.spills += 1
+            self.spilled_bytes += len(data)
+
+    def __enter__(self) -> "EntryStore":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.spill_dir is not None:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+            self.spill_dir = None
+        self.spilled.clear()
+
+    def report(self):
+        info = f"🧮 求值结果: 常驻峰值约 {self.peak_bytes / 1024 / 1024:.1f} MB, 释放 {self.released} 个"
+        if self.spills:
+            info += (
+                f", 溢出到磁盘 {self.spills} 次 ({self.spilled_bytes / 1024 / 1024:.1f} MB), "
+                f"重新载入 {self.reloads} 次"
+            )
+        print(info)
+
+
+class ProcessedStore(EntryStore):
+    """单进程构建用的 processed 映射，值为 DocumentProcessor 写入的 (result, EvaluatedSet)。
+
+    result 只在处理器内部使用，保存时丢弃；溢出时按 EvaluatedSet.pack() 压缩，
+    include 进来的 runs 合并进无属性分组，载入后的 select 结果不变。
+
+    父文件的 runs 引用的是子文件的分组或 selections 里的列表，常驻大小按列表对象计数：
+    同一个列表无论被多少个结果引用只计一次，最后一个引用它的结果离开内存时才扣除。
+    父文件求值时才在子文件的 selections 里记下合并结果，所以 done() 时重新清点子文件。
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, retain: bool = False):
+        super().__init__(max_bytes, retain)
+        # id(列表) -> [列表, 引用它的常驻结果数, 估算大小]；保存列表本身以免 id 被复用。
+        self.shared: Dict[int, List[Any]] = {}
+        self.held: Dict[str, Set[int]] = {}
+
+    @staticmethod
+    def _lists(evaluated: EvaluatedSet) -> Iterator[List[str]]:
+        # 外部排序模式下的 SortedRun 在磁盘上，不计入常驻大小。
+        for lines in chain(
+            evaluated.groups.values(), evaluated.runs, *evaluated.selections.values()
+        ):
+            if isinstance(lines, list):
+                yield lines
+
+    def measure(self, value: Tuple[List[str], EvaluatedSet]) -> int:
+        unique = {id(lines): lines for lines in self._lists(value[1])}
+        return sum(map(estimate_lines, unique.values()))
+
+    def _account(self, name: str, value: Tuple[List[str], EvaluatedSet]) -> int:
+        self.sizes[name] = self.measure(value)
+        held = self.held.setdefault(name, set())
+        added = 0
+        for lines in self._lists(value[1]):
+            key = id(lines)
+            if key in held:
+                continue
+            held.add(key)
+            record = self.shared.get(key)
+            if record is None:
+                size = estimate_lines(lines)
+                self.shared[key] = [lines, 1, size]
+                added += size
+            else:
+                record[1] += 1
+        return added
+
+    def _unaccount(self, name: str) -> int:
+        self.sizes.pop(name)
+        freed = 0
+        for key in self.held.pop(name, ()):
+            record = self.shared[key]
+            record[1] -= 1
+            if not record[1]:
+                del self.shared[key]
+                freed += record[2]
+        return freed
+
+    def done(self, name: str, children: Iterable[str]):
+        children = list(children)
+        for child in children:
+            value = self.resident.get(child)
+            if value is not None:
+                self.resident_bytes += self._account(child, value)
+                self._check_budget(keep=child)
+        super().done(name, children)
+
+    def encode(self, value: Tuple[List[str], EvaluatedSet]) -> PackedEntries:
+        return value[1].pack()
+
+    def decode(self, packed: PackedEntries) -> Tuple[List[str], EvaluatedSet]:
+        return [], EvaluatedSet.unpack(packed)
+
+    def __setitem__(self, name: str, value: Tuple[List[str], EvaluatedSet]):
+        super().__setitem__(name, ([], value[1]))
@@ -0,0 +1,59 @@
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+
+def split_attr(attr: str) -> Tuple[str, bool]:
+    """把 "@cn" / "@!cn" 拆成 (标签名, 是否否定)。"""
+    if attr.startswith("@!"):
+        return attr[2:], True
+    if attr.startswith("@"):
+        return attr[1:], False
+    return attr, False
+
+
+class TagRegistry:
+    """全局标签注册表：每个标签名占一个比特位，正负属性共用同一位。
+
+    条目属性以整数掩码保存，include 过滤变成位运算；解码结果按掩码缓存，相同掩码共享同一个 frozenset。
+    """
+
+    def __init__(self):
+        self._bits: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._decoded: Dict[Tuple[int, bool], FrozenSet[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def bit(self, tag: str) -> int:
+        bit = self._bits.get(tag)
+        if bit is None:
+            bit = 1 << len(self._names)
+            self._bits[tag] = bit
+            self._names.append(tag)
+        return bit
+
+    def encode(self, attrs: Iterable[str]) -> int:
+        mask = 0
+        for attr in attrs:
+            mask |= self.bit(split_attr(attr)[0])
+        return mask
+
+    def attr_bit(self, attr: str) -> Tuple[int, bool]:
+        tag, negative = split_attr(attr)
+        return self.bit(tag), negative
+
+    def decode(self, mask: int, negative: bool = False) -> FrozenSet[str]:
+        key = (mask, negative)
+        decoded = self._decoded.get(key)
+        if decoded is None:
+            prefix = "@!" if negative else "@"
+            decoded = frozenset(
+                f"{prefix}{name}"
+                for index, name in enumerate(self._names)
+                if mask >> index & 1
+            )
+            self._decoded[key] = decoded
+        return decoded
+
+
+TAGS = TagRegistry()
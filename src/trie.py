@@ -0,0 +1,36 @@
+from typing import Any, Dict, List, Optional
+
+# 终结标记：节点上存在该键表示对应后缀本身是一条 domain 规则。
+DOMAIN_MARK = ""
+
+
+def reversed_labels(value: str) -> List[str]:
+    return value.split(".")[::-1]
+
+
+class DomainTrie:
+    """按反转标签组织的后缀树：com -> example -> www。"""
+
+    def __init__(self):
+        self.root: Dict[str, Any] = {}
+        self.size = 0
+
+    def add_domain(self, value: str):
+        node = self.root
+        for label in reversed_labels(value):
+            node = node.setdefault(label, {})
+        if DOMAIN_MARK not in node:
+            node[DOMAIN_MARK] = True
+            self.size += 1
+
+    def covering_domain(self, value: str, strict: bool = False) -> Optional[str]:
+        """返回覆盖 value 的 domain 规则；strict 时不算 value 自身。"""
+        labels = reversed_labels(value)
+        node = self.root
+        for depth, label in enumerate(labels, 1):
+            node = node.get(label)
+            if node is None:
+                return None
+            if DOMAIN_MARK in node and not (strict and depth == len(labels)):
+                return ".".join(reversed(labels[:depth]))
+        return None
@@ -0,0 +1,264 @@
+import filecmp
+import hashlib
+import os
+from itertools import chain
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def _same_content(path: Path, data: bytes) -> bool:
+    try:
+        if path.stat().st_size != len(data):
+            return False
+        return path.read_bytes() == data
+    except FileNotFoundError:
+        return False
+
+
+def _same_size(path: Path, size: int) -> bool:
+    try:
+        return path.stat().st_size == size
+    except FileNotFoundError:
+        return False
+
+
+def _tmp_path(path: Path) -> Path:
+    return path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+
+def write_atomic(path: Path, data: bytes):
+    # 先写同目录临时文件再 rename，读者不会看到写了一半的文件。
+    tmp_path = _tmp_path(path)
+    try:
+        with tmp_path.open("wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+LINK_MODES = ("hardlink", "symlink")
+# write_chunks 在内存里最多攒这么多字节，超过后改为边写临时文件边计算哈希。
+STREAM_BUFFER_BYTES = 1024 * 1024
+
+
+def _is_linked(path: Path, canonical: Path, link_mode: str) -> bool:
+    try:
+        if link_mode == "symlink":
+            return path.is_symlink() and os.readlink(path) == canonical.name
+        return not path.is_symlink() and os.path.samefile(path, canonical)
+    except FileNotFoundError:
+        return False
+
+
+def _link_atomic(path: Path, canonical: Path, link_mode: str):
+    tmp_path = _tmp_path(path)
+    tmp_path.unlink(missing_ok=True)
+    try:
+        if link_mode == "symlink":
+            os.symlink(canonical.name, tmp_path)
+        else:
+            os.link(canonical, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+class OutputWriter:
+    """只在内容变化时写输出文件，未变化的文件保持原样（包括 mtime）。
+
+    known_hashes 通常来自上次构建的清单：哈希不同直接写入，不必读旧文件；
+    哈希相同或没有记录时仍与磁盘上的现有文件逐字节比较，被手工改动（哪怕大小不变）的输出也会重写。hashes 记录本次每个输出的内容哈希，供清单复用。
+
+    link_mode 为 hardlink / symlink 时按内容哈希去重：每种内容只写一份，
+    其余同内容的输出在 link_duplicates() 中链接到第一份。
+    符号链接会跟着目标文件的重写而变化，而不同源文件的输出可能一个重建、一个增量跳过，
+    所以 symlink 模式只在同一源文件（write 的 source 参数）的输出之间链接；
+    硬链接在目标被 rename 替换后仍指向旧内容，不受此限制。
+    """
+
+    def __init__(
+        self,
+        release_dir: Path,
+        known_hashes: Optional[Dict[str, str]] = None,
+        link_mode: Optional[str] = None,
+    ):
+        if link_mode is not None and link_mode not in LINK_MODES:
+            raise ValueError(f"未知的链接模式: {link_mode}")
+        self.release_dir = release_dir
+        self.known_hashes = known_hashes or {}
+        self.link_mode = link_mode
+        self.hashes: Dict[str, str] = {}
+        self.sizes: Dict[str, int] = {}
+        self.sources: Dict[str, str] = {}
+        self.bodies: Dict[Tuple[str, str], str] = {}
+        self.written = 0
+        self.skipped = 0
+        self.linked = 0
+        self.bytes_written = 0
+        self.bytes_skipped = 0
+
+    def _body_key(self, file_name: str) -> Tuple[str, str]:
+        scope = self.sources.get(file_name, "") if self.link_mode == "symlink" else ""
+        return scope, self.hashes[file_name]
+
+    def _needs_write(
+        self,
+        file_name: str,
+        digest: str,
+        size: int,
+        same_content: Callable[[Path], bool],
+        source: Optional[str],
+    ) -> bool:
+        self.hashes[file_name] = digest
+        self.sizes[file_name] = size
+        if source is not None:
+            self.sources[file_name] = source
+        canonical = self.bodies.setdefault(self._body_key(file_name), file_name)
+        if self.link_mode and canonical != file_name:
+            # 重复内容不落盘，留给 link_duplicates() 链接。
+            return False
+
+        path = self.release_dir / file_name
+        known = self.known_hashes.get(file_name)
+        if path.is_symlink() or (known is not None and known != digest):
+            unchanged = False
+        else:
+            unchanged = same_content(path)
+
+        if unchanged:
+            self.skipped += 1
+            self.bytes_skipped += size
+            return False
+        self.written += 1
+        self.bytes_written += size
+        return True
+
+    def write(self, file_name: str, data: bytes, source: Optional[str] = None) -> bool:
+        """写入 release_dir/file_name，返回是否真的写了文件；source 为产出它的源文件名。"""
+        digest = hashlib.sha256(data).hexdigest()
+        if not self._needs_write(
+            file_name, digest, len(data), lambda path: _same_content(path, data), source
+        ):
+            return False
+        write_atomic(self.release_dir / file_name, data)
+        return True
+
+    def write_chunks(
+        self, file_name: str, chunks: Iterable[bytes], source: Optional[str] = None
+    ) -> bool:
+        """与 write 相同，但内容按块产出；小文件攒齐后走 write，大文件边写临时文件边哈希。"""
+        buffered: List[bytes] = []
+        size = 0
+        iterator = iter(chunks)
+        for chunk in iterator:
+            buffered.append(chunk)
+            size += len(chunk)
+            if size >= STREAM_BUFFER_BYTES:
+                return self._write_stream(file_name, buffered, iterator, source)
+        return self.write(file_name, b"".join(buffered), source)
+
+    def _write_stream(
+        self, file_name: str, head: List[bytes], rest: Iterator[bytes], source: Optional[str]
+    ) -> bool:
+        path = self.release_dir / file_name
+        tmp_path = _tmp_path(path)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with tmp_path.open("wb") as file:
+                for chunk in chain(head, rest):
+                    digest.update(chunk)
+                    file.write(chunk)
+                    size += len(chunk)
+
+            def same_content(target: Path) -> bool:
+                return _same_size(target, size) and filecmp.cmp(tmp_path, target, shallow=False)
+
+            if not self._needs_write(file_name, digest.hexdigest(), size, same_content, source):
+                tmp_path.unlink()
+                return False
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return True
+
+    def link_duplicates(self) -> int:
+        """把同内容的输出链接到各自的第一份，返回新建的链接数。"""
+        if not self.link_mode:
+            return 0
+        created = 0
+        self.linked = 0
+        for file_name in self.hashes:
+            canonical = self.bodies[self._body_key(file_name)]
+            if canonical == file_name:
+                continue
+            self.linked += 1
+            path = self.release_dir / file_name
+            canonical_path = self.release_dir / canonical
+            if not _is_linked(path, canonical_path, self.link_mode):
+                _link_atomic(path, canonical_path, self.link_mode)
+                created += 1
+        return created
+
+    def remove(self, file_names: Iterable[str]):
+        """删除过期输出；仍被符号链接引用的文件先移到第一个引用它的位置。"""
+        stale = set(file_names)
+        if not stale:
+            return
+        referrers: Dict[str, List[Path]] = {}
+        if self.link_mode == "symlink":
+            for entry in os.scandir(self.release_dir):
+                if entry.is_symlink() and entry.name not in stale:
+                    target = os.readlink(entry.path)
+                    if target in stale:
+                        referrers.setdefault(target, []).append(Path(entry.path))
+        for name in sorted(stale):
+            path = self.release_dir / name
+            links = referrers.get(name)
+            if not links:
+                path.unlink(missing_ok=True)
+                continue
+            first, *rest = sorted(links)
+            os.replace(path, first)
+            for link in rest:
+                _link_atomic(link, first, "symlink")
+
+    def merge(self, other: "OutputWriter"):
+        self.hashes.update(other.hashes)
+        self.sizes.update(other.sizes)
+        self.sources.update(other.sources)
+        for file_name in other.hashes:
+            self.bodies.setdefault(self._body_key(file_name), file_name)
+        self.written += other.written
+        self.skipped += other.skipped
+        self.bytes_written += other.bytes_written
+        self.bytes_skipped += other.bytes_skipped
+
+    def duplicate_stats(self) -> Tuple[int, int, int, int]:
+        """返回 (重复文件数, 总文件数, 重复字节数, 总字节数)。"""
+        total_bytes = sum(self.sizes.values())
+        unique_bytes = sum(self.sizes[name] for name in self.bodies.values())
+        return (
+            len(self.hashes) - len(self.bodies),
+            len(self.hashes),
+            total_bytes - unique_bytes,
+            total_bytes,
+        )
+
+    def report(self):
+        print(
+            f"💾 输出文件: 写入 {self.written} 个 ({self.bytes_written} 字节), "
+            f"未变化跳过 {self.skipped} 个 ({self.bytes_skipped} 字节)"
+        )
+        duplicates, total, duplicate_bytes, total_bytes = self.duplicate_stats()
+        if duplicates:
+            ratio = duplicate_bytes / total_bytes if total_bytes else 0.0
+            action = f"已{'硬' if self.link_mode == 'hardlink' else '符号'}链接" if self.link_mode else "未链接"
+            print(
+                f"🔗 重复输出: {duplicates}/{total} 个文件, "
+                f"{duplicate_bytes}/{total_bytes} 字节 ({ratio:.1%})，{action}"
+            )
@@ -0,0 +1,48 @@
+from benchmarks.corpus import generate_corpus
+from benchmarks.memory import measure_memory
+from benchmarks.run import compare_results, run_benchmarks
+from src.build import list_source_names
+from src.graph import scan_include_graph
+
+
+def test_generate_corpus_is_seeded_and_acyclic(tmp_path):
+    first = generate_corpus(tmp_path / "a", files=80, seed=1, chain_depth=10)
+    second = generate_corpus(tmp_path / "b", files=80, seed=1, chain_depth=10)
+
+    names = list_source_names(tmp_path / "a")
+    assert first == second
+    assert first["files"] == len(names) == 80
+    assert all((tmp_path / "a" / n).read_text() == (tmp_path / "b" / n).read_text() for n in names)
+
+    graph = scan_include_graph(tmp_path / "a", names)
+    assert graph.build_order()[1] == {}
+    assert "chain-9" in graph.edges["geolocation-cn"]
+
+
+def test_run_benchmarks_reports_every_stage(tmp_path):
+    results = run_benchmarks(tmp_path, files=40, seed=3, memory=False)
+
+    assert set(results["stages"]) == {"format_doc", "parse_doc", "process", "collect_file_data"}
+    assert results["stages"]["process"]["items"] == 40
+    assert results["stages"]["collect_file_data"]["items"] > 0
+
+
+def test_compare_results_flags_regressions():
+    baseline = {"stages": {"process": {"seconds": 1.0, "peak_bytes": 100}}}
+    current = {"stages": {
+        "process": {"seconds": 1.1, "peak_bytes": 200},
+        "new_stage": {"seconds": 5.0},
+    }}
+
+    assert compare_results(current, baseline, tolerance=0.2) == [
+        "process.peak_bytes: 100 -> 200 (x2.00)"
+    ]
+
+
+def test_measure_memory_reports_per_item_bytes(tmp_path):
+    results = measure_memory(tmp_path, files=40, seed=3)
+
+    assert results["tokens"]["count"] == results["meta"]["lines"]
+    for stage in ("tokens", "entries", "evaluated"):
+        assert results[stage]["count"] > 0
+        assert results[stage]["bytes"] > 0
@@ -0,0 +1,209 @@
+import os
+
+from src.build import BuildEngine, list_source_names
+from src.customizations import IncludeOverlay
+
+
+def test_list_source_names_skips_suffix_files(tmp_path):
+    (tmp_path / "b").write_text("b.com")
+    (tmp_path / "a").write_text("a.com")
+    (tmp_path / "README.md").write_text("x")
+    (tmp_path / "sub").mkdir()
+
+    assert list_source_names(tmp_path) == ["a", "b"]
+
+
+def test_engine_builds_includes_once(tmp_path, capsys):
+    source_dir = tmp_path / "data"
+    source_dir.mkdir()
+    release_dir = tmp_path / "release"
+    release_dir.mkdir()
+    (source_dir / "top").write_text("include:left\ninclude:right")
+    (source_dir / "left").write_text("include:base@cn")
+    (source_dir / "right").write_text("include:base")
+    (source_dir / "base").write_text("a.com@cn\nb.com")
+
+    engine = BuildEngine(source_dir, release_dir)
+    count = engine.run(list_source_names(source_dir))
+
+    assert count == 4
+    assert (release_dir / "top.txt").read_text().splitlines()[2:] == [".a.com", ".b.com"]
+    assert capsys.readouterr().out.count("路径：base") == 1
+
+
+def test_engine_deep_include_chain(tmp_path):
+    source_dir = tmp_path / "data"
+    source_dir.mkdir()
+    release_dir = tmp_path / "release"
+    release_dir.mkdir()
+    depth = 1500
+    for i in range(depth):
+        (source_dir / f"n{i}").write_text(f"include:n{i + 1}\nd{i}.com")
+    (source_dir / f"n{depth}").write_text("leaf.com")
+
+    BuildEngine(source_dir, release_dir).run(["n0"])
+
+    lines = (release_dir / "n0.txt").read_text().splitlines()[2:]
+    assert len(lines) == depth + 1
+
+
+def test_engine_cycle_is_cut(tmp_path):
+    source_dir = tmp_path / "data"
+    source_dir.mkdir()
+    release_dir = tmp_path / "release"
+    release_dir.mkdir()
+    (source_dir / "a").write_text("include:b\na.com")
+    (source_dir / "b").write_text("include:a\nb.com")
+
+    BuildEngine(source_dir, release_dir).run(["a", "b"])
+
+    # 与按名称顺序逐个递归处理一致：只有 b 指回 a 的那条边被剪掉。
+    assert (release_dir / "a.txt").read_text().splitlines()[2:] == [".a.com", ".b.com"]
+    assert (release_dir / "b.txt").read_text().splitlines()[2:] == [".b.com"]
+
+
+def test_engine_file_outside_cycle_keeps_cycle_members(tmp_path):
+    source_dir = tmp_path / "data"
+    source_dir.mkdir()
+    (source_dir / "cyc-a").write_text("include:cyc-b\na.com")
+    (source_dir / "cyc-b").write_text("include:cyc-c\nb.com")
+    (source_dir / "cyc-c").write_text("include:cyc-a\nc.com")
+    (source_dir / "outer").write_text("include:cyc-b")
+    names = list_source_names(source_dir)
+
+    outputs = []
+    for jobs in (1, 2):
+        release_dir = tmp_path / f"release-{jobs}"
+        release_dir.mkdir()
+        BuildEngine(source_dir, release_dir, jobs=jobs).run(names)
+        outputs.append({p.name: p.read_text() for p in release_dir.iterdir()})
+
+    assert outputs[0] == outputs[1]
+    assert outputs[0]["outer.txt"].splitlines()[2:] == [".b.com", ".c.com"]
+    assert outputs[0]["cyc-a.txt"].splitlines()[2:] == [".a.com", ".b.com", ".c.com"]
+
+
+def test_engine_parallel_matches_serial(tmp_path):
+    source_dir = tmp_path / "data"
+    source_dir.mkdir()
+    (source_dir / "top").write_text("include:left\ninclude:right@cn\ntop.com@ads")
+    (source_dir / "left").write_text("include:base@-cn\nleft.com@cn")
+    (source_dir / "right").write_text("include:base\ninclude:left\nright.com")
+    (source_dir / "base").write_text("a.com@cn\nb.com\nc.com@ads@cn")
+    policies = {"cn": {"pos": True, "neg": True}, "ads": {"pos": True, "neg": False}}
+
+    outputs = []
+    for jobs in (1, 2):
+        release_dir = tmp_path / f"release-{jobs}"
+        release_dir.mkdir()
+        BuildEngine(source_dir, release_dir, tag_policies=policies, jobs=jobs).run(
+            list_source_names(source_dir)
+        )
+        outputs.append({p.name: p.read_text() for p in release_dir.iterdir()})
+
+    assert outputs[0] == outputs[1]
+    assert "top@ads.txt" in outputs[1]
+
+
+def test_engine_applies_include_overlay_without_touching_sources(tmp_path):
+    source_dir = tmp_path / "data"
+    source_dir.mkdir()
+    release_dir = tmp_path / "release"
+    release_dir.mkdir()
+    (source_dir / "microsoft").write_text("include:github\nmicrosoft.com")
+    (source_dir / "github").write_text("github.com")
+
+    overlay = IncludeOverlay([{"from_file": "microsoft", "exclude": ["github"]}])
+    BuildEngine(source_dir, release_dir, overlay=overlay).run(list_source_names(source_dir))
+
+    assert (release_dir / "microsoft.txt").read_text().splitlines()[2:] == [".microsoft.com"]
+    assert (source_dir / "microsoft").read_text() == "include:github\nmicrosoft.com"
+    assert overlay.edits == {"microsoft": 1}
+
+
+def test_engine_overlay_reports_existing_files_without_includes(tmp_path, capsys):
+    source_dir = tmp_path / "data"
+    source_dir.mkdir()
+    (source_dir / "empty").write_text("# nothing here\n")
+    (source_dir / "plain").write_text("plain.com")
+    names = list_source_names(source_dir)
+
+    for options in ({}, {"spill_lines": 1}):
+        release_dir = tmp_path / f"release-{len(options)}"
+        release_dir.mkdir()
+        overlay = IncludeOverlay([
+            {"from_file": name, "exclude": ["github"]} for name in ("empty", "plain", "missing")
+        ])
+        BuildEngine(source_dir, release_dir, overlay=overlay, **options).run(names)
+
+        assert overlay.edits == {"empty": 0, "plain": 0}
+        output = capsys.readouterr().out
+        assert "预处理完成: empty, 删除 include 行 0 条" in output
+        assert "预处理完成: plain, 删除 include 行 0 条" in output
+        assert "目标不存在，跳过: 'missing'" in output
+        assert "'empty'" not in output and "'plain'" not in output
+
+
+def test_manifest_rebuilds_when_overlay_changes(tmp_path):
+    source_dir = tmp_path / "data"
+    source_dir.mkdir()
+    release_dir = tmp_path / "release"
+    release_dir.mkdir()
+    manifest_path = tmp_path / "manifest.json"
+    (source_dir / "microsoft").write_text("include:github\nmicrosoft.com")
+    (source_dir / "github").write_text("github.com")
+    names = list_source_names(source_dir)
+
+    BuildEngine(source_dir, release_dir, manifest_path=manifest_path).run(names)
+    overlay = IncludeOverlay([{"from_file": "microsoft", "exclude": ["github"]}])
+    engine = BuildEngine(source_dir, release_dir, manifest_path=manifest_path, overlay=overlay)
+    engine.run(names)
+
+    assert engine.skipped == 0
+    assert (release_dir / "microsoft.txt").read_text().splitlines()[2:] == [".microsoft.com"]
+
+
+def test_engine_hardlinks_identical_tag_page(tmp_path):
+    source_dir = tmp_path / "data"
+    source_dir.mkdir()
+    release_dir = tmp_path / "release"
+    release_dir.mkdir()
+    (source_dir / "cn").write_text("a.cn @cn\nb.cn @cn")
+
+    engine = BuildEngine(
+        source_dir,
+        release_dir,
+        tag_policies={"cn": {"pos": True, "neg": False}},
+        link_mode="hardlink",
+    )
+    engine.run(["cn"])
+
+    assert os.path.samefile(release_dir / "cn.txt", release_dir / "cn@cn.txt")
+    assert engine.writer.duplicate_stats()[:2] == (1, 2)
+
+
+def test_engine_counts_include_selection_cache_hits(tmp_path, capsys):
+    source_dir = tmp_path / "data"
+    source_dir.mkdir()
+    (source_dir / "left").write_text("include:base@cn\nleft.com")
+    (source_dir / "right").write_text("include:base@cn\ninclude:base")
+    (source_dir / "other").write_text("include:base")
+    (source_dir / "base").write_text("a.com@cn\nb.com\nc.com@cn")
+    names = list_source_names(source_dir)
+
+    outputs = []
+    for jobs in (1, 2):
+        release_dir = tmp_path / f"release-{jobs}"
+        release_dir.mkdir()
+        engine = BuildEngine(source_dir, release_dir, jobs=jobs)
+        engine.run(names)
+        outputs.append({p.name: p.read_text() for p in release_dir.iterdir()})
+        if jobs == 1:
+            assert (engine.include_hits, engine.include_misses) == (2, 2)
+            assert "🧷 include 过滤缓存: 命中 2 次, 未命中 2 次" in capsys.readouterr().out
+        else:
+            # 并行时子文件以压缩形式传给每个任务，缓存只在单个任务内有效。
+            assert engine.include_hits + engine.include_misses == 4
+
+    assert outputs[0] == outputs[1]
+    assert outputs[0]["right.txt"].splitlines()[2:] == [".a.com", ".b.com", ".c.com"]
@@ -0,0 +1,102 @@
+import os
+
+from src.build import BuildEngine, list_source_names
+from src.cache import ParseCache
+from src.graph import tokenize
+from src.parser import format_doc
+
+
+def _unexpected_read(self):
+    raise AssertionError(f"unexpected read: {self}")
+
+
+def test_parse_cache_warm_lookup_skips_reading(tmp_path, monkeypatch):
+    source = tmp_path / "list"
+    source.write_text("a.com@cn # comment\ninclude:b")
+    cache_path = tmp_path / "cache.marshal"
+
+    cache = ParseCache.load(cache_path)
+    digest, tokens = cache.lookup(source)
+    cache.save()
+    assert tokens == tokenize(format_doc(source))
+    assert cache.misses == 1
+
+    warm = ParseCache.load(cache_path)
+    monkeypatch.setattr(type(source), "read_bytes", _unexpected_read)
+    assert warm.lookup(source) == (digest, tokens)
+    assert warm.hits == 1
+
+
+def test_parse_cache_hash_match_after_touch(tmp_path):
+    source = tmp_path / "list"
+    source.write_text("a.com")
+    cache_path = tmp_path / "cache.marshal"
+    cache = ParseCache.load(cache_path)
+    cache.lookup(source)
+    cache.save()
+
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    warm = ParseCache.load(cache_path)
+    _, tokens = warm.lookup(source)
+
+    assert warm.hits == 1 and warm.misses == 0
+    assert tokens == [("domain", "a.com", set(), set())]
+
+
+def test_parse_cache_detects_changed_content(tmp_path):
+    source = tmp_path / "list"
+    source.write_text("a.com")
+    cache_path = tmp_path / "cache.marshal"
+    cache = ParseCache.load(cache_path)
+    cache.lookup(source)
+    cache.save()
+
+    source.write_text("b.com\nc.com")
+    _, tokens = ParseCache.load(cache_path).lookup(source)
+
+    assert [value for _, value, _, _ in tokens] == ["b.com", "c.com"]
+
+
+def test_parse_cache_evicts_least_recently_used(tmp_path):
+    cache_path = tmp_path / "cache.marshal"
+    for name in ("old", "new"):
+        (tmp_path / name).write_text("\n".join(f"{name}{i}.com" for i in range(50)))
+
+    cache = ParseCache.load(cache_path)
+    cache.lookup(tmp_path / "old")
+    cache.save()
+    cache = ParseCache.load(cache_path)
+    cache.lookup(tmp_path / "new")
+    cache.max_bytes = cache.records[str(tmp_path / "new")][4]
+    cache.save()
+
+    reloaded = ParseCache.load(cache_path)
+    assert list(reloaded.records) == [str(tmp_path / "new")]
+
+
+def test_parse_cache_ignores_corrupt_file(tmp_path, capsys):
+    cache_path = tmp_path / "cache.marshal"
+    cache_path.write_bytes(b"\x00garbage")
+
+    cache = ParseCache.load(cache_path)
+
+    assert cache.records == {}
+    assert "解析缓存损坏" in capsys.readouterr().out
+
+
+def test_engine_with_parse_cache_matches_plain_build(tmp_path):
+    source_dir = tmp_path / "data"
+    source_dir.mkdir()
+    (source_dir / "top").write_text("include:base@cn\ninclude:missing\ntop.com")
+    (source_dir / "base").write_text("a.com@cn\nb.com")
+    cache = ParseCache.load(tmp_path / "cache.marshal")
+
+    for label, parse_cache in (("plain", None), ("cached", cache)):
+        release_dir = tmp_path / label
+        release_dir.mkdir()
+        BuildEngine(source_dir, release_dir, parse_cache=parse_cache).run(
+            list_source_names(source_dir)
+        )
+
+    assert (tmp_path / "plain" / "top.txt").read_text() == (tmp_path / "cached" / "top.txt").read_text()
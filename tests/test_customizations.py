@@ -4,6 +4,7 @@ from pathlib import Path
 import pytest
 
 from src.customizations import (
+    IncludeOverlay,
     apply_customizations,
     load_customization_config,
     resolve_customization_path,
@@ -29,37 +30,63 @@ def test_load_customization_config_invalid_schema(tmp_path):
         load_customization_config(config_file)
 
 
-def test_apply_customizations_exclude_includes(tmp_path):
+MICROSOFT = "\n".join(
+    [
+        "include:github",
+        "include:github @cn",
+        "include:github@ads",
+        "include:github-pages",
+        "domain:microsoft.com",
+        "",
+    ]
+)
+
+CONFIG = {
+    "exclude_includes": [
+        {
+            "from_file": "microsoft",
+            "exclude": ["github"],
+        }
+    ]
+}
+
+
+def test_include_overlay_filters_tokens():
+    overlay = IncludeOverlay.from_config(CONFIG)
+    tokens = [
+        ("include", "github", set(), set()),
+        ("include", "github", {"@cn"}, set()),
+        ("include", "github", {"@ads"}, set()),
+        ("include", "github-pages", set(), set()),
+        ("domain", "microsoft.com", set(), set()),
+    ]
+
+    kept = overlay.apply("microsoft", tokens)
+
+    assert kept == [
+        ("include", "github-pages", set(), set()),
+        ("domain", "microsoft.com", set(), set()),
+    ]
+    assert overlay.apply("github", tokens) is tokens
+    assert overlay.edits == {"microsoft": 3}
+    assert overlay.fingerprint() == {"microsoft": ["github"]}
+
+
+def test_apply_customizations_leaves_source_untouched(tmp_path, capsys):
     source_dir = tmp_path / "data"
     source_dir.mkdir()
     source_file = source_dir / "microsoft"
-    source_file.write_text(
-        "\n".join(
-            [
-                "include:github",
-                "include:github @cn",
-                "include:github@ads",
-                "include:github-pages",
-                "domain:microsoft.com",
-                "",
-            ]
-        ),
-        encoding="utf-8",
-    )
-
+    source_file.write_text(MICROSOFT, encoding="utf-8")
     config = {
-        "exclude_includes": [
-            {
-                "from_file": "microsoft",
-                "exclude": ["github"],
-            }
+        "exclude_includes": CONFIG["exclude_includes"] + [
+            {"from_file": "missing", "exclude": ["github"]},
         ]
     }
-    apply_customizations(source_dir, config)
-
-    content = source_file.read_text(encoding="utf-8")
-    assert "include:github\n" not in content
-    assert "include:github @cn\n" not in content
-    assert "include:github@ads\n" not in content
-    assert "include:github-pages\n" in content
-    assert "domain:microsoft.com\n" in content
+
+    overlay = apply_customizations(source_dir, config)
+
+    assert source_file.read_text(encoding="utf-8") == MICROSOFT
+    assert overlay.edits == {"microsoft": 3}
+    output = capsys.readouterr().out
+    assert "microsoft, 删除 include 行 3 条" in output
+    assert "'missing'" in output
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+from src.build import BuildEngine
+from src.emitters import CHUNK_LINES, EmitStats, create_emitters, parse_formats
+
+LINES = [".a.com\n", "b.com\n", "keyword:ads\n"]
+
+
+def _render(spec, lines=LINES):
+    emitter = create_emitters([spec])[0]
+    return b"".join(emitter.chunks("cn", lines)).decode("utf-8"), emitter
+
+
+def test_text_emitter_streams_large_pages_in_batches():
+    lines = [f".d{i:05d}.com\n" for i in range(CHUNK_LINES * 2 + 1)]
+    emitter = create_emitters(["text"])[0]
+
+    chunks = list(emitter.chunks("cn", lines))
+
+    assert len(chunks) == 4
+    assert b"".join(chunks[1:]).decode("utf-8") == "".join(lines)
+    assert emitter.rules == len(lines)
+
+
+def test_line_formats_render_each_rule_type():
+    assert _render("clash")[0].splitlines()[2:] == [
+        "payload:", "  - DOMAIN-SUFFIX,a.com", "  - DOMAIN,b.com", "  - DOMAIN-KEYWORD,ads",
+    ]
+    assert _render("adguard")[0].splitlines()[2:] == ["||a.com^", "|b.com^", "/ads/"]
+    assert _render("adguard")[0].startswith("! 来源: ")
+    assert _render("mihomo")[0].splitlines()[2:] == ["+.a.com", "b.com"]
+    assert _render("hosts")[0].splitlines()[2:] == ["0.0.0.0 a.com", "0.0.0.0 b.com"]
+
+    text, emitter = _render("dnsmasq=1.1.1.1")
+    assert text.splitlines()[2:] == ["server=/a.com/1.1.1.1"]
+    assert (emitter.rules, emitter.skipped) == (1, 2)
+
+
+def test_sing_box_source_rule_set():
+    text, emitter = _render("sing-box")
+    assert json.loads(text) == {
+        "version": 2,
+        "rules": [{"domain": ["b.com"], "domain_suffix": ["a.com"], "domain_keyword": ["ads"]}],
+    }
+    assert emitter.rules == 3
+    assert json.loads(_render("sing-box", [])[0]) == {"version": 2, "rules": []}
+
+
+def test_parse_formats_validates_and_dedupes():
+    assert parse_formats("text, clash,text,dnsmasq=1.1.1.1") == ("text", "clash", "dnsmasq=1.1.1.1")
+    with pytest.raises(ValueError):
+        parse_formats("text,srs")
+    with pytest.raises(ValueError):
+        parse_formats("clash,text=3")
+    with pytest.raises(ValueError):
+        create_emitters(["clash=x"])
+
+
+def test_engine_emits_every_format_in_one_pass(tmp_path, capsys):
+    source_dir = tmp_path / "data"
+    source_dir.mkdir()
+    release_dir = tmp_path / "release"
+    release_dir.mkdir()
+    (source_dir / "top").write_text("include:base\nfull:www.top.net @cn")
+    (source_dir / "base").write_text("base.com")
+
+    engine = BuildEngine(
+        source_dir,
+        release_dir,
+        tag_policies={"cn": {"pos": True, "neg": False}},
+        formats=("text", "clash", "hosts"),
+        jobs=2,
+    )
+    engine.run(["top", "base"])
+
+    assert sorted(p.name for p in release_dir.iterdir()) == [
+        "base.clash.yaml", "base.hosts", "base.txt",
+        "top.clash.yaml", "top.hosts", "top.txt",
+        "top@cn.clash.yaml", "top@cn.hosts", "top@cn.txt",
+    ]
+    assert (release_dir / "top@cn.hosts").read_text().splitlines()[2:] == ["0.0.0.0 www.top.net"]
+    assert engine.output_lines["top.clash.yaml"] == 2
+    assert engine.emit_stats.formats["clash"][:2] == [3, 4]
+    assert "🧩 hosts: 3 个文件" in capsys.readouterr().out
+
+
+def test_emit_stats_merge():
+    first, second = EmitStats(), EmitStats()
+    first.add("text", 2, 0, 10, 0.5)
+    second.add("text", 3, 1, 5, 0.25)
+    second.add("clash", 1, 0, 4, 0.1)
+    first.merge(second)
+
+    assert first.formats == {"text": [2, 5, 1, 15, 0.75], "clash": [1, 1, 0, 4, 0.1]}
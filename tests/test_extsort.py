@@ -0,0 +1,110 @@
+import pytest
+
+from src.build import BuildEngine, list_source_names
+from src.extsort import ExternalSorter, MergedRuns, SortedRun
+
+
+def test_sorter_spills_runs_and_merges_unique_lines():
+    sorter = ExternalSorter(max_lines=2)
+    sorter.extend(["c\n", "a\n", "b\n", "a\n", "d\n"])
+
+    assert sorter.runs == 2
+    assert sorter.spilled_lines == 4
+    assert list(sorter) == ["a\n", "b\n", "c\n", "d\n"]
+    # 每种输出格式各迭代一遍，结果相同。
+    assert list(sorter) == ["a\n", "b\n", "c\n", "d\n"]
+
+    spill_dir = sorter.spill_dir
+    sorter.close()
+    assert not spill_dir.exists()
+    assert list(sorter) == []
+
+
+def test_sorter_without_spill_stays_in_memory():
+    with ExternalSorter(max_lines=10) as sorter:
+        sorter.extend(["b\n", "a\n", "b\n"])
+        assert list(sorter) == ["a\n", "b\n"]
+        assert sorter.spill_dir is None
+
+
+def test_sorter_rejects_non_positive_threshold():
+    with pytest.raises(ValueError):
+        ExternalSorter(max_lines=0)
+
+
+def test_sorter_finish_keeps_spilled_results_on_disk():
+    with ExternalSorter(max_lines=10) as sorter:
+        sorter.extend(["b\n", "a\n", "b\n"])
+        assert sorter.finish() == ["a\n", "b\n"]
+
+    with ExternalSorter(max_lines=2) as sorter:
+        sorter.extend(["c\n", "a\n", "b\n", "a\n", "d\n"])
+        run = sorter.finish()
+    assert isinstance(run, SortedRun)
+    assert len(run) == 4
+    assert list(run) == list(run) == ["a\n", "b\n", "c\n", "d\n"]
+
+    path = run.path
+    run.close()
+    assert not path.exists()
+
+
+def test_merged_runs_can_be_iterated_repeatedly():
+    merged = MergedRuns([["a\n", "c\n"], ["b\n", "c\n"]])
+
+    assert list(merged) == list(merged) == ["a\n", "b\n", "c\n"]
+
+
+def test_engine_spill_mode_writes_same_outputs(tmp_path):
+    source_dir = tmp_path / "data"
+    source_dir.mkdir()
+    (source_dir / "top").write_text("include:left\ninclude:right\nkeyword:ads")
+    (source_dir / "left").write_text("a.com @cn\nc.com @cn\nfull:www.b.com @cn\ne.com")
+    (source_dir / "right").write_text("b.com @cn\na.com @cn\nd.com @!cn\nd.com")
+    (source_dir / "small").write_text("only.com @cn")
+    names = list_source_names(source_dir)
+    policies = {"cn": {"pos": True, "neg": True}}
+
+    outputs = []
+    for options in ({}, {"spill_lines": 1}, {"spill_lines": 1, "optimize": True}, {"optimize": True}):
+        release_dir = tmp_path / f"release-{len(outputs)}"
+        release_dir.mkdir()
+        engine = BuildEngine(
+            source_dir,
+            release_dir,
+            min_lines=2,
+            tag_policies=policies,
+            formats=("text", "sing-box", "ruleset"),
+            **options
+        )
+        engine.run(names)
+        outputs.append({p.name: p.read_bytes() for p in release_dir.iterdir()})
+        if options.get("spill_lines"):
+            assert engine.spilled_runs > 0
+
+    assert outputs[0] == outputs[1]
+    assert outputs[2] == outputs[3]
+    assert "small@cn.txt" not in outputs[1]
+    assert outputs[1]["left@cn.txt"].decode().splitlines()[2:] == [".a.com", ".c.com", "www.b.com"]
+
+
+def test_engine_spill_mode_streams_rules_from_source(tmp_path):
+    source_dir = tmp_path / "data"
+    source_dir.mkdir()
+    release_dir = tmp_path / "release"
+    release_dir.mkdir()
+    (source_dir / "top").write_text("include:big\ntop.com")
+    (source_dir / "big").write_text("\n".join(f"d{i}.com" for i in range(5)))
+
+    engine = BuildEngine(source_dir, release_dir, spill_lines=2, keep_evaluated=True)
+    # 扫描只留下 include，规则行在求值时才逐行解析。
+    assert [token[:2] for token in engine.load_tokens("top")] == [("include", "big")]
+    engine.run(list_source_names(source_dir))
+
+    _, big = engine.processed["big"]
+    assert isinstance(big.groups[0], SortedRun)
+    assert len(big) == 5
+    assert engine.processed["top"][1].groups[0] == [".top.com\n"]
+    assert (release_dir / "top.txt").read_text().splitlines()[2:] == [
+        ".d0.com", ".d1.com", ".d2.com", ".d3.com", ".d4.com", ".top.com"
+    ]
@@ -0,0 +1,72 @@
+from src.graph import IncludeGraph, include_targets, scan_include_graph, tokenize
+
+
+def test_scan_include_graph_reads_each_file_once(tmp_path):
+    (tmp_path / "a").write_text("include:b\ninclude:c@cn\na.com")
+    (tmp_path / "b").write_text("include:c\nb.com")
+    (tmp_path / "c").write_text("c.com")
+
+    graph = scan_include_graph(tmp_path, ["a"])
+
+    assert graph.edges == {"a": ["b", "c"], "b": ["c"], "c": []}
+    assert graph.tokens["c"] == [("domain", "c.com", set(), set())]
+
+
+def test_scan_include_graph_missing_target(tmp_path):
+    (tmp_path / "a").write_text("include:missing")
+
+    graph = scan_include_graph(tmp_path, ["a"])
+
+    assert graph.edges["missing"] == []
+    assert graph.tokens["missing"] == []
+
+
+def test_include_targets_deduplicated():
+    tokens = tokenize(["include:x", "include:x@cn", "include:y", "x.com"])
+    assert include_targets(tokens) == ["x", "y"]
+
+
+def test_build_order_cuts_cycles_and_self_includes(tmp_path):
+    (tmp_path / "a").write_text("include:b")
+    (tmp_path / "b").write_text("include:a\ninclude:c")
+    (tmp_path / "c").write_text("include:c\nc.com")
+
+    order, cyclic = scan_include_graph(tmp_path, ["a"]).build_order()
+
+    assert order == ["c", "b", "a"]
+    assert cyclic == {"b": {"a"}, "c": {"c"}}
+
+
+def test_build_order_starts_from_given_roots(tmp_path):
+    (tmp_path / "a").write_text("include:b")
+    (tmp_path / "b").write_text("include:a")
+
+    graph = scan_include_graph(tmp_path, ["a", "b"])
+
+    assert graph.build_order() == (["b", "a"], {"b": {"a"}})
+    assert graph.build_order(["b"]) == (["a", "b"], {"a": {"b"}})
+
+
+def test_deep_chain_without_recursion_limit():
+    depth = 5000
+    edges = {f"n{i}": [f"n{i + 1}"] for i in range(depth)}
+    edges[f"n{depth}"] = []
+
+    order, cyclic = IncludeGraph(edges=edges).build_order(["n0"])
+
+    assert len(order) == depth + 1
+    assert order[0] == f"n{depth}"
+    assert cyclic == {}
+
+
+def test_build_layers_groups_independent_files(tmp_path):
+    (tmp_path / "top").write_text("include:left\ninclude:right")
+    (tmp_path / "left").write_text("include:base")
+    (tmp_path / "right").write_text("include:base\ninclude:top")
+    (tmp_path / "base").write_text("base.com")
+    (tmp_path / "solo").write_text("solo.com")
+
+    layers, cyclic = scan_include_graph(tmp_path, ["top", "solo"]).build_layers()
+
+    assert layers == [["base", "solo"], ["left"], ["top"], ["right"]]
+    assert cyclic == {"top": {"right"}}
@@ -1,8 +1,9 @@
+import argparse
 from pathlib import Path
 
 import pytest
 
-from src.main import load_tag_policies, resolve_policy_path
+from src.main import add_build_arguments, env_int, load_tag_policies, resolve_policy_path
 
 
 def test_resolve_policy_path_relative():
@@ -30,3 +31,23 @@ def test_load_tag_policies_defaults_missing_fields(tmp_path):
 
     assert policies["cn"] == {"pos": True, "neg": False}
     assert policies["ads"] == {"pos": False, "neg": False}
+
+
+def test_env_int_reports_invalid_value(monkeypatch, capsys):
+    monkeypatch.setenv("BUILD_MAX_MEMORY_MB", "1g")
+    assert env_int("BUILD_MAX_MEMORY_MB") is None
+    assert "‼️变量错误: BUILD_MAX_MEMORY_MB" in capsys.readouterr().out
+
+    monkeypatch.setenv("BUILD_MAX_MEMORY_MB", "512")
+    assert env_int("BUILD_MAX_MEMORY_MB") == 512
+    monkeypatch.delenv("BUILD_MAX_MEMORY_MB")
+    assert env_int("BUILD_MAX_MEMORY_MB") is None
+
+
+def test_invalid_spill_lines_env_falls_back_to_in_memory(monkeypatch, capsys):
+    monkeypatch.setenv("BUILD_SPILL_LINES", "many")
+    parser = argparse.ArgumentParser()
+    add_build_arguments(parser)
+
+    assert parser.parse_args(["data", "release"]).spill_lines is None
+    assert "‼️变量错误: BUILD_SPILL_LINES" in capsys.readouterr().out
@@ -0,0 +1,182 @@
+from src.build import BuildEngine, list_source_names
+from src import manifest as manifest_module
+from src.manifest import BuildManifest, build_fingerprint, include_closures
+from src.graph import scan_include_graph
+
+POLICIES = {"cn": {"pos": True, "neg": False}}
+
+
+def _build(source_dir, release_dir, manifest_path, jobs=1):
+    engine = BuildEngine(
+        source_dir, release_dir, tag_policies=POLICIES, jobs=jobs, manifest_path=manifest_path
+    )
+    engine.run(list_source_names(source_dir))
+    return engine
+
+
+def _setup(tmp_path):
+    source_dir = tmp_path / "data"
+    source_dir.mkdir()
+    release_dir = tmp_path / "release"
+    release_dir.mkdir()
+    (source_dir / "top").write_text("include:mid\ntop.com")
+    (source_dir / "mid").write_text("include:base@cn\nmid.com")
+    (source_dir / "base").write_text("a.com@cn\nb.com")
+    (source_dir / "other").write_text("other.com@cn")
+    return source_dir, release_dir, tmp_path / "cache" / "manifest.json"
+
+
+def test_include_closures_skip_cut_edges(tmp_path):
+    (tmp_path / "a").write_text("include:b")
+    (tmp_path / "b").write_text("include:c\ninclude:a")
+    (tmp_path / "c").write_text("c.com")
+    graph = scan_include_graph(tmp_path, ["a"])
+    order, cyclic = graph.build_order()
+
+    closures = include_closures(graph, order, cyclic)
+
+    assert closures == {"a": ["b", "c"], "b": ["c"], "c": []}
+
+
+def test_manifest_rejects_changed_fingerprint(tmp_path):
+    path = tmp_path / "manifest.json"
+    manifest = BuildManifest(path, build_fingerprint({"min_lines": 1}))
+    manifest.store_entries("a", [])
+    manifest.record("a", "hash", [], {})
+    manifest.save()
+
+    assert BuildManifest.load(path, build_fingerprint({"min_lines": 1})).files
+    assert not BuildManifest.load(path, build_fingerprint({"min_lines": 2})).files
+
+
+def test_manifest_entries_are_read_on_demand_and_carried_over(tmp_path):
+    path = tmp_path / "manifest.json"
+    fingerprint = build_fingerprint({"min_lines": 1})
+    manifest = BuildManifest(path, fingerprint)
+    for name in ("a", "b"):
+        manifest.store_entries(name, [((), [f".{name}.com\n"])])
+        manifest.record(name, "hash", [], {})
+    manifest.save()
+
+    reloaded = BuildManifest.load(path, fingerprint)
+    assert set(reloaded.offsets) == {"a", "b"}
+    assert reloaded.load_entries("b") == [((), [".b.com\n"])]
+
+    # 只有 a 重新求值；b 的条目原样拷进下一代文件。
+    reloaded.store_entries("a", [(("@cn",), [".a.cn\n"])])
+    reloaded.record("a", "hash2", [], {})
+    reloaded.save()
+
+    latest = BuildManifest.load(path, fingerprint)
+    assert latest.load_entries("a") == [(("@cn",), [".a.cn\n"])]
+    assert latest.load_entries("b") == [((), [".b.com\n"])]
+    assert not latest.next_entries_path.exists()
+    latest.close()
+
+
+def test_manifest_joins_entries_stored_in_chunks(tmp_path):
+    path = tmp_path / "manifest.json"
+    fingerprint = build_fingerprint({"min_lines": 1})
+    manifest = BuildManifest(path, fingerprint)
+    manifest.store_entry_chunks("a", [[(("@cn",), [".a.cn\n"])], [((), [".a.com\n"])]])
+    manifest.store_entry_chunks("b", [])
+    for name in ("a", "b"):
+        manifest.record(name, "hash", [], {})
+    manifest.save()
+
+    reloaded = BuildManifest.load(path, fingerprint)
+    assert reloaded.load_entries("a") == [(("@cn",), [".a.cn\n"]), ((), [".a.com\n"])]
+    assert reloaded.load_entries("b") == []
+    reloaded.close()
+
+
+def test_manifest_rejects_entries_file_from_another_save(tmp_path):
+    path = tmp_path / "manifest.json"
+    fingerprint = build_fingerprint({"min_lines": 1})
+    manifest = BuildManifest(path, fingerprint)
+    manifest.store_entries("a", [])
+    manifest.record("a", "hash", [], {})
+    manifest.save()
+    stale = manifest.entries_path.read_bytes()
+    manifest.save()
+    manifest.entries_path.write_bytes(stale)
+
+    assert not BuildManifest.load(path, fingerprint).files
+
+
+def test_fingerprint_covers_source_code(monkeypatch):
+    before = build_fingerprint({"min_lines": 1})
+    monkeypatch.setattr(manifest_module, "code_hash", lambda: "changed")
+
+    assert build_fingerprint({"min_lines": 1}) != before
+
+
+def test_incremental_rebuild_touches_only_dependents(tmp_path):
+    source_dir, release_dir, manifest_path = _setup(tmp_path)
+    _build(source_dir, release_dir, manifest_path)
+    mtimes = {p.name: p.stat().st_mtime_ns for p in release_dir.iterdir()}
+
+    (source_dir / "mid").write_text("include:base@cn\nmid.com\nmid2.com")
+    engine = _build(source_dir, release_dir, manifest_path)
+
+    assert engine.skipped == 2
+    assert set(engine.evaluated) == {"mid", "top"}
+    assert (release_dir / "other.txt").stat().st_mtime_ns == mtimes["other.txt"]
+    assert (release_dir / "base.txt").stat().st_mtime_ns == mtimes["base.txt"]
+    assert ".mid2.com" in (release_dir / "top.txt").read_text()
+
+
+def test_incremental_matches_full_build_in_parallel(tmp_path):
+    source_dir, release_dir, manifest_path = _setup(tmp_path)
+    _build(source_dir, release_dir, manifest_path, jobs=2)
+    (source_dir / "base").write_text("a.com@cn\nc.com@cn")
+    _build(source_dir, release_dir, manifest_path, jobs=2)
+
+    full_dir = tmp_path / "full"
+    full_dir.mkdir()
+    BuildEngine(source_dir, full_dir, tag_policies=POLICIES).run(list_source_names(source_dir))
+
+    def snapshot(path):
+        return {p.name: p.read_text() for p in path.iterdir()}
+
+    assert snapshot(release_dir) == snapshot(full_dir)
+
+
+def test_incremental_restores_modified_output_and_removes_stale(tmp_path):
+    source_dir, release_dir, manifest_path = _setup(tmp_path)
+    _build(source_dir, release_dir, manifest_path)
+
+    (release_dir / "base.txt").write_text("tampered")
+    (source_dir / "other").unlink()
+    engine = _build(source_dir, release_dir, manifest_path)
+
+    assert set(engine.evaluated) == {"base"}
+    assert ".b.com" in (release_dir / "base.txt").read_text()
+    assert not (release_dir / "other.txt").exists()
+    assert not (release_dir / "other@cn.txt").exists()
+
+
+def test_incremental_restores_same_size_edit(tmp_path):
+    source_dir, release_dir, manifest_path = _setup(tmp_path)
+    _build(source_dir, release_dir, manifest_path)
+
+    original = (release_dir / "base.txt").read_text()
+    (release_dir / "base.txt").write_text(original.replace(".b.com", ".z.com"))
+    engine = _build(source_dir, release_dir, manifest_path)
+
+    assert set(engine.evaluated) == {"base"}
+    assert (release_dir / "base.txt").read_text() == original
+    assert engine.writer.written == 1
+
+
+def test_rebuild_with_changed_options_removes_old_outputs(tmp_path):
+    source_dir, release_dir, manifest_path = _setup(tmp_path)
+    _build(source_dir, release_dir, manifest_path)
+    assert (release_dir / "base@cn.txt").exists()
+
+    engine = BuildEngine(source_dir, release_dir, tag_policies={}, manifest_path=manifest_path)
+    engine.run(list_source_names(source_dir))
+
+    assert not (release_dir / "base@cn.txt").exists()
+    assert not (release_dir / "other@cn.txt").exists()
+    assert (release_dir / "base.txt").exists()
@@ -0,0 +1,97 @@
+from src.__main__ import main
+from src.build import BuildEngine
+from src.matcher import DomainMatcher, KeywordAutomaton, MatchStats
+
+
+def test_keyword_automaton_finds_overlapping_keywords():
+    automaton = KeywordAutomaton()
+    automaton.add("he", 0)
+    automaton.add("she", 1)
+    automaton.add("hers", 2)
+    automaton.add("xyz", 3)
+
+    assert automaton.search("ushers") == {0, 1, 2}
+    assert automaton.search("ahishe") == {0, 1}
+    assert automaton.search("abc") == set()
+
+
+def test_matcher_domain_full_and_keyword_rules():
+    matcher = DomainMatcher()
+    matcher.add_lines("cn", ["# 来源", "", ".example.cn", "www.only.cn"])
+    matcher.add_lines("ads", [".ads.example.cn", "keyword:track"])
+
+    assert matcher.match("foo.example.cn") == ["cn"]
+    assert matcher.match("x.ads.Example.CN.") == ["cn", "ads"]
+    assert matcher.match("www.only.cn") == ["cn"]
+    assert matcher.match("a.www.only.cn") == []
+    assert matcher.match("badexample.cn") == []
+    assert matcher.match("tracker.io") == ["ads"]
+    assert matcher.matches("ads.example.cn", "ads")
+    assert not matcher.matches("example.cn", "ads")
+    assert not matcher.matches("example.cn", "missing")
+    assert matcher.rules == 4
+
+
+def test_matcher_empty_labels_do_not_reach_rule_marks():
+    matcher = DomainMatcher()
+    matcher.add_lines("tld", [".com", "full.com"])
+    matcher.add_lines("odd", [".b..com"])
+
+    assert matcher.match("a..com") == ["tld"]
+    assert matcher.match(".com") == ["tld"]
+    assert matcher.match("x.b..com") == ["tld", "odd"]
+    assert list(matcher.match_many(["a..com", "..", "full.com"])) == [
+        ("a..com", ["tld"]), ("..", []), ("full.com", ["tld"])
+    ]
+
+
+def test_match_many_reports_throughput():
+    matcher = DomainMatcher()
+    matcher.add_lines("cn", [".example.cn"])
+    stats = MatchStats()
+
+    results = list(matcher.match_many(["a.example.cn", "b.org", ""], stats))
+
+    assert results == [("a.example.cn", ["cn"]), ("b.org", []), ("", [])]
+    assert (stats.domains, stats.matched) == (3, 1)
+    assert stats.seconds > 0
+
+
+def test_matcher_from_release_dir_agrees_with_processed(tmp_path):
+    source_dir = tmp_path / "data"
+    source_dir.mkdir()
+    release_dir = tmp_path / "release"
+    release_dir.mkdir()
+    (source_dir / "top").write_text("include:base\nkeyword:ads @cn")
+    (source_dir / "base").write_text("base.com @cn\nfull:www.other.net")
+
+    engine = BuildEngine(
+        source_dir,
+        release_dir,
+        tag_policies={"cn": {"pos": True, "neg": False}},
+        keep_evaluated=True,
+    )
+    engine.run(["top", "base"])
+
+    from_disk = DomainMatcher.from_release_dir(release_dir, ["top", "base", "top@cn"])
+    in_memory = DomainMatcher.from_processed(engine.processed, ["top", "base"])
+    for domain in ("x.base.com", "www.other.net", "other.net", "myads.io"):
+        assert in_memory.match(domain) == [n for n in from_disk.match(domain) if "@" not in n]
+    assert from_disk.match("x.base.com") == ["top", "base"]
+    assert from_disk.match("myads.io") == ["top", "top@cn"]
+
+
+def test_match_command_reads_domain_file(tmp_path, capsys):
+    release_dir = tmp_path / "release"
+    release_dir.mkdir()
+    (release_dir / "cn.txt").write_text("# 来源\n\n.example.cn\n", encoding="utf-8")
+    (release_dir / "ads.txt").write_text("keyword:track\n", encoding="utf-8")
+    log = tmp_path / "queries.log"
+    log.write_text("a.example.cn A 1.2.3.4\n# comment\nb.org AAAA\ntracker.cn A\n", encoding="utf-8")
+
+    assert main(["match", str(release_dir), "--input", str(log), "--matched-only"]) == 0
+
+    captured = capsys.readouterr()
+    assert captured.out.splitlines() == ["a.example.cn\tcn", "tracker.cn\tads"]
+    assert "3 个域名, 命中 2 个" in captured.err
+    assert main(["match", str(release_dir), "x.cn", "--lists", "missing"]) == 1
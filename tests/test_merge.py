@@ -0,0 +1,12 @@
+from src.merge import merge_unique, sort_unique
+
+
+def test_merge_unique_streams_sorted_runs():
+    merged = merge_unique([["a", "c", "c"], ["b", "c"], [], ["a", "d"]])
+
+    assert not isinstance(merged, list)
+    assert list(merged) == ["a", "b", "c", "d"]
+
+
+def test_sort_unique():
+    assert sort_unique(["b", "a", "b"]) == ["a", "b"]
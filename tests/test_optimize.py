@@ -0,0 +1,49 @@
+from src.optimize import subsume_lines
+from src.processor import DocumentProcessor
+from src.parser import format_doc
+
+
+def test_subsume_lines_drops_covered_and_duplicates():
+    lines = sorted([
+        ".example.com\n",
+        ".b.example.com\n",
+        "a.example.com\n",
+        "example.com\n",
+        "other.com\n",
+        "other.com\n",
+        ".notexample.com\n",
+        "keyword:example\n",
+        "keyword:example\n",
+    ])
+
+    kept, removed = subsume_lines(lines)
+
+    assert kept == [".example.com\n", ".notexample.com\n", "keyword:example\n", "other.com\n"]
+    assert removed == 5
+
+
+def test_subsume_lines_keeps_full_parent_of_domain():
+    kept, removed = subsume_lines([".a.example.com\n", "example.com\n"])
+
+    assert kept == [".a.example.com\n", "example.com\n"]
+    assert removed == 0
+
+
+def test_processor_optimize_applies_to_base_and_tag_pages(tmp_path, capsys):
+    source_dir = tmp_path / "source"
+    source_dir.mkdir()
+    release_dir = tmp_path / "release"
+    release_dir.mkdir()
+    test_file = source_dir / "test"
+    test_file.write_text("example.com@cn\nfull:www.example.com@cn\nsub.example.com\nother.com")
+
+    doc = DocumentProcessor(
+        format_doc(test_file), source_dir, release_dir, ["test"], {},
+        tag_policies={"cn": {"pos": True, "neg": False}}, optimize=True
+    )
+    doc.process()
+
+    assert doc.result == [".example.com\n", ".other.com\n"]
+    assert (release_dir / "test@cn.txt").read_text().splitlines()[2:] == [".example.com"]
+    assert doc.removed_lines == 3
+    assert "精简 3 行" in capsys.readouterr().out
@@ -1,6 +1,6 @@
 import pytest
 from pathlib import Path
-from src.parser import format_doc, format_line, Entry, entry_to_domain, parse_attrs
+from src.parser import EMPTY_ATTRS, format_bytes, format_doc, format_line, Entry, entry_to_domain, iter_lines, iter_tokens, parse_attrs, parse_bytes, parse_doc
 
 
 class TestFormatDoc:
@@ -52,6 +52,47 @@ class TestFormatDoc:
         assert result[0] == "regexp:^foo#bar$"
 
 
+class TestParseBytes:
+    SAMPLE = (
+        b"# header\r\n"
+        b"\r\n"
+        b"  example.com  \r\n"
+        b"full:a.example.com @cn # comment\r"
+        b"include:other\t@-cn\n"
+        b"regexp:^foo#bar$ # comment\n"
+        b"keyword:ads#tracker\n"
+        b"   # indented comment\n"
+        b"\xef\xbc\x83\xe4\xb8\xad.cn\x0cx"
+    )
+
+    def test_matches_line_by_line_format_line(self):
+        expected = [format_line(line) for line in format_bytes(self.SAMPLE)]
+        assert parse_bytes(self.SAMPLE) == expected
+
+    def test_streamed_lines_parse_the_same(self):
+        assert list(iter_tokens(iter_lines(self.SAMPLE))) == parse_bytes(self.SAMPLE)
+
+    def test_tokens(self):
+        assert parse_bytes(self.SAMPLE)[:5] == [
+            ("domain", "example.com", set(), set()),
+            ("full", "a.example.com", {"@cn"}, set()),
+            ("include", "other", set(), {"@!cn"}),
+            ("regexp", "^foo#bar$", set(), set()),
+            ("keyword", "ads", set(), set()),
+        ]
+
+    def test_tokens_share_attribute_sets_and_values(self):
+        tokens = parse_bytes(b"a.com\nb.com @cn\nfull:c.com @cn\nd.com\n") + parse_bytes(b"a.com\n")
+        assert tokens[0][2] is tokens[3][3] is EMPTY_ATTRS
+        assert tokens[1][2] is tokens[2][2]
+        assert isinstance(tokens[1][2], frozenset)
+        assert tokens[0][1] is tokens[4][1]
+
+    def test_parse_doc_missing_file(self, tmp_path, capsys):
+        assert parse_doc(tmp_path / "nope") == []
+        assert "⚠️未知文件: nope" in capsys.readouterr().out
+
+
 class TestFormatLine:
     def test_simple_domain(self):
         type_prefix, value, pos_attrs, neg_attrs = format_line("google.com")
@@ -176,3 +217,10 @@ class TestEntryToDomain:
     def test_regexp(self):
         entry = Entry(type="regexp", value="^test.*", attr=set())
         assert entry_to_domain(entry) == "regexp:^test.*\n"
+
+    def test_lines_are_interned_and_entries_slotted(self):
+        first = Entry(type="domain", value="".join(["shared", ".com"]))
+        second = Entry(type="domain", value="shared.com")
+        assert entry_to_domain(first) is entry_to_domain(second)
+        assert not hasattr(first, "__dict__")
+        assert first == Entry(type="domain", value="shared.com", data=[])
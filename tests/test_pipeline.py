@@ -0,0 +1,56 @@
+import json
+
+from src import generate_filelist
+from src.__main__ import main
+
+
+def _file_data(pages_dir):
+    content = (pages_dir / "fileList.js").read_text(encoding="utf-8")
+    rows = [line.strip().rstrip(",") for line in content.splitlines() if line.startswith("  {")]
+    return {item["name"]: item["lines"] for item in map(json.loads, rows)}
+
+
+def _write_sources(source_dir):
+    source_dir.mkdir()
+    (source_dir / "top").write_text("include:base\nfull:top.com @cn\n", encoding="utf-8")
+    (source_dir / "base").write_text("a.com @cn\nb.com\nb.com\n", encoding="utf-8")
+
+
+def test_build_command_writes_rules_and_pages_without_recounting(tmp_path, monkeypatch):
+    source_dir = tmp_path / "data"
+    _write_sources(source_dir)
+
+    def fail(_):
+        raise AssertionError("line counts should come from the writer")
+
+    monkeypatch.setattr(generate_filelist, "count_valid_lines", fail)
+    code = main([
+        "build", str(source_dir), str(tmp_path / "release"),
+        "--pages-dir", str(tmp_path / "pages"), "--repo-name", "owner/repo",
+    ])
+
+    assert code == 0
+    assert _file_data(tmp_path / "pages") == {
+        "base.txt": 2, "base@cn.txt": 1, "top.txt": 3, "top@cn.txt": 1,
+    }
+    assert 'const repoName = "owner/repo";' in (tmp_path / "pages" / "fileList.js").read_text()
+
+
+def test_build_command_reuses_manifest_line_counts(tmp_path, monkeypatch):
+    source_dir = tmp_path / "data"
+    _write_sources(source_dir)
+    argv = [
+        "build", str(source_dir), str(tmp_path / "release"),
+        "--pages-dir", str(tmp_path / "pages"), "--manifest", str(tmp_path / "manifest.json"),
+    ]
+    assert main(argv) == 0
+    first = _file_data(tmp_path / "pages")
+
+    monkeypatch.setattr(generate_filelist, "count_valid_lines", lambda _: -1)
+    assert main(argv) == 0
+
+    assert _file_data(tmp_path / "pages") == first
+
+
+def test_build_command_rejects_missing_source_dir(tmp_path):
+    assert main(["build", str(tmp_path / "missing"), str(tmp_path / "release"), "--no-pages"]) == 1
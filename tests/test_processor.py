@@ -1,7 +1,9 @@
 import pytest
 from pathlib import Path
-from src.processor import DocumentProcessor
+from src.extsort import SortedRun
+from src.processor import DocumentProcessor, EvaluatedSet
 from src.parser import format_doc
+from src.tags import TAGS
 
 DEFAULT_POLICIES = {
     "ads": {"pos": True, "neg": True},
@@ -533,3 +535,112 @@ class TestDocumentProcessor:
 
         assert (release_dir / "geolocation-!cn.txt").exists()
         assert (release_dir / "geolocation-!cn@!cn.txt").exists()
+
+    def test_tag_pages_exact_content(self, tmp_path):
+        source_dir = tmp_path / "source"
+        source_dir.mkdir()
+        release_dir = tmp_path / "release"
+        release_dir.mkdir()
+
+        test_file = source_dir / "test"
+        test_file.write_text("b.com@cn@ads\nfull:a.com@cn\nkeyword:x@-cn\nc.com@-cn@foo\nplain.com")
+
+        content = format_doc(test_file)
+        doc = DocumentProcessor(
+            content, source_dir, release_dir, ["test"], {}, tag_policies=DEFAULT_POLICIES
+        )
+        doc.process()
+
+        def page(attr):
+            return (release_dir / f"test{attr}.txt").read_text().splitlines()[2:]
+
+        assert page("@cn") == [".b.com", "a.com"]
+        assert page("@!cn") == [".c.com", "keyword:x"]
+        assert page("@ads") == [".b.com"]
+        assert not (release_dir / "test@!foo.txt").exists()
+        assert doc.attrs_set == {"@cn", "@ads", "@!cn", "@foo"}
+
+
+class TestEvaluatedSet:
+    def test_merged_deduplicates_sorted_runs(self):
+        evaluated = EvaluatedSet({0: [".a.com\n", ".c.com\n"]}, [[".b.com\n", ".c.com\n"], [".a.com\n"]])
+
+        assert list(evaluated.merged()) == [".a.com\n", ".b.com\n", ".c.com\n"]
+
+    def test_select_by_mask_and_untagged_runs(self):
+        cn = TAGS.encode({"@cn"})
+        ads = TAGS.encode({"@ads"})
+        child_run = ["x.com\n"]
+        evaluated = EvaluatedSet({cn: [".a.com\n"], cn | ads: [".b.com\n"], 0: [".c.com\n"]}, [child_run])
+
+        assert evaluated.select(cn, 0) == [[".a.com\n"], [".b.com\n"]]
+        assert evaluated.select(0, cn) == [[".c.com\n"], child_run]
+        assert evaluated.select(0, cn)[1] is child_run
+        assert len(evaluated) == 4
+
+    def test_pack_roundtrip_keeps_attrs_and_data(self):
+        cn = TAGS.encode({"@cn"})
+        evaluated = EvaluatedSet({cn: [".a.com\n"], 0: ["b.com\n"]}, [[".c.com\n"]])
+
+        packed = evaluated.pack()
+        assert packed == [(("@cn",), [".a.com\n"]), ((), [".c.com\n", "b.com\n"])]
+
+        unpacked = EvaluatedSet.unpack(packed)
+        assert unpacked.select(cn, 0) == [[".a.com\n"]]
+        assert sorted(unpacked.lines()) == sorted(evaluated.lines())
+
+    def test_pack_chunks_splits_packed_entries(self):
+        cn = TAGS.encode({"@cn"})
+        evaluated = EvaluatedSet(
+            {cn: SortedRun([".a.com\n", ".d.com\n", ".e.com\n"]), 0: ["b.com\n"]}, [[".c.com\n"]]
+        )
+
+        assert list(evaluated.pack_chunks(2)) == [
+            [(("@cn",), [".a.com\n", ".d.com\n"])],
+            [(("@cn",), [".e.com\n"])],
+            [((), [".c.com\n", "b.com\n"])],
+        ]
+        assert evaluated.pack() == [
+            (("@cn",), [".a.com\n", ".d.com\n", ".e.com\n"]), ((), [".c.com\n", "b.com\n"])
+        ]
+
+    def test_select_merged_keeps_disk_runs_on_disk(self):
+        evaluated = EvaluatedSet({0: SortedRun([".a.com\n", ".c.com\n"])}, [[".b.com\n"]])
+
+        merged = evaluated.select_merged(0, 0)
+        assert isinstance(merged[0], SortedRun)
+        assert list(merged[0]) == [".a.com\n", ".b.com\n", ".c.com\n"]
+
+    def test_select_merged_memoises_merged_selection(self):
+        cn = TAGS.encode({"@cn"})
+        evaluated = EvaluatedSet({cn: [".a.com\n", ".c.com\n"], 0: [".c.com\n"]}, [[".b.com\n"]])
+
+        merged = evaluated.select_merged(0, 0)
+        assert merged == [[".a.com\n", ".b.com\n", ".c.com\n"]]
+        assert evaluated.select_merged(0, 0) is merged
+        assert evaluated.select_merged(cn, 0)[0] is evaluated.groups[cn]
+        assert set(evaluated.selections) == {(0, 0), (cn, 0)}
+
+    def test_include_entry_references_child_runs(self, tmp_path):
+        source_dir = tmp_path / "source"
+        source_dir.mkdir()
+        release_dir = tmp_path / "release"
+        release_dir.mkdir()
+        (source_dir / "child").write_text("a.com@cn\nb.com")
+        (source_dir / "main").write_text("include:child\ninclude:child@cn")
+
+        processed = {}
+        doc = DocumentProcessor(
+            format_doc(source_dir / "main"), source_dir, release_dir, ["main"], processed
+        )
+        doc.process()
+
+        child = processed["child"][1]
+        full_include, cn_include = doc.entries
+        # 单个分组直接引用；多个分组只合并一次，保存在子文件的 selections 里供其他父文件复用。
+        assert cn_include.refs[0] is child.groups[TAGS.encode(["cn"])]
+        assert full_include.refs is child.selections[(0, 0)]
+        assert full_include.refs == [[".a.com\n", ".b.com\n"]]
+        assert list(cn_include.lines()) == [".a.com\n"]
+        assert (doc.include_hits, doc.include_misses) == (0, 2)
+        assert doc.result == [".a.com\n", ".b.com\n"]
@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+from src.build import BuildEngine
+from src.profiling import (
+    NullProfiler,
+    Profiler,
+    disable_profiler,
+    enable_profiler,
+    get_profiler,
+)
+
+
+@pytest.fixture
+def profiler():
+    yield enable_profiler()
+    disable_profiler()
+
+
+def _write_sources(tmp_path):
+    source_dir = tmp_path / "data"
+    release_dir = tmp_path / "release"
+    source_dir.mkdir()
+    release_dir.mkdir()
+    (source_dir / "a").write_text("include:b\nfull:a.com\n", encoding="utf-8")
+    (source_dir / "b").write_text("domain:b.com\n", encoding="utf-8")
+    return source_dir, release_dir
+
+
+def test_span_records_complete_event_with_args():
+    profiler = Profiler()
+    with profiler.span("read", cat="io", file="a") as span:
+        span["bytes_read"] = 12
+
+    event, = profiler.events
+    assert event["name"] == "read"
+    assert event["cat"] == "io"
+    assert event["ph"] == "X"
+    assert event["args"] == {"file": "a", "bytes_read": 12}
+    assert event["dur"] >= 0
+
+
+def test_export_chrome_trace(tmp_path):
+    profiler = Profiler()
+    with profiler.span("scan"):
+        pass
+    with profiler.span("process", cat="file", file="a"):
+        pass
+
+    path = tmp_path / "trace" / "profile.json"
+    profiler.export_chrome_trace(path)
+    trace = json.loads(path.read_text(encoding="utf-8"))
+
+    assert [event["name"] for event in trace["traceEvents"]] == ["scan", "process"]
+    assert trace["traceEvents"][0]["ts"] == 0
+
+
+def test_slowest_files_only_counts_file_spans():
+    profiler = Profiler()
+    profiler.extend([
+        {"name": "process", "cat": "file", "dur": 3000, "args": {"file": "a", "entries": 2}},
+        {"name": "process", "cat": "file", "dur": 5000, "args": {"file": "b"}},
+        {"name": "write", "cat": "io", "dur": 9000, "args": {"file": "a"}},
+    ])
+
+    assert profiler.slowest_files(top_n=1) == [{"file": "b", "seconds": 0.005}]
+    assert profiler.stage_totals()["process"]["entries"] == 2
+
+
+def test_null_profiler_records_nothing():
+    profiler = NullProfiler()
+    with profiler.span("read", file="a") as span:
+        span["bytes_read"] = 1
+
+    assert profiler.drain() == []
+
+
+def test_engine_run_records_read_process_and_write_spans(tmp_path, capsys, profiler):
+    source_dir, release_dir = _write_sources(tmp_path)
+
+    BuildEngine(source_dir, release_dir).run(["a", "b"])
+
+    assert get_profiler() is profiler
+    spans = {(event["name"], event["args"].get("file")) for event in profiler.events}
+    assert {("read", "a"), ("process", "b"), ("include", "a"), ("write", "a"), ("scan", None)} <= spans
+    assert sorted(record["file"] for record in profiler.slowest_files(5)) == ["a", "b"]
+
+
+def test_parallel_run_merges_worker_spans_once(tmp_path, capsys, profiler):
+    source_dir, release_dir = _write_sources(tmp_path)
+
+    BuildEngine(source_dir, release_dir, jobs=2).run(["a", "b"])
+
+    names = [event["name"] for event in profiler.events]
+    assert names.count("scan") == 1
+    assert names.count("process") == 2
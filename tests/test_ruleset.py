@@ -0,0 +1,66 @@
+import struct
+
+import pytest
+
+from src.build import BuildEngine
+from src.ruleset import HEADER, MAGIC, RuleSet, compile_ruleset
+
+
+def _open(tmp_path, lines):
+    path = tmp_path / "list.ruleset"
+    path.write_bytes(compile_ruleset(lines))
+    return RuleSet.open(path)
+
+
+def test_ruleset_matches_domain_suffixes_and_full_names(tmp_path):
+    with _open(tmp_path, [".example.com", "exact.org", "# comment", ""]) as ruleset:
+        assert len(ruleset) == 2
+        assert ruleset.find("example.com") == ".example.com"
+        assert ruleset.find("a.b.Example.COM.") == ".example.com"
+        assert ruleset.find("exact.org") == "exact.org"
+        assert not ruleset.match("www.exact.org")
+        assert not ruleset.match("badexample.com")
+        assert not ruleset.match("org")
+        assert not ruleset.match("")
+
+
+def test_ruleset_keywords_and_regexps(tmp_path):
+    lines = [".a.com", "keyword:track", r"regexp:^ad[0-9]+\."]
+    with _open(tmp_path, lines) as ruleset:
+        assert ruleset.keywords() == ["track"]
+        assert ruleset.regexps() == [r"^ad[0-9]+\."]
+        assert ruleset.find("x.tracker.net") == "keyword:track"
+        assert ruleset.find("ad12.example.net") == r"regexp:^ad[0-9]+\."
+        assert ruleset.find("a.com") == ".a.com"
+        assert not ruleset.match("ads.example.net")
+
+
+def test_ruleset_rejects_foreign_files():
+    with pytest.raises(ValueError):
+        RuleSet(b"short")
+    with pytest.raises(ValueError):
+        RuleSet(b"XXXX" + bytes(HEADER.size))
+    with pytest.raises(ValueError):
+        RuleSet(HEADER.pack(MAGIC, 99, 0, 0, 0, 0, HEADER.size))
+    assert struct.calcsize("<4sHHIIII") == HEADER.size
+
+
+def test_engine_compiles_ruleset_next_to_text_output(tmp_path):
+    source_dir = tmp_path / "data"
+    source_dir.mkdir()
+    release_dir = tmp_path / "release"
+    release_dir.mkdir()
+    (source_dir / "top").write_text("include:base\nfull:www.top.net\nkeyword:ads")
+    (source_dir / "base").write_text("base.com\nregexp:^cdn[0-9]\\.")
+
+    engine = BuildEngine(source_dir, release_dir, formats=("text", "ruleset"))
+    engine.run(["top", "base"])
+
+    with RuleSet.open(release_dir / "top.ruleset") as ruleset:
+        assert len(ruleset) == 3
+        assert ruleset.match("x.base.com")
+        assert ruleset.match("www.top.net")
+        assert not ruleset.match("top.net")
+        assert ruleset.match("myads.org")
+        assert not ruleset.match("cdn1.example")
+    assert "top.ruleset" in engine.output_lines
@@ -0,0 +1,157 @@
+import io
+import shutil
+import subprocess
+import tarfile
+import zipfile
+
+import pytest
+
+from src.build import BuildEngine
+from src.cache import ParseCache
+from src.sources import DirectorySource, GitSource, TarSource, ZipSource, open_source
+
+FILES = {
+    "repo-master/data/google": b"google.com\ninclude:youtube @cn\n",
+    "repo-master/data/youtube": b"youtube.com @cn\n",
+    "repo-master/data/nested/ignored": b"x.com\n",
+    "repo-master/README.md": b"readme\n",
+    "repo-master/data/notes.txt": b"ignored\n",
+}
+
+
+def _make_tar(path, mode):
+    with tarfile.open(path, mode) as tar:
+        for name, data in FILES.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = 1700000000
+            tar.addfile(info, io.BytesIO(data))
+    return path
+
+
+def _make_zip(path):
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, data in FILES.items():
+            archive.writestr(name, data)
+    return path
+
+
+@pytest.fixture(params=["tar.gz", "tar", "zip"])
+def archive(request, tmp_path):
+    path = tmp_path / f"repo.{request.param}"
+    if request.param == "zip":
+        return _make_zip(path)
+    return _make_tar(path, "w:gz" if request.param == "tar.gz" else "w")
+
+
+def test_archive_source_indexes_data_members(archive):
+    source = open_source(archive)
+
+    assert isinstance(source, (TarSource, ZipSource))
+    assert source.names() == ["google", "youtube"]
+    assert source.read("youtube") == b"youtube.com @cn\n"
+    assert source.read("missing") is None
+    assert source.stat("google")[0] == len(FILES["repo-master/data/google"])
+    assert source.cache_key("google") == f"{archive}!google"
+    source.close()
+
+
+def test_engine_builds_from_archive_like_directory(archive, tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for name in ("google", "youtube"):
+        (data_dir / name).write_bytes(FILES[f"repo-master/data/{name}"])
+    (tmp_path / "from_dir").mkdir()
+    (tmp_path / "from_archive").mkdir()
+
+    BuildEngine(data_dir, tmp_path / "from_dir").run(["google", "youtube"])
+    source = open_source(archive)
+    engine = BuildEngine(
+        archive,
+        tmp_path / "from_archive",
+        parse_cache=ParseCache(tmp_path / "cache.marshal"),
+        source=source,
+    )
+    engine.run(source.names())
+
+    built = sorted(p.name for p in (tmp_path / "from_archive").iterdir())
+    assert built == sorted(p.name for p in (tmp_path / "from_dir").iterdir())
+    for name in built:
+        assert (tmp_path / "from_archive" / name).read_bytes() == (tmp_path / "from_dir" / name).read_bytes()
+    assert engine.parse_cache.misses == 2
+
+
+def test_open_source_rejects_missing_and_unknown_files(tmp_path):
+    (tmp_path / "plain.json").write_text("{}")
+
+    assert isinstance(open_source(tmp_path), DirectorySource)
+    with pytest.raises(FileNotFoundError):
+        open_source(tmp_path / "missing.tar.gz")
+    with pytest.raises(FileNotFoundError):
+        open_source(tmp_path / "plain.json")
+
+
+def _git(repo, *args):
+    return subprocess.run(
+        ["git", "-C", str(repo), *args], check=True, stdout=subprocess.PIPE
+    ).stdout.decode().strip()
+
+
+@pytest.fixture
+def git_repo(tmp_path):
+    if shutil.which("git") is None:
+        pytest.skip("git is not installed")
+    repo = tmp_path / "repo"
+    (repo / "data").mkdir(parents=True)
+    (repo / "data" / "google").write_bytes(FILES["repo-master/data/google"])
+    (repo / "data" / "youtube").write_bytes(FILES["repo-master/data/youtube"])
+    (repo / "data" / "notes.txt").write_text("ignored")
+    _git(repo, "init", "-q")
+    _git(repo, "add", "-A")
+    _git(repo, "-c", "user.name=t", "-c", "user.email=t@example.com", "commit", "-qm", "init")
+    return repo
+
+
+def test_git_source_reads_committed_blobs(git_repo):
+    (git_repo / "data" / "youtube").write_text("uncommitted.com\n")
+    source = open_source(git_repo, git_rev="HEAD")
+
+    assert isinstance(source, GitSource)
+    assert source.names() == ["google", "youtube"]
+    assert source.read("youtube") == FILES["repo-master/data/youtube"]
+    assert source.read("google") == FILES["repo-master/data/google"]
+    assert source.digest("google") == _git(git_repo, "rev-parse", "HEAD:data/google")
+    assert source.cache_key("google") == f"git:{source.digest('google')}"
+    source.close()
+
+
+def test_git_source_warm_build_skips_reading(git_repo, tmp_path, monkeypatch):
+    release_dir = tmp_path / "release"
+    release_dir.mkdir()
+
+    def build():
+        source = GitSource(git_repo)
+        engine = BuildEngine(
+            git_repo,
+            release_dir,
+            manifest_path=tmp_path / "manifest.json",
+            parse_cache=ParseCache.load(tmp_path / "cache.marshal"),
+            source=source,
+        )
+        engine.run(source.names())
+        source.close()
+        return engine
+
+    first = build()
+    assert first.digests["google"] == _git(git_repo, "rev-parse", "HEAD:data/google")
+
+    monkeypatch.setattr(GitSource, "read", lambda self, name: pytest.fail(f"read {name}"))
+    second = build()
+
+    assert second.parse_cache.hits == 2
+    assert second.skipped == 2
+
+
+def test_git_source_rejects_unknown_revision(git_repo):
+    with pytest.raises(ValueError):
+        GitSource(git_repo, "no-such-branch")
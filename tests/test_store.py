@@ -0,0 +1,119 @@
+from src.build import BuildEngine, list_source_names
+from src.graph import scan_include_graph
+from src.processor import EvaluatedSet
+from src.store import EntryStore, ProcessedStore, count_dependents, estimate_lines
+from src.tags import TAGS
+
+
+def test_count_dependents_skips_cut_edges(tmp_path):
+    (tmp_path / "a").write_text("include:b\ninclude:c")
+    (tmp_path / "b").write_text("include:c\ninclude:a")
+    (tmp_path / "c").write_text("c.com")
+
+    graph = scan_include_graph(tmp_path, ["a", "b", "c"])
+    order, cyclic = graph.build_order()
+
+    assert count_dependents(graph, order, cyclic) == {"b": 1, "c": 2}
+
+
+def test_store_releases_after_last_dependent():
+    store = EntryStore()
+    store.expect({"child": 2})
+    store["child"] = [((), ["a\n"])]
+    store["left"] = [((), ["b\n"])]
+    store.done("left", ["child"])
+
+    assert "left" not in store
+    assert store["child"] == [((), ["a\n"])]
+
+    store["right"] = []
+    store.done("right", ["child"])
+    assert len(store) == 0
+    assert store.resident_bytes == 0
+    assert store.released == 3
+
+
+def test_store_spills_over_budget_and_reloads():
+    with EntryStore(max_bytes=0) as store:
+        store.expect({"a": 1, "b": 1})
+        store["a"] = [(("@cn",), ["x.cn\n"])]
+        store["b"] = [((), ["y.com\n"])]
+
+        assert list(store.spilled) == ["a"]
+        spill_dir = store.spill_dir
+        assert store["a"] == [(("@cn",), ["x.cn\n"])]
+        assert (store.spills, store.reloads) == (2, 1)
+        assert list(store.spilled) == ["b"]
+    assert not spill_dir.exists()
+
+
+def test_processed_store_drops_result_and_keeps_selection():
+    evaluated = EvaluatedSet({0: [".a.com\n"]}, runs=[[".b.com\n"]])
+    store = ProcessedStore(max_bytes=0)
+    store.expect({"child": 1, "other": 1})
+    store["child"] = ([".a.com\n", ".b.com\n"], evaluated)
+    store["other"] = ([], EvaluatedSet())
+
+    result, reloaded = store["child"]
+    assert result == []
+    assert sorted(reloaded.lines()) == [".a.com\n", ".b.com\n"]
+    store.close()
+
+
+def test_processed_store_counts_shared_runs_and_selections_once():
+    cn = TAGS.encode({"@cn"})
+    child = EvaluatedSet({cn: [".a.cn\n"], 0: [".b.com\n"]})
+    store = ProcessedStore()
+    store.expect({"child": 2})
+    store["child"] = ([], child)
+    child_bytes = store.resident_bytes
+
+    # 父文件 include 时在子文件的 selections 里合并出新列表，runs 引用它。
+    left = EvaluatedSet({0: [".left.com\n"]}, list(child.select_merged(0, 0)))
+    store["left"] = ([], left)
+    merged = child.selections[(0, 0)][0]
+    assert store.resident_bytes == child_bytes + estimate_lines(merged) + estimate_lines([".left.com\n"])
+    # left 没有父文件，done 后释放；合并列表仍由子文件的 selections 持有。
+    store.done("left", ["child"])
+    assert store.resident_bytes == child_bytes + estimate_lines(merged)
+
+    # right 的 runs 直接引用子文件的 @cn 分组，不重复计数。
+    right = EvaluatedSet({}, list(child.select_merged(cn, 0)))
+    store["right"] = ([], right)
+    assert store.resident_bytes == child_bytes + estimate_lines(merged)
+
+    store.done("right", ["child"])
+    assert len(store) == 0
+    assert store.resident_bytes == 0
+    assert not store.shared
+
+
+def test_retained_store_never_releases_or_spills():
+    store = ProcessedStore(max_bytes=0, retain=True)
+    store["root"] = ([], EvaluatedSet({0: [".a.com\n"]}))
+    store.done("root", [])
+
+    assert list(store) == ["root"]
+    assert not store.spilled
+
+
+def test_engine_output_unchanged_with_tight_memory_budget(tmp_path):
+    source_dir = tmp_path / "data"
+    source_dir.mkdir()
+    (source_dir / "top").write_text("include:mid\ninclude:base@cn\nfull:www.top.net")
+    (source_dir / "mid").write_text("include:base\nmid.com @cn")
+    (source_dir / "base").write_text("a.com @cn\nb.com")
+    (source_dir / "other").write_text("include:base")
+    names = list_source_names(source_dir)
+
+    outputs = []
+    for options in ({}, {"max_memory": 0}, {"max_memory": 0, "jobs": 2}):
+        release_dir = tmp_path / f"release-{len(outputs)}"
+        release_dir.mkdir()
+        engine = BuildEngine(source_dir, release_dir, **options)
+        engine.run(names)
+        assert len(engine.processed) == 0
+        outputs.append({p.name: p.read_text() for p in release_dir.iterdir()})
+
+    assert outputs[0] == outputs[1] == outputs[2]
+    assert outputs[0]["top.txt"].splitlines()[2:] == [".a.com", ".b.com", ".mid.com", "www.top.net"]
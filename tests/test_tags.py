@@ -0,0 +1,36 @@
+from src.parser import Entry
+from src.tags import TagRegistry, split_attr
+
+
+def test_split_attr():
+    assert split_attr("@cn") == ("cn", False)
+    assert split_attr("@!cn") == ("cn", True)
+
+
+def test_registry_shares_bit_between_polarities():
+    registry = TagRegistry()
+    cn = registry.encode({"@cn"})
+
+    assert registry.encode({"@!cn"}) == cn
+    assert registry.encode({"@ads", "@cn"}) == cn | registry.bit("ads")
+    assert len(registry) == 2
+
+
+def test_registry_decode_is_cached_and_shared():
+    registry = TagRegistry()
+    mask = registry.encode({"@cn", "@ads"})
+
+    assert registry.decode(mask) == {"@cn", "@ads"}
+    assert registry.decode(mask, negative=True) == {"@!cn", "@!ads"}
+    assert registry.decode(mask) is registry.decode(mask)
+
+
+def test_entry_stores_masks():
+    entry = Entry(type="domain", value="a.com", attr={"@cn"}, neg_attr={"@!ads"})
+    other = Entry(type="domain", value="b.com", attr={"@cn"})
+
+    assert entry.attr == {"@cn"}
+    assert entry.neg_attr == {"@!ads"}
+    assert entry.output_tags == {"@cn", "@!ads"}
+    assert entry.attr is other.attr
+    assert entry == Entry(type="domain", value="a.com", attr={"@cn"}, neg_attr={"@!ads"})
@@ -0,0 +1,21 @@
+from src.trie import DomainTrie
+
+
+def test_covering_domain_matches_label_boundaries():
+    trie = DomainTrie()
+    trie.add_domain("example.com")
+
+    assert trie.covering_domain("a.example.com") == "example.com"
+    assert trie.covering_domain("example.com") == "example.com"
+    assert trie.covering_domain("example.com", strict=True) is None
+    assert trie.covering_domain("badexample.com") is None
+    assert trie.covering_domain("com") is None
+
+
+def test_add_domain_counts_unique():
+    trie = DomainTrie()
+    trie.add_domain("a.com")
+    trie.add_domain("a.com")
+    trie.add_domain("b.a.com")
+
+    assert trie.size == 2
@@ -0,0 +1,159 @@
+import os
+
+from src.build import BuildEngine
+from src import writer as writer_module
+from src.writer import OutputWriter, write_atomic
+
+
+def test_write_atomic_replaces_file_without_leftovers(tmp_path):
+    target = tmp_path / "a.txt"
+    target.write_bytes(b"old")
+
+    write_atomic(target, b"new")
+
+    assert target.read_bytes() == b"new"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.txt"]
+
+
+def test_writer_skips_identical_content(tmp_path):
+    (tmp_path / "a.txt").write_bytes(b"same\n")
+    os.utime(tmp_path / "a.txt", (1, 1))
+
+    writer = OutputWriter(tmp_path)
+    assert writer.write("a.txt", b"same\n") is False
+    assert writer.write("b.txt", b"new\n") is True
+
+    assert (tmp_path / "a.txt").stat().st_mtime == 1
+    assert (tmp_path / "b.txt").read_bytes() == b"new\n"
+    assert (writer.written, writer.skipped) == (1, 1)
+    assert (writer.bytes_written, writer.bytes_skipped) == (4, 5)
+    assert set(writer.hashes) == {"a.txt", "b.txt"}
+
+
+def test_writer_uses_known_hashes(tmp_path):
+    first = OutputWriter(tmp_path)
+    first.write("a.txt", b"one\n")
+
+    second = OutputWriter(tmp_path, dict(first.hashes))
+    assert second.write("a.txt", b"one\n") is False
+    assert second.write("a.txt", b"two\n") is True
+    (tmp_path / "a.txt").unlink()
+    assert OutputWriter(tmp_path, dict(first.hashes)).write("a.txt", b"one\n") is True
+
+
+def test_writer_rewrites_same_size_edit_despite_known_hash(tmp_path):
+    first = OutputWriter(tmp_path)
+    first.write("a.txt", b"b.com\n")
+    (tmp_path / "a.txt").write_bytes(b"z.com\n")
+
+    second = OutputWriter(tmp_path, dict(first.hashes))
+    assert second.write("a.txt", b"b.com\n") is True
+    assert (tmp_path / "a.txt").read_bytes() == b"b.com\n"
+
+
+def test_writer_merge_accumulates_counts(tmp_path):
+    total = OutputWriter(tmp_path)
+    part = OutputWriter(tmp_path)
+    part.write("a.txt", b"a\n")
+    part.write("a.txt", b"a\n")
+
+    total.merge(part)
+
+    assert (total.written, total.skipped, total.bytes_written) == (1, 1, 2)
+    assert "a.txt" in total.hashes
+
+
+def test_hardlink_mode_stores_each_body_once(tmp_path):
+    writer = OutputWriter(tmp_path, link_mode="hardlink")
+    writer.write("a.txt", b"x\n")
+    writer.write("a@cn.txt", b"x\n")
+    writer.write("b.txt", b"y\n")
+
+    assert writer.link_duplicates() == 1
+    assert os.path.samefile(tmp_path / "a.txt", tmp_path / "a@cn.txt")
+    assert writer.written == 2
+    assert writer.duplicate_stats() == (1, 3, 2, 6)
+    assert writer.link_duplicates() == 0
+
+
+def test_symlink_mode_and_remove_keeps_referenced_body(tmp_path):
+    writer = OutputWriter(tmp_path, link_mode="symlink")
+    writer.write("a.txt", b"x\n")
+    writer.write("b.txt", b"x\n")
+    writer.write("c.txt", b"x\n")
+    writer.link_duplicates()
+    assert os.readlink(tmp_path / "b.txt") == "a.txt"
+
+    writer.remove(["a.txt"])
+
+    assert not (tmp_path / "a.txt").exists()
+    assert not (tmp_path / "b.txt").is_symlink()
+    assert (tmp_path / "b.txt").read_bytes() == b"x\n"
+    assert os.readlink(tmp_path / "c.txt") == "b.txt"
+
+
+def test_symlink_mode_links_only_within_one_source(tmp_path):
+    writer = OutputWriter(tmp_path, link_mode="symlink")
+    writer.write("a.json", b"x\n", source="a")
+    writer.write("a@cn.json", b"x\n", source="a")
+    writer.write("b.json", b"x\n", source="b")
+    writer.link_duplicates()
+
+    assert os.readlink(tmp_path / "a@cn.json") == "a.json"
+    assert not (tmp_path / "b.json").is_symlink()
+
+
+def test_symlink_to_rebuilt_source_keeps_skipped_output(tmp_path):
+    source_dir = tmp_path / "data"
+    source_dir.mkdir()
+    release_dir = tmp_path / "release"
+    release_dir.mkdir()
+    manifest_path = tmp_path / "manifest.json"
+    (source_dir / "a").write_text("x.com")
+    (source_dir / "b").write_text("x.com")
+
+    def build():
+        BuildEngine(
+            source_dir,
+            release_dir,
+            manifest_path=manifest_path,
+            formats=("text", "sing-box"),
+            link_mode="symlink",
+        ).run(["a", "b"])
+
+    build()
+    # 只有 a 重建；b 跳过，它的输出不能跟着 a 的新内容变化。
+    (source_dir / "a").write_text("y.com")
+    build()
+
+    assert '"y.com"' in (release_dir / "a.sing-box.json").read_text()
+    assert '"x.com"' in (release_dir / "b.sing-box.json").read_text()
+
+
+def test_changed_body_breaks_hardlink(tmp_path):
+    writer = OutputWriter(tmp_path, link_mode="hardlink")
+    writer.write("a.txt", b"x\n")
+    writer.write("b.txt", b"x\n")
+    writer.link_duplicates()
+
+    OutputWriter(tmp_path, link_mode="hardlink").write("b.txt", b"z\n")
+
+    assert (tmp_path / "a.txt").read_bytes() == b"x\n"
+    assert (tmp_path / "b.txt").read_bytes() == b"z\n"
+
+
+def test_write_chunks_streams_large_outputs(tmp_path, monkeypatch):
+    monkeypatch.setattr(writer_module, "STREAM_BUFFER_BYTES", 4)
+    chunks = [b"ab", b"cd", b"ef"]
+
+    writer = OutputWriter(tmp_path)
+    assert writer.write_chunks("a.txt", iter(chunks)) is True
+    assert writer.write_chunks("small.txt", [b"x"]) is True
+    assert (tmp_path / "a.txt").read_bytes() == b"abcdef"
+    assert writer.sizes["a.txt"] == 6
+
+    again = OutputWriter(tmp_path)
+    assert again.write_chunks("a.txt", iter(chunks)) is False
+    assert again.write_chunks("a.txt", iter([b"ab", b"cd", b"eX"])) is True
+    assert OutputWriter(tmp_path, dict(again.hashes)).write_chunks("a.txt", iter([b"ab", b"cd", b"eX"])) is False
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.txt", "small.txt"]